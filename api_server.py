@@ -0,0 +1,482 @@
+"""Local asyncio HTTP API over the post, prompt, customer and tag stores.
+
+    python cli.py serve --port 8765
+
+All store access goes through ContentService.lock, so requests, background jobs and the save that follows each
+change never interleave. Blocking work (file I/O, ChatGPT, S3) runs in worker threads, not on the event loop.
+Handlers that call out over the network (publish, export) only hold the lock to snapshot and write back, like
+ContentService.publish_ready, so a slow Graph or S3 call doesn't stall every other request. Stores another
+instance changed on disk are reloaded before each request is served.
+
+Web pages open in the user's browser can reach a localhost server too, so requests carrying an Origin other than
+the server's own are refused, request bodies must be application/json (which a page can't send cross-origin
+without a preflight) and export paths must stay inside the data directory.
+
+Routes (JSON in and out):
+    GET    /health
+    GET    /posts/{unpublished|published}[?tag=..&ready=true]
+    POST   /posts/unpublished
+    GET    /posts/{status}/{id}      PATCH/PUT to update, DELETE to remove
+    POST   /posts/unpublished/{id}/publish
+    GET    /prompts, /customers      POST to create
+    GET    /prompts/{name}, /customers/{name}   PATCH/PUT to update, DELETE to remove
+    GET    /tags                     POST {"name": ..} to create
+    DELETE /tags/{name}
+    POST   /jobs/generate {"prompt": name, "runs": n}
+    POST   /jobs/export {"output": path}
+    GET    /jobs, /jobs/{id}
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import core
+import facets
+import models
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 10 * 1024 * 1024
+JOB_WORKERS = 4
+# Finished jobs kept for GET /jobs; the oldest are dropped beyond this
+MAX_FINISHED_JOBS = 200
+
+POST_FIELDS = ("title", "description", "type", "caption", "s3_bucket_url", "s3_folder_path", "s3_file_name",
+               "tag", "ready_to_publish")
+
+STATUS_TEXT = {200: "OK", 201: "Created", 202: "Accepted", 204: "No Content", 400: "Bad Request",
+               401: "Unauthorized", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 409: "Conflict",
+               413: "Payload Too Large", 415: "Unsupported Media Type", 500: "Internal Server Error",
+               502: "Bad Gateway"}
+BODY_METHODS = ("POST", "PUT", "PATCH")
+
+
+def unlocked(handler):
+    """Marks a sync handler that takes ContentService.lock itself, around its store access only."""
+    handler.unlocked = True
+    return handler
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Request:
+    def __init__(self, method, target, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.segments = [unquote(segment) for segment in url.path.split("/") if segment]
+        self.query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "Expected a JSON object.")
+        return data
+
+
+class Job:
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.created = time.time()
+        self.finished = None
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        return {"id": self.id, "kind": self.kind, "params": self.params, "status": self.status,
+                "created": self.created, "finished": self.finished, "result": self.result, "error": self.error}
+
+
+class ApiServer:
+    def __init__(self, service, host=DEFAULT_HOST, port=DEFAULT_PORT, token=None):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.token = token
+        self.jobs = {}
+        self.executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="api-job")
+        self.server = None
+        self.routes = [
+            ("GET", ("health",), self.health),
+            ("GET", ("posts", "{status}"), self.list_posts),
+            ("POST", ("posts", "{status}"), self.create_post),
+            ("GET", ("posts", "{status}", "{post_id}"), self.get_post),
+            ("PATCH", ("posts", "{status}", "{post_id}"), self.update_post),
+            ("PUT", ("posts", "{status}", "{post_id}"), self.update_post),
+            ("DELETE", ("posts", "{status}", "{post_id}"), self.delete_post),
+            ("POST", ("posts", "{status}", "{post_id}", "publish"), self.publish_post),
+            ("GET", ("{collection}",), self.list_named),
+            ("POST", ("{collection}",), self.create_named),
+            ("GET", ("{collection}", "{name}"), self.get_named),
+            ("PATCH", ("{collection}", "{name}"), self.update_named),
+            ("PUT", ("{collection}", "{name}"), self.update_named),
+            ("DELETE", ("{collection}", "{name}"), self.delete_named),
+        ]
+
+    # Server plumbing
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info("API listening on http://%s:%d", self.host, self.port)
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self.write_response(writer, 413, {"error": "Request body too large."}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self.dispatch(Request(method.upper(), target, headers, body))
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def write_response(self, writer, status, payload, keep_alive):
+        body = b"" if payload is None else json.dumps(payload, default=models.json_default).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    def own_origins(self):
+        return {f"http://{host}:{self.port}" for host in (self.host, "127.0.0.1", "localhost", "[::1]")}
+
+    def check_request(self, request):
+        """Refuses cross-site requests: returns (status, payload) to answer with, or None when allowed."""
+        origin = request.headers.get("origin")
+        if origin is not None and origin not in self.own_origins():
+            return 403, {"error": f"Requests from {origin} are not allowed."}
+        if request.method in BODY_METHODS:
+            content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                return 415, {"error": "Send requests with Content-Type: application/json."}
+        if self.token and request.headers.get("authorization") != f"Bearer {self.token}":
+            return 401, {"error": "Missing or invalid bearer token."}
+        return None
+
+    async def dispatch(self, request):
+        refused = self.check_request(request)
+        if refused is not None:
+            return refused
+
+        if request.segments[:1] == ["jobs"]:
+            handler, params = self.match_job_route(request)
+        else:
+            handler, params = self.match_route(request)
+        try:
+            if handler is None:
+                raise HTTPError(params, "Method not allowed." if params == 405 else "Not found.")
+            if asyncio.iscoroutinefunction(handler):
+                return await handler(request, **params)
+            return await asyncio.to_thread(self.run_locked, handler, request, params)
+        except HTTPError as e:
+            return e.status, {"error": e.message}
+        except core.ServiceError as e:
+            return 409, {"error": str(e)}
+        except Exception as e:
+            logging.exception("Unhandled API error for %s %s", request.method, "/".join(request.segments))
+            return 500, {"error": str(e)}
+
+    def match_route(self, request):
+        path_matched = False
+        for method, pattern, handler in self.routes:
+            if len(pattern) != len(request.segments):
+                continue
+            params = {}
+            for part, segment in zip(pattern, request.segments):
+                if part.startswith("{"):
+                    params[part[1:-1]] = segment
+                elif part != segment:
+                    break
+            else:
+                path_matched = True
+                if method == request.method:
+                    return handler, params
+        return None, 405 if path_matched else 404
+
+    def match_job_route(self, request):
+        segments = request.segments
+        if len(segments) == 1 and request.method == "GET":
+            return self.list_jobs, {}
+        if len(segments) == 2 and request.method == "GET":
+            return self.get_job, {"job_id": segments[1]}
+        if len(segments) == 2 and request.method == "POST" and segments[1] in ("generate", "export"):
+            return self.submit_job, {"kind": segments[1]}
+        return None, 404
+
+    def run_locked(self, handler, request, params):
+        self.reload_changed_stores()
+        if getattr(handler, "unlocked", False):
+            return handler(request, **params)
+        with self.service.lock:
+            return handler(request, **params)
+
+    def reload_changed_stores(self):
+        """Picks up stores the app or a script saved since this server last read them."""
+        for file_name in core.STORES:
+            try:
+                self.service.reload_store(file_name)
+            except (OSError, ValueError) as e:
+                # Often a writer caught mid-save; keep serving what we have
+                logging.warning("Could not reload %s: %s", file_name, e)
+
+    def data_path(self, path):
+        """Resolves a client-given path inside the data directory; anything outside it is a 400."""
+        if not isinstance(path, str) or not path:
+            raise HTTPError(400, "'output' must be a file name inside the data directory.")
+        data_dir = os.path.realpath(self.service.data_dir)
+        resolved = os.path.realpath(os.path.join(data_dir, path))
+        if os.path.commonpath([data_dir, resolved]) != data_dir or resolved == data_dir:
+            raise HTTPError(400, f"'output' must be inside the data directory: {path}")
+        return resolved
+
+    # Posts
+
+    def health(self, request):
+        return 200, {"status": "ok", "unpublished": len(self.service.unpublished_posts),
+                     "published": len(self.service.published_posts)}
+
+    def posts_for(self, status):
+        if status == "unpublished":
+            return self.service.unpublished_posts
+        if status == "published":
+            return self.service.published_posts
+        raise HTTPError(404, f"Unknown post status '{status}'.")
+
+    def save_posts(self, status):
+        if status == "unpublished":
+            self.service.save_unpublished_posts()
+        else:
+            self.service.save_published_posts()
+
+    def find_post(self, status, post_id):
+        posts = self.posts_for(status)
+        for index, post in enumerate(posts):
+            if post.get("id") == post_id:
+                return posts, index
+        raise HTTPError(404, f"No {status} post with id '{post_id}'.")
+
+    def list_posts(self, request, status):
+        posts = self.posts_for(status)
+        if "tag" in request.query:
+            posts = [post for post in posts if facets.post_tag(post) == request.query["tag"]]
+        if "ready" in request.query:
+            ready = request.query["ready"].lower() in ("1", "true", "yes")
+            posts = [post for post in posts if bool(post.get("ready_to_publish", False)) == ready]
+        return 200, posts
+
+    def create_post(self, request, status):
+        if status != "unpublished":
+            raise HTTPError(405, "Posts can only be created as unpublished.")
+        data = request.json()
+        post = {"id": core.new_post_id(), "title": "Untitled Post", "description": "", "type": "", "caption": "",
+                "s3_bucket_url": "", "s3_folder_path": "", "s3_file_name": "", "tag": "Uncategorised",
+                "ready_to_publish": False}
+        post.update({key: value for key, value in data.items() if key in POST_FIELDS})
+        post = models.Post.from_dict(post)
+        self.service.unpublished_posts.append(post)
+        self.service.save_unpublished_posts()
+        return 201, post
+
+    def get_post(self, request, status, post_id):
+        posts, index = self.find_post(status, post_id)
+        return 200, posts[index]
+
+    def update_post(self, request, status, post_id):
+        posts, index = self.find_post(status, post_id)
+        data = request.json()
+        unknown = set(data) - set(POST_FIELDS) - {"id"}
+        if unknown:
+            raise HTTPError(400, f"Unknown post fields: {', '.join(sorted(unknown))}")
+        updated = posts[index].copy()
+        updated.update({key: value for key, value in data.items() if key in POST_FIELDS})
+        posts[index] = updated
+        self.save_posts(status)
+        return 200, updated
+
+    def delete_post(self, request, status, post_id):
+        posts, index = self.find_post(status, post_id)
+        del posts[index]
+        self.save_posts(status)
+        return 204, None
+
+    @unlocked
+    def publish_post(self, request, status, post_id):
+        if status != "unpublished":
+            raise HTTPError(404, "Only unpublished posts can be published.")
+        with self.service.lock:
+            posts, index = self.find_post(status, post_id)
+            post = posts[index]
+        # publish_posts sends a copy outside the lock and takes it again to write the result back
+        published, failures = self.service.publish_posts([post])
+        if failures:
+            raise HTTPError(502, f"Publishing failed: {failures[0][1]}")
+        return 200, published[0]
+
+    # Prompts, customers and tags are keyed by name
+
+    def named_store(self, collection):
+        """(items, save, make_item) for a collection; make_item turns a plain object into the stored type."""
+        if collection == "prompts":
+            return self.service.prompts_list, self.service.save_prompts, models.Prompt.from_dict
+        if collection == "customers":
+            return self.service.customer_info_list, self.service.save_customer_info, models.Customer.from_dict
+        if collection == "tags":
+            tags = self.service.load_tags()
+            return tags, lambda: self.service.save_tags(tags), dict
+        raise HTTPError(404, f"Unknown collection '{collection}'.")
+
+    def find_named(self, items, name):
+        for index, item in enumerate(items):
+            if item.get("name") == name:
+                return index
+        raise HTTPError(404, f"No entry named '{name}'.")
+
+    def list_named(self, request, collection):
+        items, _, _ = self.named_store(collection)
+        return 200, items
+
+    def create_named(self, request, collection):
+        items, save, make_item = self.named_store(collection)
+        data = request.json()
+        name = str(data.get("name", "")).strip()
+        if not name:
+            raise HTTPError(400, "A non-empty 'name' is required.")
+        if any(item.get("name") == name for item in items):
+            raise HTTPError(409, f"'{name}' already exists.")
+        if collection == "tags":
+            item = make_item({"name": name})
+        else:
+            if not data.get("details"):
+                raise HTTPError(400, "'details' is required.")
+            item = make_item({"name": name, "details": data["details"]})
+        items.append(item)
+        save()
+        return 201, item
+
+    def get_named(self, request, collection, name):
+        items, _, _ = self.named_store(collection)
+        return 200, items[self.find_named(items, name)]
+
+    def update_named(self, request, collection, name):
+        if collection == "tags":
+            raise HTTPError(405, "Tags cannot be updated; delete and create instead.")
+        items, save, _ = self.named_store(collection)
+        index = self.find_named(items, name)
+        data = request.json()
+        if not data.get("details"):
+            raise HTTPError(400, "'details' is required.")
+        items[index]["details"] = data["details"]
+        save()
+        return 200, items[index]
+
+    def delete_named(self, request, collection, name):
+        items, save, _ = self.named_store(collection)
+        del items[self.find_named(items, name)]
+        save()
+        return 204, None
+
+    # Jobs
+
+    async def list_jobs(self, request):
+        return 200, [job.to_dict() for job in self.jobs.values()]
+
+    async def get_job(self, request, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPError(404, f"No job with id '{job_id}'.")
+        return 200, job.to_dict()
+
+    async def submit_job(self, request, kind):
+        params = request.json()
+        if kind == "generate" and not params.get("prompt"):
+            raise HTTPError(400, "'prompt' is required.")
+        if kind == "export" and params.get("output") is not None:
+            params["output"] = self.data_path(params["output"])
+        job = Job(kind, params)
+        self.jobs[job.id] = job
+        self.prune_jobs()
+        asyncio.get_running_loop().run_in_executor(self.executor, self.run_job, job)
+        return 202, job.to_dict()
+
+    def prune_jobs(self):
+        """Drops the oldest finished jobs beyond MAX_FINISHED_JOBS; queued and running ones are always kept."""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def run_job(self, job):
+        job.status = "running"
+        try:
+            if job.kind == "generate":
+                imported = rejected = 0
+                for _ in range(int(job.params.get("runs", 1))):
+                    new_posts, invalid_items = self.service.generate(job.params["prompt"])
+                    imported += len(new_posts)
+                    rejected += len(invalid_items)
+                job.result = {"imported": imported, "rejected": rejected}
+            else:
+                # export_ready snapshots the posts under the lock and presigns outside it
+                job.result = {"exported": self.service.export_ready(job.params.get("output"))}
+            job.status = "done"
+        except Exception as e:
+            logging.error("Job %s (%s) failed: %s", job.id, job.kind, e)
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            job.finished = time.time()
+
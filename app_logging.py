@@ -0,0 +1,110 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Argument types that can safely be formatted later on the listener thread
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, bytes, type(None))
+
+_listeners = []
+
+
+class PayloadSummary:
+    """Cheap stand-in for a large payload in log messages: item count plus an estimated JSON size.
+
+    The size is extrapolated from the first few items so building the summary stays O(1).
+    """
+
+    SAMPLE_SIZE = 5
+
+    def __init__(self, payload):
+        self.kind = type(payload).__name__
+        try:
+            self.count = len(payload)
+        except TypeError:
+            self.count = None
+        self.estimated_bytes = self._estimate_bytes(payload)
+
+    def _estimate_bytes(self, payload):
+        try:
+            if isinstance(payload, dict):
+                sample = dict(list(payload.items())[:self.SAMPLE_SIZE])
+            elif isinstance(payload, (list, tuple)):
+                sample = list(payload[:self.SAMPLE_SIZE])
+            else:
+                return len(json.dumps(payload, default=str))
+            if not sample:
+                return 2
+            return int(len(json.dumps(sample, default=str)) * self.count / len(sample))
+        except (TypeError, ValueError):
+            return None
+
+    def __str__(self):
+        parts = []
+        if self.count is not None:
+            parts.append(f"{self.count} items")
+        if self.estimated_bytes is not None:
+            parts.append(f"~{format_bytes(self.estimated_bytes)}")
+        return f"<{self.kind}: {', '.join(parts)}>"
+
+    __repr__ = __str__
+
+
+def summarize(payload):
+    return PayloadSummary(payload)
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread when it is safe to do so.
+
+    The stock QueueHandler formats every record on the calling thread. Records whose arguments are
+    immutable (or already summarised) are passed through untouched instead.
+    """
+
+    def prepare(self, record):
+        if record.exc_info or record.stack_info:
+            return super().prepare(record)
+        args = record.args
+        if isinstance(args, tuple) and all(isinstance(arg, _IMMUTABLE_ARG_TYPES + (PayloadSummary,))
+                                           for arg in args):
+            return record
+        return super().prepare(record)
+
+
+def attach_queued_handlers(logger, *handlers):
+    """Routes the logger's records through a queue to the given handlers on a background thread."""
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    listener.start()
+    _listeners.append(listener)
+    return listener
+
+
+def stop_listeners():
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_listeners)
+
+
+def setup_logging(level=logging.INFO):
+    root = logging.getLogger()
+    if any(isinstance(handler, DeferredQueueHandler) for handler in root.handlers):
+        return
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    root.setLevel(level)
+    attach_queued_handlers(root, console_handler)
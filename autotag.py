@@ -0,0 +1,148 @@
+"""Offline tag suggestions from a TF-IDF nearest-centroid model.
+
+Every tagged post (and every name in tags.json) adds its term counts to its tag's running total, so
+learning and unlearning a post is cheap and incremental. Before predicting, the totals become a
+tag-by-term TF-IDF matrix of L2-normalised centroids. A batch of posts is vectorised the same way and
+scored against all tags with one matrix product.
+"""
+import logging
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+UNTAGGED = ("", "Uncategorised")
+MAX_FEATURES = 20000
+BATCH_ROWS = 512
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9']+")
+
+
+def tokens(text):
+    return _WORD.findall((text or "").lower())
+
+
+def post_text(post):
+    return " ".join(post.get(field) or "" for field in ("title", "caption", "description"))
+
+
+def is_tagged(post):
+    """True for posts with a tag someone chose (auto-assigned tags are not trained on until confirmed)."""
+    return (post.get("tag") or "").strip() not in UNTAGGED and post.get("tag_source") != "auto"
+
+
+class TagModel:
+    def __init__(self, max_features=MAX_FEATURES):
+        self.max_features = max_features
+        self.tag_terms = {}
+        self.doc_freq = Counter()
+        self.doc_count = 0
+        self._trained = {}
+        self._matrix = None
+
+    # Training
+
+    def _learn(self, tag, words, sign):
+        counts = Counter(words)
+        terms = self.tag_terms.setdefault(tag, Counter())
+        for word, count in counts.items():
+            terms[word] += sign * count
+            self.doc_freq[word] += sign
+        if sign < 0:
+            # Drop zeroed entries so the vocabulary shrinks with the corpus
+            for word in counts:
+                if terms[word] <= 0:
+                    del terms[word]
+                if self.doc_freq[word] <= 0:
+                    del self.doc_freq[word]
+            if not terms:
+                del self.tag_terms[tag]
+        self.doc_count += sign
+        self._matrix = None
+
+    def learn(self, key, tag, text):
+        """Records that the document `key` (a post id or tag name) has this tag, replacing what was known."""
+        known = self._trained.get(key)
+        if known == (tag, text):
+            return False
+        self.forget(key)
+        self._learn(tag, tokens(text), 1)
+        self._trained[key] = (tag, text)
+        return True
+
+    def forget(self, key):
+        known = self._trained.pop(key, None)
+        if known is not None:
+            self._learn(known[0], tokens(known[1]), -1)
+
+    def sync(self, post_lists, tag_names=()):
+        """Learns new or re-tagged posts and tag names, and forgets posts that lost their tag or were deleted."""
+        seen = set()
+        changed = 0
+        for name in tag_names:
+            key = ("tag", name)
+            seen.add(key)
+            changed += self.learn(key, name, name.replace("-", " ").replace("_", " "))
+        for posts in post_lists:
+            for post in posts:
+                if post.get("id") and is_tagged(post):
+                    seen.add(post["id"])
+                    changed += self.learn(post["id"], post["tag"].strip(), post_text(post))
+        for key in [key for key in self._trained if key not in seen]:
+            self.forget(key)
+            changed += 1
+        if changed:
+            logging.info("Tag model updated: %d documents changed, %d tags", changed, len(self.tag_terms))
+
+    # Prediction
+
+    def _build(self):
+        vocabulary = [word for word, _ in self.doc_freq.most_common(self.max_features)]
+        columns = {word: column for column, word in enumerate(vocabulary)}
+        tags = sorted(self.tag_terms)
+        idf = np.array([math.log((1 + self.doc_count) / (1 + self.doc_freq[word])) + 1 for word in vocabulary],
+                       dtype=np.float32)
+        centroids = np.zeros((len(tags), len(vocabulary)), dtype=np.float32)
+        for row, tag in enumerate(tags):
+            items = [(columns[word], count) for word, count in self.tag_terms[tag].items() if word in columns]
+            if items:
+                cols, counts = zip(*items)
+                centroids[row, list(cols)] = np.log1p(np.array(counts, dtype=np.float32))
+        centroids *= idf
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms == 0, 1, norms)
+        self._matrix = (tags, columns, idf, centroids)
+        return self._matrix
+
+    def vectorize(self, texts_tokens, columns, idf):
+        rows, cols = [], []
+        for row, words in enumerate(texts_tokens):
+            for word in words:
+                column = columns.get(word)
+                if column is not None:
+                    rows.append(row)
+                    cols.append(column)
+        matrix = np.zeros((len(texts_tokens), len(columns)), dtype=np.float32)
+        np.add.at(matrix, (rows, cols), 1)
+        np.log1p(matrix, out=matrix)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+        return matrix
+
+    def suggest(self, posts, top=1):
+        """Returns, for each post, up to `top` (tag, cosine score) pairs, best first."""
+        if not self.tag_terms or not posts:
+            return [[] for _ in posts]
+        tags, columns, idf, centroids = self._matrix or self._build()
+        suggestions = []
+        for start in range(0, len(posts), BATCH_ROWS):
+            batch = [tokens(post_text(post)) for post in posts[start:start + BATCH_ROWS]]
+            scores = self.vectorize(batch, columns, idf) @ centroids.T
+            count = min(top, len(tags))
+            best = np.argsort(-scores, axis=1)[:, :count]
+            for row, ranked in enumerate(best):
+                suggestions.append([(tags[column], float(scores[row, column])) for column in ranked
+                                    if scores[row, column] > 0])
+        return suggestions
@@ -0,0 +1,342 @@
+"""Generation jobs run through the OpenAI Batch API.
+
+A job writes one chat request per prompt run to a JSONL file under batch_requests/, uploads it and submits it as
+a single batch, which costs less than live calls but may take hours. Job state lives in batch_jobs.json, so a
+job submitted before a restart is picked up again. BatchPoller checks running jobs in the background and hands
+the combined results of a finished job to its `on_complete` callback for import. The ids of the posts a job
+imports are recorded on the job before the posts are saved, so a restart between the two saves neither loses
+nor repeats the import.
+
+Job status moves through "submitting" -> "submitted" -> "completed" -> "imported", or ends in "failed".
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import core
+
+BATCH_JOBS_FILE = "batch_jobs.json"
+BATCH_REQUESTS_DIR = "batch_requests"
+DEFAULT_API_BASE = "https://api.openai.com/v1"
+COMPLETION_WINDOW = "24h"
+POLL_SECONDS = 60
+
+ACTIVE_STATUSES = ("submitting", "submitted", "completed")
+REMOTE_FAILED_STATUSES = ("failed", "expired", "cancelled")
+
+
+class BatchError(Exception):
+    pass
+
+
+class BatchClient:
+    """The few Files and Batches endpoints a job needs, over the ChatGPT client's pooled session."""
+
+    def __init__(self, api_base, api_key, session, timeout=60.0):
+        self.api_base = (api_base or DEFAULT_API_BASE).rstrip("/")
+        self.api_key = api_key
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, method, path, raw=False, **kwargs):
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        response = self.session.request(method, f"{self.api_base}/{path}", headers=headers, timeout=self.timeout,
+                                        **kwargs)
+        if response.status_code >= 400:
+            try:
+                message = response.json()["error"]["message"]
+            except (ValueError, KeyError, TypeError):
+                message = f"HTTP {response.status_code}"
+            raise BatchError(f"{method} {path}: {message}")
+        return response.text if raw else response.json()
+
+    def upload(self, file_path):
+        with open(file_path, "rb") as file:
+            return self.request("POST", "files", data={"purpose": "batch"},
+                                files={"file": (os.path.basename(file_path), file, "application/jsonl")})["id"]
+
+    def create(self, input_file_id, metadata=None):
+        return self.request("POST", "batches", json={"input_file_id": input_file_id,
+                                                     "endpoint": "/v1/chat/completions",
+                                                     "completion_window": COMPLETION_WINDOW,
+                                                     "metadata": metadata or {}})
+
+    def retrieve(self, batch_id):
+        return self.request("GET", f"batches/{batch_id}")
+
+    def content(self, file_id):
+        return self.request("GET", f"files/{file_id}/content", raw=True)
+
+
+def _error_message(error, status_code=None):
+    """The message of an error from a result line, which may be an object, a bare string or anything else."""
+    message = (error.get("message") or error.get("code")) if isinstance(error, dict) else error
+    if message:
+        return message if isinstance(message, str) else json.dumps(message)
+    return f"HTTP {status_code}" if status_code else "Unknown error"
+
+
+def parse_results(job, text):
+    """Turns a batch output file into (items, failures).
+
+    items are the post objects of every successful request, each stamped with its job and source prompt.
+    failures are (custom_id, message) pairs for requests that errored or returned something other than posts,
+    and (None, message) for lines that aren't result objects at all.
+    """
+    items, failures = [], []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            result = json.loads(line)
+        except ValueError as e:
+            failures.append((None, f"Unreadable result line: {e}"))
+            continue
+        if not isinstance(result, dict):
+            failures.append((None, f"Unexpected result line: {line[:200]}"))
+            continue
+        custom_id = result.get("custom_id")
+        response = result.get("response")
+        response = response if isinstance(response, dict) else {}
+        status_code = response.get("status_code")
+        failed = isinstance(status_code, int) and status_code >= 400
+        if result.get("error") or failed:
+            body = response.get("body")
+            error = result.get("error") or (body.get("error") if isinstance(body, dict) else body)
+            failures.append((custom_id, _error_message(error, status_code)))
+            continue
+        try:
+            content = response["body"]["choices"][0]["message"]["content"].strip()
+            posts = json.loads(core.sanitize_json(content))
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            failures.append((custom_id, f"Unusable response: {e}"))
+            continue
+        prompt_name = job["requests"].get(custom_id)
+        for item in posts:
+            if isinstance(item, dict):
+                item["batch_job"] = job["id"]
+                item["source_prompt"] = prompt_name
+            items.append(item)
+    return items, failures
+
+
+class BatchJobs:
+    """Submits, tracks and collects batch jobs for one ContentService."""
+
+    def __init__(self, service):
+        self.service = service
+        self.file_path = service.path(BATCH_JOBS_FILE)
+        self.jobs = {}
+        self.lock = threading.RLock()
+
+    def load(self):
+        with self.lock:
+            self.jobs = {job["id"]: job for job in core.load_json(self.file_path, default=[])}
+
+    def save(self):
+        with self.lock:
+            core.save_json(sorted(self.jobs.values(), key=lambda job: job["created_at"]), self.file_path)
+
+    def update(self, job, **fields):
+        with self.lock:
+            job.update(fields, updated_at=time.strftime('%Y-%m-%dT%H:%M:%S%z'))
+            self.save()
+
+    def active(self):
+        with self.lock:
+            return [job for job in self.jobs.values() if job["status"] in ACTIVE_STATUSES]
+
+    def client(self):
+        chatgpt = self.service.chatgpt
+        return BatchClient(chatgpt.api_base, self.service.load_chatgpt_key(), chatgpt.session)
+
+    # Submitting
+
+    def write_requests(self, job_id, runs):
+        """Writes one chat completion request per (prompt_name, count) run. Returns (path, custom_id -> prompt)."""
+        directory = self.service.path(BATCH_REQUESTS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        file_path = os.path.join(directory, f"{job_id}.jsonl")
+        requests = {}
+        with open(file_path, "w", encoding="utf-8") as file:
+            for prompt_name, count in runs:
+                with self.service.lock:
+                    prompt_text = self.service.build_prompt(prompt_name)
+                provider, system_prompt, params = self.service.completion_request(prompt_name)
+                if provider.name != "openai":
+                    raise core.ServiceError(f"Prompt '{prompt_name}' uses the '{provider.name}' provider; "
+                                            "batch jobs only run on OpenAI.")
+                body = {"messages": [{"role": "system", "content": system_prompt},
+                                     {"role": "user", "content": prompt_text}], **params}
+                for _ in range(count):
+                    custom_id = f"{job_id}-{len(requests)}"
+                    requests[custom_id] = prompt_name
+                    file.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions",
+                                           "body": body}) + "\n")
+        return file_path, requests
+
+    def submit(self, runs):
+        """Creates a job for [(prompt_name, count)] runs and submits it. Returns the job.
+
+        The job is recorded before uploading, so a failed or interrupted submission is retried by refresh().
+        """
+        client = self.client()
+        job_id = uuid.uuid4().hex[:12]
+        input_path, requests = self.write_requests(job_id, runs)
+        job = {"id": job_id, "created_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'), "status": "submitting",
+               "prompts": sorted({name for name, _ in runs}), "input_path": input_path, "requests": requests,
+               "input_file_id": None, "batch_id": None, "remote_status": None, "output_file_id": None,
+               "error_file_id": None, "request_counts": None, "imported_ids": None, "posts_imported": 0,
+               "failures": 0, "error": None}
+        with self.lock:
+            self.jobs[job_id] = job
+            self.save()
+        self._submit(job, client)
+        return job
+
+    def _submit(self, job, client):
+        try:
+            if not job["input_file_id"]:
+                self.update(job, input_file_id=client.upload(job["input_path"]))
+            batch = client.create(job["input_file_id"], {"job_id": job["id"]})
+        except (BatchError, OSError) as e:
+            self.update(job, error=str(e))
+            raise
+        self.update(job, status="submitted", batch_id=batch["id"], remote_status=batch.get("status"), error=None)
+        logging.info("Submitted batch job %s (%d requests) as %s", job["id"], len(job["requests"]), batch["id"])
+
+    # Tracking
+
+    def refresh(self, job, client=None):
+        """Brings one job up to date with the API. Returns True once its results are ready to import."""
+        client = client or self.client()
+        if job["status"] == "submitting":
+            self._submit(job, client)
+        if job["status"] == "submitted":
+            batch = client.retrieve(job["batch_id"])
+            status = batch.get("status")
+            fields = {"remote_status": status, "request_counts": batch.get("request_counts"),
+                      "output_file_id": batch.get("output_file_id"), "error_file_id": batch.get("error_file_id")}
+            if status == "completed":
+                fields["status"] = "completed"
+            elif status in REMOTE_FAILED_STATUSES:
+                fields.update(status="failed", error=f"Batch {status}")
+                logging.error("Batch job %s %s", job["id"], status)
+            if status != job["remote_status"] or fields.get("status"):
+                self.update(job, **fields)
+        return job["status"] == "completed"
+
+    def results(self, job, client=None):
+        """Downloads a completed job's output. Returns (response_text, failures) ready for import_response."""
+        client = client or self.client()
+        items, failures = [], []
+        if job["output_file_id"]:
+            items, failures = parse_results(job, client.content(job["output_file_id"]))
+        if job["error_file_id"]:
+            failures.extend(parse_results(job, client.content(job["error_file_id"]))[1])
+        for custom_id, message in failures:
+            logging.warning("Batch request %s failed: %s", custom_id, message)
+        return json.dumps(items), failures
+
+    def already_imported(self, job):
+        """Whether the job's posts were saved: it is marked imported, or a post it recorded as imported exists."""
+        if job["status"] == "imported":
+            return True
+        imported_ids = set(job.get("imported_ids") or ())
+        if not imported_ids:
+            return False
+        with self.service.lock:
+            return any(post.get("id") in imported_ids
+                       for posts in (self.service.unpublished_posts, self.service.published_posts) for post in posts)
+
+    def import_response(self, job, response_text, source_prompt=None):
+        """Imports a job's results, recording the new post ids on the job before the posts are saved.
+
+        Returns (new_posts, invalid_items) like ContentService.import_response.
+        """
+        def record_ids(new_posts):
+            self.update(job, imported_ids=[post["id"] for post in new_posts])
+
+        with self.service.lock:
+            return self.service.import_response(response_text, source_prompt, before_save=record_ids)
+
+    def mark_imported(self, job, posts_imported, failures):
+        self.update(job, status="imported", posts_imported=posts_imported, failures=len(failures), error=None)
+        logging.info("Imported batch job %s: %d posts, %d failed requests", job["id"], posts_imported, len(failures))
+
+    def mark_import_failed(self, job, error):
+        """Records why importing a job's results failed; it stays "completed", so the poller tries again."""
+        self.update(job, error=f"Import failed: {error}")
+        logging.error("Importing batch job %s failed; will retry: %s", job["id"], error)
+
+    def import_results(self, job, client=None):
+        """Imports a completed job into Unpublished, at most once. Returns (new_posts, failures)."""
+        response_text, failures = self.results(job, client)
+        with self.service.lock:
+            if self.already_imported(job):
+                # Imported before a crash or restart, but the job wasn't marked yet
+                self.mark_imported(job, len(job["imported_ids"]), failures)
+                return [], failures
+            new_posts, _ = self.import_response(job, response_text)
+        self.mark_imported(job, len(new_posts), failures)
+        return new_posts, failures
+
+
+class BatchPoller(threading.Thread):
+    """Background thread refreshing active jobs every `interval` seconds.
+
+    `on_complete(job, response_text, failures)` is called for each job whose results are ready and must import them
+    and call jobs.mark_imported; without it the poller imports through BatchJobs.import_results.
+    """
+
+    def __init__(self, jobs, on_complete=None, interval=POLL_SECONDS):
+        super().__init__(name="batch-poller", daemon=True)
+        self.jobs = jobs
+        self.on_complete = on_complete
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def wake(self):
+        """Checks jobs now instead of waiting out the interval (e.g. right after a submit)."""
+        self._wake.set()
+
+    def run(self):
+        while not self._stopping:
+            if self.jobs.active():
+                self.poll_once()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def poll_once(self):
+        try:
+            client = self.jobs.client()
+        except core.ServiceError as e:
+            logging.warning("Not polling batch jobs: %s", e)
+            return
+        for job in self.jobs.active():
+            try:
+                if not self.jobs.refresh(job, client):
+                    continue
+            except Exception as e:
+                # Network trouble: keep the job active and try again next round
+                logging.error("Checking batch job %s failed: %s", job["id"], e)
+                continue
+            try:
+                if self.on_complete is None:
+                    self.jobs.import_results(job, client)
+                else:
+                    response_text, failures = self.jobs.results(job, client)
+                    self.on_complete(job, response_text, failures)
+            except Exception as e:
+                try:
+                    self.jobs.mark_import_failed(job, e)
+                except Exception:
+                    logging.exception("Could not record the failed import of batch job %s", job["id"])
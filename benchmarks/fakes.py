@@ -0,0 +1,440 @@
+"""Offline stand-ins for the OpenAI chat and batch endpoints, the Graph publishing API and the S3 client."""
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from benchmarks.synthetic import SyntheticData
+
+try:
+    from botocore.exceptions import ClientError
+except ImportError:
+    class ClientError(Exception):
+        def __init__(self, error_response, operation_name):
+            super().__init__(f"An error occurred ({error_response['Error']['Code']}) when calling "
+                             f"the {operation_name} operation")
+            self.response = error_response
+            self.operation_name = operation_name
+
+
+class FakeOpenAIServer:
+    """Local HTTP server answering /v1/chat/completions with synthetic post arrays.
+
+    Point the SDK at it with `api_base=server.base_url`. Requests are counted in `server.requests`. Every
+    response carries x-ratelimit-* headers for `requests_per_minute`, and every `rate_limit_every`-th request is
+    answered with a 429 asking the client to retry after `retry_after_ms`.
+    """
+
+    def __init__(self, posts_per_response=10, latency=0.0, seed=1234, requests_per_minute=500,
+                 rate_limit_every=0, retry_after_ms=20):
+        self.posts_per_response = posts_per_response
+        self.latency = latency
+        self.requests_per_minute = requests_per_minute
+        self.rate_limit_every = rate_limit_every
+        self.retry_after_ms = retry_after_ms
+        self.throttled = 0
+        self._calls = 0
+        self.synthetic = SyntheticData(seed)
+        self.requests = []
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, payload = server.handle(self.path, json.loads(body or b"{}"))
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                for name, value in server.rate_limit_headers(status).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def rate_limit_headers(self, status):
+        headers = {"x-ratelimit-limit-requests": str(self.requests_per_minute),
+                   "x-ratelimit-remaining-requests": str(self.requests_per_minute - 1),
+                   "x-ratelimit-reset-requests": f"{60 / self.requests_per_minute:.3f}s"}
+        if status == 429:
+            headers["retry-after-ms"] = str(self.retry_after_ms)
+        return headers
+
+    def handle(self, path, request):
+        if not path.rstrip("/").endswith("/chat/completions"):
+            return 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}
+        with self._lock:
+            self._calls += 1
+            if self.rate_limit_every and self._calls % self.rate_limit_every == 0:
+                self.throttled += 1
+                return 429, {"error": {"message": "Rate limit reached for requests", "type": "requests",
+                                       "code": "rate_limit_exceeded"}}
+            self.requests.append(request)
+            content = self.synthetic.chatgpt_response(self.posts_per_response)
+        if self.latency:
+            time.sleep(self.latency)
+        prompt_tokens = sum(len(message.get("content", "")) for message in request.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        return 200, {
+            "id": f"chatcmpl-fake-{len(self.requests)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake-model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+
+class FakeGraphServer:
+    """Local HTTP server implementing the media container flow of the Graph publishing API.
+
+    Containers report IN_PROGRESS for `processing_polls` status checks before FINISHED. Every
+    `fail_every`-th container ends in ERROR. `connections` counts TCP connections, so keep-alive reuse shows up
+    as far fewer connections than `requests`.
+    """
+
+    def __init__(self, processing_polls=1, latency=0.0, fail_every=0, access_token="fake-token"):
+        self.processing_polls = processing_polls
+        self.latency = latency
+        self.fail_every = fail_every
+        self.access_token = access_token
+        self.containers = {}
+        self.published = {}
+        self.requests = 0
+        self.connections = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v19.0"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def respond(self, method):
+                url = urlsplit(self.path)
+                params = dict(parse_qsl(url.query))
+                if method == "POST":
+                    body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                    params.update(parse_qsl(body.decode("utf-8")))
+                status, payload = server.handle(method, url.path, params)
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self.respond("GET")
+
+            def do_POST(self):
+                self.respond("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def error(self, status, message):
+        return status, {"error": {"message": message, "type": "OAuthException" if status == 401 else "GraphError"}}
+
+    def handle(self, method, path, params):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            if params.get("access_token") != self.access_token:
+                return self.error(401, "Invalid OAuth access token.")
+            parts = path.strip("/").split("/")[1:]  # drop the version prefix
+            if method == "POST" and len(parts) == 2 and parts[1] == "media":
+                if not params.get("image_url"):
+                    return self.error(400, "The parameter image_url is required.")
+                container_id = f"c{next(self._ids)}"
+                failing = self.fail_every and len(self.containers) % self.fail_every == self.fail_every - 1
+                self.containers[container_id] = {"polls": 0, "failing": bool(failing), "params": params}
+                return 200, {"id": container_id}
+            if method == "POST" and len(parts) == 2 and parts[1] == "media_publish":
+                container = self.containers.get(params.get("creation_id"))
+                if container is None or container["polls"] < self.processing_polls or container["failing"]:
+                    return self.error(400, "Media is not ready to be published.")
+                media_id = f"m{next(self._ids)}"
+                self.published[media_id] = container["params"]
+                return 200, {"id": media_id}
+            if method == "GET" and len(parts) == 1 and parts[0] in self.containers:
+                container = self.containers[parts[0]]
+                container["polls"] += 1
+                if container["failing"]:
+                    return 200, {"status_code": "ERROR", "id": parts[0]}
+                status = "FINISHED" if container["polls"] >= self.processing_polls else "IN_PROGRESS"
+                return 200, {"status_code": status, "id": parts[0]}
+            if method == "GET" and len(parts) == 1 and parts[0] in self.published:
+                return 200, {"id": parts[0], "permalink": f"https://www.instagram.com/p/{parts[0]}/"}
+            return self.error(404, f"Unknown path {method} {path}")
+
+
+class FakeS3Client:
+    """In-memory subset of the boto3 S3 client used by the app."""
+
+    class exceptions:
+        ClientError = ClientError
+
+    def __init__(self, region_name="us-east-1"):
+        self.region_name = region_name
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def _not_found(self, operation_name):
+        return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, operation_name)
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with open(Filename, "rb") as file:
+            self.put_object(Bucket=Bucket, Key=Key, Body=file.read())
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        with self._lock:
+            self.objects[(Bucket, Key)] = {"Body": Body, "LastModified": time.time(),
+                                           "ETag": hashlib.md5(Body).hexdigest()}
+        return {"ETag": self.objects[(Bucket, Key)]["ETag"]}
+
+    def head_bucket(self, Bucket):
+        return {"ResponseMetadata": {"HTTPHeaders": {"x-amz-bucket-region": self.region_name}}}
+
+    def head_object(self, Bucket, Key):
+        with self._lock:
+            obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            raise self._not_found("HeadObject")
+        return {"ContentLength": len(obj["Body"]), "ETag": obj["ETag"]}
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            obj = self.objects.get((Bucket, Key))
+        if obj is None:
+            raise self._not_found("GetObject")
+        return {"Body": obj["Body"], "ContentLength": len(obj["Body"])}
+
+    def delete_object(self, Bucket, Key):
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def generate_presigned_url(self, ClientMethod, Params=None, ExpiresIn=3600, HttpMethod=None):
+        params = Params or {}
+        expires = int(time.time()) + ExpiresIn
+        signature = hashlib.sha256(f"{ClientMethod}:{params}:{expires}".encode("utf-8")).hexdigest()[:32]
+        return (f"https://{params.get('Bucket')}.s3.{self.region_name}.amazonaws.com/{params.get('Key')}"
+                f"?X-Amz-Expires={ExpiresIn}&X-Amz-Signature={signature}")
+
+
+def write_file(path, size):
+    with open(path, "wb") as file:
+        file.write(os.urandom(size))
+    return path
+
+
+class FakeBatchServer:
+    """Local HTTP server implementing the Files and Batches endpoints a batch job uses.
+
+    A batch reports "in_progress" for `processing_polls` status checks, then "completed" with an output file
+    holding a synthetic post array for every request. Every `fail_every`-th request goes to the error file instead.
+    """
+
+    def __init__(self, posts_per_response=5, processing_polls=1, fail_every=0, seed=1234):
+        self.posts_per_response = posts_per_response
+        self.processing_polls = processing_polls
+        self.fail_every = fail_every
+        self.synthetic = SyntheticData(seed)
+        self.files = {}
+        self.batches = {}
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def respond(self, method):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))) if method == "POST" else b""
+                status, payload = server.handle(method, urlsplit(self.path).path, self.headers, body)
+                data = payload.encode("utf-8") if isinstance(payload, str) else json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self.respond("GET")
+
+            def do_POST(self):
+                self.respond("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def new_id(self, prefix):
+        return f"{prefix}-fake-{next(self._ids)}"
+
+    def handle(self, method, path, headers, body):
+        if not headers.get("Authorization", "").startswith("Bearer "):
+            return 401, {"error": {"message": "Missing API key", "type": "invalid_request_error"}}
+        parts = path.strip("/").split("/")[1:]  # drop the version prefix
+        with self._lock:
+            self.requests += 1
+            if method == "POST" and parts == ["files"]:
+                return 200, self.upload(headers, body)
+            if method == "GET" and len(parts) == 3 and parts[0] == "files" and parts[2] == "content":
+                if parts[1] not in self.files:
+                    return 404, {"error": {"message": "No such file", "type": "invalid_request_error"}}
+                return 200, self.files[parts[1]]
+            if method == "POST" and parts == ["batches"]:
+                request = json.loads(body)
+                if request.get("input_file_id") not in self.files:
+                    return 400, {"error": {"message": "Unknown input file", "type": "invalid_request_error"}}
+                batch = {"id": self.new_id("batch"), "object": "batch", "status": "validating", "polls": 0,
+                         "input_file_id": request["input_file_id"], "output_file_id": None, "error_file_id": None,
+                         "request_counts": {"total": 0, "completed": 0, "failed": 0}}
+                self.batches[batch["id"]] = batch
+                return 200, self.public(batch)
+            if method == "GET" and len(parts) == 2 and parts[0] == "batches" and parts[1] in self.batches:
+                return 200, self.public(self.advance(self.batches[parts[1]]))
+        return 404, {"error": {"message": f"Unknown path {path}", "type": "invalid_request_error"}}
+
+    def upload(self, headers, body):
+        from email.parser import BytesParser
+
+        message = BytesParser().parsebytes(f"Content-Type: {headers['Content-Type']}\r\n\r\n".encode() + body)
+        content = next(part.get_payload(decode=True) for part in message.get_payload()
+                       if part.get_param("name", header="content-disposition") == "file")
+        file_id = self.new_id("file")
+        self.files[file_id] = content.decode("utf-8")
+        return {"id": file_id, "object": "file", "purpose": "batch", "bytes": len(content)}
+
+    def advance(self, batch):
+        if batch["status"] in ("validating", "in_progress"):
+            batch["polls"] += 1
+            batch["status"] = "in_progress"
+            if batch["polls"] > self.processing_polls:
+                self.complete(batch)
+        return batch
+
+    def complete(self, batch):
+        outputs, errors = [], []
+        lines = [json.loads(line) for line in self.files[batch["input_file_id"]].splitlines() if line.strip()]
+        for number, line in enumerate(lines, 1):
+            if self.fail_every and number % self.fail_every == 0:
+                errors.append({"id": self.new_id("req"), "custom_id": line["custom_id"], "response": None,
+                               "error": {"code": "server_error", "message": "The model failed to respond"}})
+                continue
+            content = self.synthetic.chatgpt_response(self.posts_per_response)
+            outputs.append({"id": self.new_id("req"), "custom_id": line["custom_id"], "error": None,
+                            "response": {"status_code": 200, "body": {
+                                "model": line["body"].get("model"),
+                                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                             "finish_reason": "stop"}]}}})
+        for key, results in (("output_file_id", outputs), ("error_file_id", errors)):
+            if results:
+                batch[key] = self.new_id("file")
+                self.files[batch[key]] = "".join(json.dumps(result) + "\n" for result in results)
+        batch["status"] = "completed"
+        batch["request_counts"] = {"total": len(lines), "completed": len(outputs), "failed": len(errors)}
+
+    def public(self, batch):
+        return {key: value for key, value in batch.items() if key != "polls"}
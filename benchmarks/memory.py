@@ -0,0 +1,101 @@
+"""Memory used by a loaded post store, as plain dicts versus models.Post records.
+
+Each measurement runs in a fresh interpreter that loads a synthetic posts file the way ContentService does:
+
+    python -m benchmarks.memory --posts 100000 --output bench_memory.json
+
+Reports the growth in resident set size and, in a separate run under tracemalloc, in live Python heap.
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD_FLAG = "--child"
+MODES = ("dicts", "records")
+
+
+def resident_bytes():
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        # Peak rather than current outside Linux; ru_maxrss is in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def child(mode, posts_file, trace):
+    import core
+    import models
+
+    if trace:
+        import tracemalloc
+
+        tracemalloc.start()
+    gc.collect()
+    before = tracemalloc.get_traced_memory()[0] if trace else resident_bytes()
+    start = time.perf_counter()
+    posts = core.load_json(posts_file, model=models.Post if mode == "records" else None)
+    load_s = time.perf_counter() - start
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0] if trace else resident_bytes()
+    print(json.dumps({"count": len(posts), "bytes": after - before, "load_s": load_s}))
+
+
+def run_child(mode, posts_file, trace):
+    command = [sys.executable, "-m", "benchmarks.memory", CHILD_FLAG, mode, posts_file] + (["--trace"] if trace else [])
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Memory run failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_memory.json")
+    args = parser.parse_args(argv)
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")]))
+
+    import core
+    from benchmarks.synthetic import SyntheticData
+
+    data = SyntheticData(args.seed)
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        posts_file = os.path.join(work_dir, "unpublished_posts.json")
+        posts = data.posts(args.posts, data.tags(max(10, args.posts // 100)))
+        core.ensure_post_ids(posts)
+        core.save_json(posts, posts_file)
+        del posts
+        for mode in MODES:
+            rss = run_child(mode, posts_file, trace=False)
+            heap = run_child(mode, posts_file, trace=True)
+            results[mode] = {"rss_mb": round(rss["bytes"] / 2 ** 20, 1), "heap_mb": round(heap["bytes"] / 2 ** 20, 1),
+                             "bytes_per_post": round(heap["bytes"] / args.posts), "load_s": round(rss["load_s"], 3)}
+            print(f"{mode:<8} resident +{results[mode]['rss_mb']:7.1f} MB   heap +{results[mode]['heap_mb']:7.1f} MB   "
+                  f"{results[mode]['bytes_per_post']:5d} B/post   load {results[mode]['load_s']:.2f}s")
+
+    with open(args.output, "w") as file:
+        json.dump({"timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'), "python": sys.version.split()[0],
+                   "posts": args.posts, "results": results}, file, indent=4)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    if CHILD_FLAG in sys.argv:
+        position = sys.argv.index(CHILD_FLAG)
+        child(sys.argv[position + 1], sys.argv[position + 2], "--trace" in sys.argv)
+    else:
+        sys.exit(main())
@@ -0,0 +1,345 @@
+"""Benchmarks for the core data operations at several data sizes.
+
+Runs fully offline against a fake OpenAI endpoint and an in-memory S3 client:
+
+    python -m benchmarks.run --sizes 1000 10000 100000 --output bench_results.json
+    python -m benchmarks.run --compare bench_results.json   # exit status 1 on regressions
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import core
+import dedup
+import models
+import snapshots
+import storage
+import store_watch
+from benchmarks.fakes import FakeGraphServer, FakeOpenAIServer, FakeS3Client, write_file
+from benchmarks.synthetic import SyntheticData
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(timings) * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+    }
+
+
+class BenchmarkSuite:
+    def __init__(self, work_dir, repeat=3, seed=1234):
+        self.work_dir = work_dir
+        self.repeat = repeat
+        self.seed = seed
+
+    def path(self, name):
+        return os.path.join(self.work_dir, name)
+
+    def run_size(self, size):
+        data = SyntheticData(self.seed)
+        tags = data.tags(max(10, size // 100))
+        posts = data.posts(size, tags)
+        customers = data.customers(size)
+        response = data.chatgpt_response(size)
+        posts_file = self.path(f"posts_{size}.json")
+        tags_file = self.path(f"tags_{size}.json")
+        csv_file = self.path(f"export_{size}.csv")
+        core.save_json(posts, posts_file)
+        core.save_json(tags, tags_file)
+
+        results = {}
+        results["save_posts"] = measure(lambda: core.save_json(posts, posts_file), self.repeat)
+        results["load_posts"] = measure(lambda: core.load_json(posts_file), self.repeat)
+        results["load_post_records"] = measure(lambda: core.load_json(posts_file, model=models.Post), self.repeat)
+        results["parse_response"] = measure(lambda: core.posts_from_response(response), self.repeat)
+
+        titles = [post["title"] for post in posts[::max(1, size // 20)]]
+
+        def publish():
+            unpublished, published = posts, []
+            for title in titles:
+                unpublished, published, _ = core.move_post(unpublished, published, title)
+
+        results["publish_20"] = measure(publish, self.repeat)
+
+        def export():
+            if os.path.exists(csv_file):
+                os.remove(csv_file)
+            core.append_export_csv(core.export_rows(posts), csv_file)
+
+        results["export_csv"] = measure(export, self.repeat)
+        results["customer_search"] = measure(lambda: core.search_by_name(customers, "customer 0001"), self.repeat)
+
+        def save_tag():
+            stored = core.load_json(tags_file)
+            core.add_tag(stored, f"tag-new-{time.perf_counter_ns()}")
+            core.save_json(stored, tags_file)
+
+        results["tag_save"] = measure(save_tag, self.repeat)
+
+        core.ensure_post_ids(posts)
+        core.save_json(posts, posts_file)
+        # Live reload: the cost of checking an unchanged store, and of applying one edited post
+        results["store_unchanged_check"] = measure(lambda: storage.changed_on_disk(posts_file), self.repeat)
+        held = core.load_json(posts_file, model=models.Post)
+        fresh = core.load_json(posts_file, model=models.Post)
+        fresh[len(fresh) // 2]["title"] = "edited elsewhere"
+        results["store_apply_one_change"] = measure(lambda: store_watch.apply_changes(held, fresh, "id"), self.repeat)
+
+        # Snapshots: an idle check (stat only), and a snapshot after one store changed (hash + compress it)
+        store = snapshots.Snapshots(self.work_dir, stores=(os.path.basename(posts_file),))
+        store.take()
+        results["snapshot_idle"] = measure(store.take, self.repeat)
+
+        def snapshot_changed():
+            fresh[0]["title"] = f"edited {time.perf_counter_ns()}"
+            core.save_json(fresh, posts_file)
+            store.take()
+
+        results["snapshot_one_change"] = measure(snapshot_changed, self.repeat)
+
+        index = dedup.PostDuplicateIndex()
+        results["dedup_index_build"] = measure(lambda: dedup.PostDuplicateIndex().sync(posts), 1)
+        index.sync(posts)
+        batch = core.posts_from_response(data.chatgpt_response(100))[0]
+        results["dedup_resync"] = measure(lambda: index.sync(posts), self.repeat)
+        results["dedup_check_100"] = measure(lambda: [index.find(post) for post in batch], self.repeat)
+
+        try:
+            import autotag
+        except ImportError:
+            logging.warning("numpy is not installed; skipping tag model benchmarks")
+        else:
+            model = autotag.TagModel()
+            tag_names = [tag["name"] for tag in tags]
+            results["autotag_train"] = measure(lambda: autotag.TagModel().sync([posts], tag_names), 1)
+            model.sync([posts], tag_names)
+            results["autotag_resync"] = measure(lambda: model.sync([posts], tag_names), self.repeat)
+            results["autotag_suggest_100"] = measure(lambda: model.suggest(batch), self.repeat)
+        return results
+
+    def run_s3(self, count=200):
+        client = FakeS3Client()
+        source = write_file(self.path("media.jpg"), 64 * 1024)
+
+        def upload():
+            for i in range(count):
+                key = f"posts/img_{i}.jpg"
+                try:
+                    client.head_object(Bucket="bench-bucket", Key=key)
+                except client.exceptions.ClientError:
+                    pass
+                client.upload_file(source, "bench-bucket", key)
+
+        return {f"s3_head_and_upload_{count}": measure(upload, self.repeat)}
+
+    def run_presign(self, count=5000):
+        try:
+            import boto3  # noqa: F401
+        except ImportError:
+            logging.warning("boto3 is not installed; skipping URL signing benchmark")
+            return {}
+
+        import presign
+
+        # Signing is local, so dummy credentials sign as fast as real ones
+        credentials = ("AKIABENCHMARK", "benchmark-secret", None)
+        client = presign.signing_client(presign.DEFAULT_REGION, credentials)
+        objects = [(presign.DEFAULT_REGION, "bench-bucket", f"posts/img_{i}.jpg") for i in range(count)]
+        expires = presign.DEFAULT_EXPIRES
+
+        results = {
+            f"presign_{count}_serial": measure(lambda: presign.sign_all(objects, lambda _: client, expires), 1),
+            f"presign_{count}_parallel": measure(
+                lambda: presign.sign_all(objects, lambda _: client, expires, credentials), 1),
+        }
+
+        service = core.ContentService(self.work_dir, s3_client=client)
+        service.presigned_urls.regions["bench-bucket"] = presign.DEFAULT_REGION
+        urls = [presign.object_url(bucket, key, region) for region, bucket, key in objects[:1000]]
+
+        def cold():
+            service.presigned_urls.clear()
+            service.presign_urls(urls)
+
+        results["presign_export_1000_cold"] = measure(cold, self.repeat)
+        results["presign_export_1000_cached"] = measure(lambda: service.presign_urls(urls), self.repeat)
+        return results
+
+    def run_chatgpt(self, calls=20, posts_per_response=20, threads=4):
+        try:
+            import openai  # noqa: F401
+        except ImportError:
+            logging.warning("openai is not installed; skipping ChatGPT round-trip benchmark")
+            return {}
+
+        import chatgpt_client
+
+        credentials = self.path("chatgpt_credentials")
+        with open(credentials, "w") as file:
+            file.write("sk-fake")
+
+        results = {}
+        with FakeOpenAIServer(posts_per_response=posts_per_response, seed=self.seed) as server:
+            client = chatgpt_client.ChatGPTClient(credentials, api_base=server.base_url, pool_size=threads)
+
+            def round_trip():
+                response = client.chat_completion(model="gpt-4o-mini",
+                                                  messages=[{"role": "user", "content": "Write posts"}])
+                core.posts_from_response(response['choices'][0]['message']['content'])
+
+            def round_trips():
+                for _ in range(calls):
+                    round_trip()
+
+            def threaded_round_trips():
+                # Fresh threads each run, as the API job pool and batch generation create them
+                with ThreadPoolExecutor(threads) as pool:
+                    list(pool.map(lambda _: round_trip(), range(calls)))
+
+            results[f"chatgpt_round_trip_{calls}"] = measure(round_trips, self.repeat)
+            results[f"chatgpt_round_trip_{calls}_threads_{threads}"] = measure(threaded_round_trips, self.repeat)
+            client.close()
+        return results
+
+    def run_local_provider(self, calls=20, posts_per_response=20):
+        try:
+            import requests  # noqa: F401
+        except ImportError:
+            logging.warning("requests is not installed; skipping local provider benchmark")
+            return {}
+
+        import llm_providers
+
+        with FakeOpenAIServer(posts_per_response=posts_per_response, seed=self.seed) as server:
+            provider = llm_providers.OpenAICompatibleProvider(server.base_url, model="local-model")
+
+            def round_trips():
+                for _ in range(calls):
+                    response = provider.chat_completion(model=provider.model,
+                                                        messages=[{"role": "user", "content": "Write posts"}])
+                    core.posts_from_response(response['choices'][0]['message']['content'])
+
+            results = {f"local_provider_round_trip_{calls}": measure(round_trips, self.repeat)}
+            provider.close()
+        return results
+
+    def run_publish(self, count=100, latency=0.005):
+        try:
+            import requests  # noqa: F401
+        except ImportError:
+            logging.warning("requests is not installed; skipping publisher benchmark")
+            return {}
+
+        import publishers
+
+        data = SyntheticData(self.seed)
+        posts = data.posts(count, data.tags(10), ready_ratio=1.0)
+        core.ensure_post_ids(posts)
+
+        results = {}
+        with FakeGraphServer(latency=latency) as server:
+            for workers in (1, 8):
+                publisher = publishers.GraphPublisher(server.base_url, "1784", server.access_token,
+                                                      max_workers=workers, poll_interval=0)
+                results[f"graph_publish_{count}_workers_{workers}"] = measure(
+                    lambda: publisher.publish_batch(posts), self.repeat)
+                publisher.close()
+        return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Prints median ratios against a previous results file and returns the regressed operations."""
+    regressions = []
+    for size, operations in results["results"].items():
+        for name, stats in operations.items():
+            previous = baseline.get("results", {}).get(size, {}).get(name)
+            if not previous or not previous["median_ms"]:
+                continue
+            ratio = stats["median_ms"] / previous["median_ms"]
+            flag = ""
+            if ratio > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{size}/{name}")
+            print(f"{size:>8} {name:<28} {previous['median_ms']:>10.2f} -> {stats['median_ms']:>10.2f} ms "
+                  f"(x{ratio:.2f}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="median slowdown ratio reported as a regression (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = {
+        "meta": {
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        suite = BenchmarkSuite(work_dir, args.repeat, args.seed)
+        for size in args.sizes:
+            print(f"Running size {size}...")
+            results["results"][str(size)] = suite.run_size(size)
+        results["results"]["network"] = {**suite.run_s3(), **suite.run_presign(), **suite.run_chatgpt(),
+                                         **suite.run_local_provider(), **suite.run_publish()}
+
+    for size, operations in results["results"].items():
+        for name, stats in operations.items():
+            print(f"{size:>8} {name:<28} median {stats['median_ms']:>10.2f} ms")
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=4)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
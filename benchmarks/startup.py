@@ -0,0 +1,85 @@
+"""Time-to-first-window benchmark for the Tk app.
+
+Each run starts a fresh interpreter, imports main, builds App and waits until the root window is mapped:
+
+    python -m benchmarks.startup --runs 5 --output bench_startup.json
+
+Needs a display (use xvfb-run on a headless machine).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD_FLAG = "--child"
+
+
+def child():
+    start = float(os.environ["STARTUP_BENCH_T0"])
+    import_start = time.time()
+    import tkinter as tk
+
+    import main
+    import_done = time.time()
+
+    root = tk.Tk()
+    main.App(root)
+    root.update_idletasks()
+    root.wait_visibility(root)
+    shown = time.time()
+    root.destroy()
+
+    print(json.dumps({
+        "interpreter_start_s": import_start - start,
+        "imports_s": import_done - import_start,
+        "build_s": shown - import_done,
+        "first_window_s": shown - start,
+        "modules_loaded": len(sys.modules),
+        "openai_imported": "openai" in sys.modules,
+        "boto3_imported": "boto3" in sys.modules,
+    }))
+
+
+def run_once(data_dir):
+    env = dict(os.environ, STARTUP_BENCH_T0=repr(time.time()))
+    result = subprocess.run([sys.executable, "-m", "benchmarks.startup", CHILD_FLAG], cwd=data_dir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup run failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--data-dir", default=os.getcwd(), help="directory whose JSON stores the app loads")
+    parser.add_argument("--output", default="bench_startup.json")
+    args = parser.parse_args(argv)
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [repo_root, os.environ.get("PYTHONPATH")]))
+
+    runs = [run_once(args.data_dir) for _ in range(args.runs)]
+    summary = {}
+    for field in ("imports_s", "build_s", "first_window_s"):
+        values = [run[field] for run in runs]
+        summary[field] = {"median": round(statistics.median(values), 4), "min": round(min(values), 4),
+                          "max": round(max(values), 4)}
+        print(f"{field:<16} median {summary[field]['median'] * 1000:8.1f} ms")
+    print(f"openai imported at startup: {runs[0]['openai_imported']}, boto3: {runs[0]['boto3_imported']}")
+
+    with open(args.output, "w") as file:
+        json.dump({"timestamp": time.strftime('%Y-%m-%dT%H:%M:%S%z'), "python": sys.version.split()[0],
+                   "summary": summary, "runs": runs}, file, indent=4)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    if CHILD_FLAG in sys.argv:
+        child()
+    else:
+        sys.exit(main())
@@ -0,0 +1,64 @@
+import json
+import random
+
+WORDS = (
+    "coffee morning launch summer team story behind scenes client win studio design brand "
+    "weekend deal fresh idea tip tuesday motivation quote laugh comedy meme pet office "
+    "community event recap new product sneak peek thank you milestone growth local small "
+    "business handmade craft recipe travel sunset beach city night music art photo"
+).split()
+
+POST_TYPES = ("Photo", "Carousel", "Reel", "Quote Card", "Infographic")
+
+
+class SyntheticData:
+    """Deterministic generators for customers, prompts, tags and posts shaped like the app's JSON stores."""
+
+    def __init__(self, seed=1234):
+        self.random = random.Random(seed)
+
+    def sentence(self, min_words=6, max_words=20):
+        count = self.random.randint(min_words, max_words)
+        return " ".join(self.random.choice(WORDS) for _ in range(count)).capitalize() + "."
+
+    def customers(self, count):
+        return [{"name": f"Customer {i:06d}", "details": self.sentence(20, 60)} for i in range(count)]
+
+    def prompts(self, count):
+        return [{"name": f"Prompt {i:06d}", "details": self.sentence(30, 80)} for i in range(count)]
+
+    def tags(self, count):
+        return [{"name": f"tag-{i:05d}"} for i in range(count)]
+
+    def post(self, index, tags=None, ready_ratio=0.3):
+        ready = self.random.random() < ready_ratio
+        bucket = f"bucket-{self.random.randint(1, 3)}"
+        folder = f"posts/{self.random.randint(2023, 2025)}"
+        return {
+            "title": f"Post {index:07d}",
+            "description": self.sentence(15, 40),
+            "type": self.random.choice(POST_TYPES),
+            "caption": self.sentence(8, 25),
+            "s3_bucket_url": bucket,
+            "s3_folder_path": folder,
+            "s3_file_name": f"https://{bucket}.s3.amazonaws.com/{folder}/img_{index}.jpg" if ready else "",
+            "tag": self.random.choice(tags)["name"] if tags else "Uncategorised",
+            "ready_to_publish": ready,
+        }
+
+    def posts(self, count, tags=None, ready_ratio=0.3):
+        return [self.post(i, tags, ready_ratio) for i in range(count)]
+
+    def response_items(self, count, invalid_ratio=0.02):
+        items = []
+        for _ in range(count):
+            if self.random.random() < invalid_ratio:
+                items.append({"caption": self.sentence(8, 25)})  # missing 'content'
+            else:
+                items.append({"caption": self.sentence(8, 25), "content": self.sentence(15, 40)})
+        return items
+
+    def chatgpt_response(self, count, invalid_ratio=0.02, fenced=True):
+        """Returns response text as ChatGPT tends to send it, optionally wrapped in a ```json fence."""
+        text = json.dumps(self.response_items(count, invalid_ratio), indent=2)
+        return f"```json\n{text}\n```" if fenced else text
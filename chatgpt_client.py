@@ -0,0 +1,148 @@
+"""Long-lived ChatGPT client shared by the app, the CLI and worker threads.
+
+The API key is read from disk once and cached until save_key/delete_key change it. Requests go through one
+pooled keep-alive requests.Session (installed as openai.requestssession), so every worker thread reuses the
+same HTTPS connections instead of opening a new session, and paying a new TLS handshake, on its first call.
+Calls are paced by a shared rate_limit.RateLimiter and retried on 429s, timeouts and connection errors.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+
+import rate_limit
+
+CREDENTIALS_PATH = "~/.chatgpt_credentials"
+
+
+class ChatGPTClient:
+    def __init__(self, credentials_path=CREDENTIALS_PATH, api_base=None, pool_size=8, limiter=None, breaker=None):
+        self.credentials_path = os.path.expanduser(credentials_path)
+        self.api_base = api_base
+        self.pool_size = pool_size
+        self.limiter = limiter or rate_limit.RateLimiter()
+        self.breaker = breaker or rate_limit.CircuitBreaker()
+        self._lock = threading.Lock()
+        self._api_key = None
+        self._key_loaded = False
+        self._session = None
+
+    # Credentials
+
+    @property
+    def api_key(self):
+        """The cached key, or None when no key has been saved."""
+        with self._lock:
+            if not self._key_loaded:
+                self._api_key = self._read_key()
+                self._key_loaded = True
+            return self._api_key
+
+    def _read_key(self):
+        if not os.path.exists(self.credentials_path):
+            return None
+        with open(self.credentials_path, "r") as file:
+            return file.read().strip() or None
+
+    def save_key(self, api_key):
+        with self._lock:
+            with open(self.credentials_path, "w") as file:
+                file.write(api_key)
+            self._api_key = api_key
+            self._key_loaded = True
+        logging.info("ChatGPT API key saved")
+
+    def delete_key(self):
+        """Removes the saved key. Returns False if there was none."""
+        with self._lock:
+            self._api_key = None
+            self._key_loaded = True
+            if not os.path.exists(self.credentials_path):
+                return False
+            os.remove(self.credentials_path)
+        logging.info("ChatGPT API key deleted")
+        return True
+
+    def invalidate(self):
+        """Forgets the cached key so the next call re-reads the credentials file."""
+        with self._lock:
+            self._key_loaded = False
+
+    # Connections
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.hooks["response"].append(self._observe_response)
+                self._session = session
+            return self._session
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _observe_response(self, response, *args, **kwargs):
+        self.limiter.observe_headers(response.headers)
+
+    def chat_completion(self, retry_log=None, **params):
+        """openai.ChatCompletion.create over the shared session, authenticated with the cached key.
+
+        Waits for rate limit capacity first and retries throttled or failed calls with jittered backoff. The
+        error class of every retried attempt is appended to retry_log when given. The last error is raised once
+        retries run out.
+        """
+        import openai
+
+        session = self.session
+        # The SDK keeps one session per thread; handing it ours makes all threads share a single pool
+        if openai.requestssession is not session:
+            openai.requestssession = session
+        if self.api_base:
+            params.setdefault("api_base", self.api_base)
+        estimated = rate_limit.estimate_tokens(params.get("messages", []), params.get("max_tokens"))
+
+        for attempt in itertools.count():
+            if not self.breaker.allow():
+                raise openai.error.APIConnectionError(
+                    f"The API has been unreachable repeatedly; pausing calls for {self.breaker.reset_timeout:.0f}s.")
+            self.limiter.acquire(estimated)
+            try:
+                response = openai.ChatCompletion.create(api_key=self.api_key, **params)
+            except openai.error.RateLimitError as e:
+                if e.code == "insufficient_quota":
+                    raise
+                self.breaker.record_success()
+                error, delay = e, self.limiter.throttled(attempt, e.headers)
+            except (openai.error.APIConnectionError, openai.error.Timeout) as e:
+                self.breaker.record_failure()
+                error, delay = e, self.limiter.backoff_delay(attempt)
+            except openai.error.ServiceUnavailableError as e:
+                error, delay = e, self.limiter.backoff_delay(attempt, rate_limit.retry_after(e.headers))
+            else:
+                self.breaker.record_success()
+                usage = response.get("usage") or {}
+                self.limiter.settle(estimated, usage.get("total_tokens", estimated))
+                return response
+            finally:
+                # A 503, bad key, exhausted quota or any other error says nothing about reachability, but must
+                # not leave a half-open trial slot taken forever
+                self.breaker.release()
+
+            if attempt >= self.limiter.max_retries:
+                raise error
+            if retry_log is not None:
+                retry_log.append(type(error).__name__)
+            logging.warning("%s from ChatGPT; retrying in %.1fs (attempt %d of %d)", type(error).__name__, delay,
+                            attempt + 1, self.limiter.max_retries)
+            time.sleep(delay)
@@ -0,0 +1,330 @@
+"""Headless batch commands over the same stores the Tk app uses.
+
+    python cli.py generate "Prompt name" --runs 5
+    python cli.py upload-dir ./media --bucket my-bucket --folder posts/2024 --attach
+    python cli.py export
+    python cli.py publish-ready
+    python cli.py schedule POST_ID --at "2024-05-01 09:30"
+    python cli.py bulk-edit POST_ID POST_ID --tag Comedy --ready
+    python cli.py dispatch
+    python cli.py autotag --assign
+    python cli.py batch-submit "Prompt name" --runs 200
+    python cli.py batch-status --wait
+    python cli.py serve --port 8765
+    python cli.py snapshots
+    python cli.py restore 20240501-093000.123 --store unpublished_posts.json
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+
+import app_logging
+import batch_jobs
+import core
+import presign
+import profiling
+import scheduler
+import snapshots
+
+
+def cmd_generate(service, args):
+    service.duplicate_policy = args.duplicates
+    service.auto_tag_policy = args.tags
+    total_posts = total_rejected = 0
+    for run in range(args.runs):
+        new_posts, invalid_items = service.generate(args.prompt)
+        total_posts += len(new_posts)
+        total_rejected += len(invalid_items)
+        flagged = sum(1 for post in new_posts if post.get("near_duplicate_of"))
+        print(f"Run {run + 1}/{args.runs}: {len(new_posts)} posts imported ({flagged} flagged as near-duplicates), "
+              f"{len(invalid_items)} rejected")
+    print(f"{total_posts} posts imported, {total_rejected} rejected")
+
+
+def cmd_autotag(service, args):
+    try:
+        with service.lock:
+            tagged = service.auto_tag(service.unpublished_posts, assign=args.assign, min_score=args.min_score)
+            if tagged:
+                service.save_unpublished_posts()
+    except ImportError:
+        raise core.ServiceError("Auto-tagging needs numpy (pip install numpy).")
+    for post in tagged:
+        print(f"{post['title']}: {post['suggested_tag']} ({post['suggested_tag_score']:.2f})")
+    print(f"{len(tagged)} posts {'tagged' if args.assign else 'given tag suggestions'}")
+
+
+def cmd_batch_submit(service, args):
+    jobs = batch_jobs.BatchJobs(service)
+    jobs.load()
+    try:
+        job = jobs.submit([(prompt, args.runs) for prompt in args.prompts])
+    except batch_jobs.BatchError as e:
+        raise core.ServiceError(f"Batch submission failed: {e}")
+    print(f"Batch job {job['id']} submitted: {len(job['requests'])} requests")
+
+
+def cmd_batch_status(service, args):
+    jobs = batch_jobs.BatchJobs(service)
+    jobs.load()
+    while True:
+        client = jobs.client() if jobs.active() else None
+        for job in jobs.active():
+            try:
+                if jobs.refresh(job, client):
+                    new_posts, failures = jobs.import_results(job, client)
+                    print(f"Batch job {job['id']}: {len(new_posts)} posts imported, {len(failures)} requests failed")
+            except batch_jobs.BatchError as e:
+                print(f"Batch job {job['id']}: {e}", file=sys.stderr)
+        if not args.wait or not jobs.active():
+            break
+        time.sleep(args.poll)
+    for job in sorted(jobs.jobs.values(), key=lambda job: job["created_at"]):
+        counts = job.get("request_counts") or {}
+        print(f"{job['id']}  {job['created_at']}  {job['status']:<10} {len(job['requests']):>5} requests  "
+              f"{counts.get('completed', 0)} done  {job['posts_imported']} posts  {', '.join(job['prompts'])}")
+
+
+def cmd_upload_dir(service, args):
+    uploaded = service.upload_directory(args.directory, args.bucket, args.folder, attach=args.attach)
+    for file_path, url in uploaded:
+        print(f"{file_path} -> {url}")
+    print(f"{len(uploaded)} files uploaded")
+
+
+def cmd_export(service, args):
+    count = service.export_ready(args.output, presign_urls=not args.no_presign, expires_in=args.expires)
+    print(f"{count} posts exported to '{args.output or service.path(core.EXPORT_CSV_FILE)}'")
+
+
+def cmd_publish_ready(service, args):
+    published, failures = service.publish_ready()
+    for post in published:
+        print(f"Published: {post['title']}")
+    for post, error in failures:
+        print(f"Failed: {post['title']}: {error}", file=sys.stderr)
+    print(f"{len(published)} posts published, {len(failures)} failed")
+
+
+def cmd_schedule(service, args):
+    try:
+        scheduler.parse_publish_at(args.at)
+    except ValueError:
+        raise core.ServiceError(f"Publish time must look like 2024-05-01 09:30, not '{args.at}'.")
+    with service.lock:
+        post = next((post for post in service.unpublished_posts if post.get("id") == args.post_id), None)
+        if post is None:
+            raise core.ServiceError(f"Post {args.post_id} is not in the Unpublished section.")
+        post["ready_to_publish"] = True
+        post["publish_at"] = args.at
+        service.save_unpublished_posts()
+    publish_queue = scheduler.PublishQueue(service.path(core.PUBLISH_QUEUE_FILE))
+    publish_queue.load()
+    publish_queue.sync_from_posts(service.unpublished_posts)
+    print(f"'{post['title']}' scheduled for {args.at}")
+
+
+def cmd_bulk_edit(service, args):
+    if args.delete:
+        print(f"{service.bulk_delete(args.post_ids)} posts deleted")
+        return
+    fields = {"tag": args.tag, "ready_to_publish": args.ready, "s3_bucket_url": args.bucket,
+              "s3_folder_path": args.folder}
+    fields = {name: value for name, value in fields.items() if value is not None}
+    if not fields:
+        raise core.ServiceError("Nothing to change: pass --tag, --ready/--not-ready, --bucket, --folder or --delete.")
+    updated = service.bulk_update(args.post_ids, **fields)
+    if "ready_to_publish" in fields:
+        publish_queue = scheduler.PublishQueue(service.path(core.PUBLISH_QUEUE_FILE))
+        publish_queue.load()
+        publish_queue.sync_from_posts(service.unpublished_posts)
+    print(f"{len(updated)} posts updated, {len(set(args.post_ids)) - len(updated)} not found")
+
+
+def cmd_dispatch(service, args):
+    publish_queue = scheduler.PublishQueue(service.path(core.PUBLISH_QUEUE_FILE))
+    publish_queue.load()
+    publish_queue.sync_from_posts(service.unpublished_posts)
+
+    def publish(post_id):
+        with service.lock:
+            service.load_all()  # pick up edits made in the app since the last poll
+            service.publish_by_id(post_id)
+
+    def report(entry, error):
+        if error is None:
+            print(f"Published: {entry['title']}")
+        else:
+            print(f"Failed: {entry['title']}: {error}", file=sys.stderr)
+
+    dispatcher = scheduler.PublishDispatcher(publish_queue, publish, on_result=report)
+    dispatcher.start()
+    print(f"{len(publish_queue.entries)} posts queued; checking {service.data_dir} for new schedules "
+          f"every {args.poll}s")
+    try:
+        while dispatcher.is_alive():
+            time.sleep(args.poll)
+            with service.lock:
+                service.load_all()
+                publish_queue.sync_from_posts(service.unpublished_posts)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.stop()
+
+
+def cmd_snapshot(service, args):
+    snapshot_id = snapshots.Snapshots(service.data_dir).take()
+    print(f"Snapshot {snapshot_id} taken" if snapshot_id else "No store changed since the last snapshot")
+
+
+def cmd_snapshots(service, args):
+    store = snapshots.Snapshots(service.data_dir)
+    for snapshot_id in store.ids():
+        manifest = store.load(snapshot_id)
+        print(f"{snapshot_id}  {', '.join(manifest['changed']) or '(stores removed)'}")
+
+
+def cmd_restore(service, args):
+    restored = snapshots.Snapshots(service.data_dir).restore(args.snapshot_id, args.store)
+    if restored:
+        print(f"Restored {', '.join(restored)} from snapshot {args.snapshot_id}")
+    else:
+        print("Every store already matches the snapshot")
+
+
+def cmd_serve(service, args):
+    import api_server
+
+    server = api_server.ApiServer(service, args.host, args.port, args.token)
+    print(f"Serving {service.data_dir} on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default=".", help="directory holding the JSON stores (default: .)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log at INFO level")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile the command and save the capture under profiles/ in the data dir")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="send a saved prompt to ChatGPT and import the posts")
+    generate.add_argument("prompt", help="name of the prompt in prompts.json")
+    generate.add_argument("--runs", type=int, default=1, help="number of times to submit the prompt")
+    generate.add_argument("--duplicates", choices=core.DUPLICATE_POLICIES, default="flag",
+                          help="flag, drop or keep posts that nearly duplicate existing ones (default: flag)")
+    generate.add_argument("--tags", choices=core.AUTO_TAG_POLICIES, default="suggest",
+                          help="suggest, assign or skip tags for the new posts (default: suggest)")
+    generate.set_defaults(func=cmd_generate)
+
+    autotag = commands.add_parser("autotag", help="suggest tags for untagged unpublished posts from the tagged ones")
+    autotag.add_argument("--assign", action="store_true", help="set the tag instead of only storing a suggestion")
+    autotag.add_argument("--min-score", type=float, default=core.AUTO_TAG_MIN_SCORE,
+                         help=f"minimum similarity to a tag (default: {core.AUTO_TAG_MIN_SCORE})")
+    autotag.set_defaults(func=cmd_autotag)
+
+    batch_submit = commands.add_parser("batch-submit",
+                                       help="submit prompts as one Batch API job (cheaper, results within 24h)")
+    batch_submit.add_argument("prompts", nargs="+", help="names of prompts in prompts.json")
+    batch_submit.add_argument("--runs", type=int, default=1, help="requests per prompt")
+    batch_submit.set_defaults(func=cmd_batch_submit)
+
+    batch_status = commands.add_parser("batch-status", help="check batch jobs and import the finished ones")
+    batch_status.add_argument("--wait", action="store_true", help="keep polling until every job has finished")
+    batch_status.add_argument("--poll", type=float, default=batch_jobs.POLL_SECONDS,
+                              help="seconds between checks with --wait")
+    batch_status.set_defaults(func=cmd_batch_status)
+
+    upload_dir = commands.add_parser("upload-dir", help="upload every image in a directory to S3")
+    upload_dir.add_argument("directory")
+    upload_dir.add_argument("--bucket", required=True)
+    upload_dir.add_argument("--folder", required=True)
+    upload_dir.add_argument("--attach", action="store_true",
+                            help="store each URL on the next unpublished post without media")
+    upload_dir.set_defaults(func=cmd_upload_dir)
+
+    export = commands.add_parser("export", help="append ready posts to the export CSV")
+    export.add_argument("--output", help="CSV file (default: unpublished_posts.csv in the data dir)")
+    export.add_argument("--no-presign", action="store_true", help="write the stored media URLs as they are")
+    export.add_argument("--expires", type=int, default=presign.DEFAULT_EXPIRES,
+                        help="lifetime of the pre-signed URLs in seconds (default and maximum: 7 days)")
+    export.set_defaults(func=cmd_export)
+
+    publish_ready = commands.add_parser("publish-ready", help="publish every ready post through the configured publisher")
+    publish_ready.set_defaults(func=cmd_publish_ready)
+
+    schedule = commands.add_parser("schedule", help="mark a post ready and queue it for a publish time")
+    schedule.add_argument("post_id")
+    schedule.add_argument("--at", required=True, help="local time, YYYY-MM-DD HH:MM")
+    schedule.set_defaults(func=cmd_schedule)
+
+    bulk_edit = commands.add_parser("bulk-edit", help="change or delete many unpublished posts in one save")
+    bulk_edit.add_argument("post_ids", nargs="+")
+    bulk_edit.add_argument("--tag")
+    ready = bulk_edit.add_mutually_exclusive_group()
+    ready.add_argument("--ready", dest="ready", action="store_true", default=None, help="mark ready to publish")
+    ready.add_argument("--not-ready", dest="ready", action="store_false", help="clear the ready flag")
+    bulk_edit.add_argument("--bucket", help="S3 bucket URL")
+    bulk_edit.add_argument("--folder", help="S3 folder path")
+    bulk_edit.add_argument("--delete", action="store_true", help="delete the posts instead")
+    bulk_edit.set_defaults(func=cmd_bulk_edit)
+
+    dispatch = commands.add_parser("dispatch", help="publish queued posts as they fall due")
+    dispatch.add_argument("--poll", type=float, default=30.0,
+                          help="seconds between checks of the stores for new schedules")
+    dispatch.set_defaults(func=cmd_dispatch)
+
+    snapshot = commands.add_parser("snapshot", help="snapshot the stores that changed since the last snapshot")
+    snapshot.set_defaults(func=cmd_snapshot, load_stores=False)
+
+    list_snapshots = commands.add_parser("snapshots", help="list snapshots and the stores each one changed")
+    list_snapshots.set_defaults(func=cmd_snapshots, load_stores=False)
+
+    restore = commands.add_parser("restore", help="put stores back as they were in a snapshot")
+    restore.add_argument("snapshot_id", help="id shown by 'snapshots'")
+    restore.add_argument("--store", action="append", help="store file to restore (repeatable; default: all)")
+    restore.set_defaults(func=cmd_restore, load_stores=False)
+
+    serve = commands.add_parser("serve", help="run the local HTTP API over the stores")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--token", help="require 'Authorization: Bearer TOKEN' on every request")
+    serve.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    app_logging.setup_logging(logging.INFO if args.verbose else logging.WARNING)
+
+    service = core.ContentService(args.data_dir)
+    profiler = profiling.Profiler(service.path(profiling.PROFILES_DIR))
+    if args.profile:
+        profiler.start()
+    try:
+        # Snapshot commands must work even when a store is too damaged to load
+        if getattr(args, "load_stores", True):
+            service.load_all()
+        args.func(service, args)
+    except core.ServiceError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        logging.exception("Command %s failed", args.command)
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    finally:
+        result = profiler.stop()
+        if result is not None:
+            print(f"Profile saved to {result.pstats_path} and {result.collapsed_path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,910 @@
+import csv
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+import chatgpt_client
+import dedup
+import ledger
+import llm_providers
+import models
+import perf
+import presign
+import publishers
+import storage
+import store_watch
+
+UNPUBLISHED_POSTS_FILE = "unpublished_posts.json"
+PUBLISHED_POSTS_FILE = "published_posts.json"
+CUSTOMER_INFO_FILE = "customer_info.json"
+PROMPTS_FILE = "prompts.json"
+TAGS_FILE = "tags.json"
+PROMPT_CUSTOMER_INFO_FILE = "prompt_customer_info.json"
+EXPORT_CSV_FILE = "unpublished_posts.csv"
+PUBLISHED_EXPORT_CSV_FILE = "published_posts.csv"
+PROMPT_LOG_FILE = "chatgpt_prompts.log"
+PUBLISH_QUEUE_FILE = "publish_queue.json"
+CHATGPT_CREDENTIALS_PATH = chatgpt_client.CREDENTIALS_PATH
+
+# The stores a ContentService holds in memory: file name -> (attribute, record model, field identifying a record)
+STORES = {
+    CUSTOMER_INFO_FILE: ("customer_info_list", models.Customer, "name"),
+    PROMPTS_FILE: ("prompts_list", models.Prompt, "name"),
+    UNPUBLISHED_POSTS_FILE: ("unpublished_posts", models.Post, "id"),
+    PUBLISHED_POSTS_FILE: ("published_posts", models.Post, "id"),
+}
+
+CHATGPT_MODEL = "gpt-4o-mini"
+CHATGPT_SYSTEM_MESSAGE = "You are a specialist in social media, comedy, and storytelling. Your task is to generate a JSON array of objects, each containing a 'caption' field and a 'content' field. Output the response in JSON format only without any additional text or explanations."
+CHATGPT_MAX_TOKENS = 800
+
+MEDIA_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Where a generated post came from; copied from response items onto the new post when present
+PROVENANCE_FIELDS = ("source_prompt", "batch_job")
+
+# What import_response does with posts that look like near-duplicates of existing ones
+DUPLICATE_POLICIES = ("flag", "drop", "keep")
+# Post fields a bulk edit may set on many unpublished posts at once
+BULK_EDIT_FIELDS = ("tag", "ready_to_publish", "s3_bucket_url", "s3_folder_path")
+# Whether import_response stores tag suggestions on new posts, applies them, or does nothing
+AUTO_TAG_POLICIES = ("suggest", "assign", "off")
+AUTO_TAG_MIN_SCORE = 0.2
+
+
+class ServiceError(Exception):
+    """A failure that should be reported to the user (missing key, unknown post, ...) rather than a crash."""
+
+
+class NotPublishable(ServiceError):
+    """The post was deleted or is no longer marked ready, so retrying the publish won't help."""
+
+
+def load_json(file_path, default=None, model=None):
+    """Loads JSON data from file_path.
+
+    With a models.Record subclass as `model`, each object in a list store is converted to that record.
+    Returns `default` when the file is missing or holds a different type. Decode and I/O errors are raised.
+    """
+    if default is None:
+        default = []
+    if not os.path.exists(file_path):
+        logging.warning("%s does not exist. Returning default value.", file_path)
+        return default
+    with perf.span("load_from_file") as timer:
+        text = storage.read_text(file_path)
+        timer.add_bytes(len(text))
+        return parse_json(text, file_path, default, model)
+
+
+def parse_json(text, file_path, default=None, model=None):
+    """Parses the text of a store like load_json; file_path is only used in log messages."""
+    if default is None:
+        default = []
+    data = json.loads(text)
+    if model and isinstance(data, list):
+        # Parsing plain dicts and converting once is ~2x faster than an object_pairs_hook building each record
+        model.from_dicts(data)
+    if isinstance(data, type(default)):
+        logging.info("Data successfully loaded from %s", file_path)
+        return data
+    logging.error("Expected %s from %s but got %s", type(default), file_path, type(data))
+    return default
+
+
+def save_json(data, file_path):
+    """Saves data under the store lock, merging in concurrent changes (data is updated in place).
+
+    Lists of models.Record are written as plain objects; after a merge only the records that changed are rebuilt.
+    Returns the list of conflicting fields where this writer's value was kept.
+    """
+    records = isinstance(data, list) and any(isinstance(item, models.Record) for item in data)
+    stored = models.to_dicts(data) if records else data
+    originals = {id(plain): item for plain, item in zip(stored, data)} if records else None
+    with perf.span("save_to_file") as timer:
+        text, conflicts = storage.write_json(stored, file_path)
+        timer.add_bytes(len(text))
+    if records and (len(stored) != len(originals) or any(id(plain) not in originals for plain in stored)):
+        # The merge swapped in new objects for records changed elsewhere; ours that it kept stay as they are
+        model = type(next(item for item in data if isinstance(item, models.Record)))
+        data[:] = [originals[id(plain)] if id(plain) in originals else model.from_dict(plain) for plain in stored]
+    logging.info("Data successfully saved to %s", file_path)
+    return conflicts
+
+
+def post_index(posts, post_id):
+    """Index of the post with post_id in posts, or None."""
+    if post_id is None:
+        return None
+    return next((index for index, post in enumerate(posts) if post.get("id") == post_id), None)
+
+
+def sanitize_json(json_string):
+    if json_string.startswith("```json"):
+        json_string = json_string[7:].strip()  # Remove the ```json prefix
+    if json_string.endswith("```"):
+        json_string = json_string[:-3].strip()  # Remove the ``` suffix
+
+    # Ensure the JSON string ends correctly
+    try:
+        json_data = json.loads(json_string)
+        if isinstance(json_data, list):
+            return json_string
+        else:
+            raise ValueError("Expected a list of JSON objects.")
+    except ValueError:
+        return f"[{json_string}]"
+
+
+def is_valid_json(json_string):
+    try:
+        json.loads(json_string)
+        return True
+    except ValueError:
+        return False
+
+
+def new_post_id():
+    return uuid.uuid4().hex
+
+
+def ensure_post_ids(posts):
+    """Gives every post a stable "id" (posts saved before ids existed have none). Returns True if any was added."""
+    changed = False
+    for post in posts:
+        if not post.get("id"):
+            post["id"] = new_post_id()
+            changed = True
+    return changed
+
+
+def new_unpublished_post(item):
+    return models.Post.from_dict({
+        "id": new_post_id(),
+        "title": item.get("title", "Untitled Post"),
+        "description": item["content"],  # Use 'content' for description
+        "type": item.get("type", "Unknown Type"),
+        "caption": item["caption"],
+        "s3_bucket_url": "",
+        "s3_folder_path": "",
+        "s3_file_name": "",
+        "ready_to_publish": False,
+        **{field: item[field] for field in PROVENANCE_FIELDS if item.get(field)}
+    })
+
+
+def posts_from_response(response):
+    """Parses a ChatGPT response into (new_posts, invalid_items).
+
+    Raises json.JSONDecodeError or ValueError when the response is not a JSON array.
+    """
+    with perf.span("parse_chatgpt_response", len(response.encode("utf-8"))):
+        # Attempt to sanitize the JSON response
+        response = sanitize_json(response)
+
+        # Load the response as JSON
+        items = json.loads(response)
+
+        # Validate the response structure
+        if not isinstance(items, list):
+            raise ValueError("The response is not a valid JSON array.")
+
+        new_posts = []
+        invalid_items = []
+        for item in items:
+            # Ensure each post is a dictionary and contains the 'caption' and 'content' fields
+            if isinstance(item, dict) and 'caption' in item and 'content' in item:
+                new_posts.append(new_unpublished_post(item))
+            else:
+                invalid_items.append(item)
+        return new_posts, invalid_items
+
+
+def export_rows(posts):
+    """Returns (caption, url) rows for posts that are ready to publish and have both fields."""
+    rows = []
+    for post in posts:
+        if post.get('ready_to_publish', False):  # Check if 'Ready to Publish' is ticked
+            caption = post.get('caption', '').strip()
+            s3_url = post.get('s3_file_name', '').strip()
+
+            # Ensure both caption and URL are present
+            if caption and s3_url:
+                rows.append((caption, s3_url))
+    return rows
+
+
+def append_export_csv(rows, file_path=EXPORT_CSV_FILE):
+    # Determine if the CSV file already exists
+    file_exists = os.path.isfile(file_path)
+
+    with perf.span("export_to_csv") as timer, open(file_path, mode='a', newline='') as file:
+        start_offset = file.tell()
+        writer = csv.writer(file)
+        if not file_exists:
+            writer.writerow(['Caption', 'URL'])  # Write header if file doesn't exist
+
+        writer.writerows(rows)
+        timer.add_bytes(file.tell() - start_offset)
+
+
+def move_post(unpublished_posts, published_posts, post_title):
+    """Moves the first post titled post_title to published_posts.
+
+    Returns (unpublished_posts, published_posts, moved_post); moved_post is None when no post matches.
+    """
+    post_to_publish = next((post for post in unpublished_posts if post['title'] == post_title), None)
+    if post_to_publish is None:
+        return unpublished_posts, published_posts, None
+    published_posts = published_posts + [post_to_publish]
+    unpublished_posts = [post for post in unpublished_posts if post['title'] != post_title]
+    return unpublished_posts, published_posts, post_to_publish
+
+
+def search_by_name(items, search_text):
+    search_text = search_text.lower()
+    return [item['name'] for item in items if search_text in item['name'].lower()]
+
+
+def add_tag(tags, tag_name):
+    """Appends tag_name to tags unless it already exists. Returns True when the tag was added."""
+    if any(tag['name'] == tag_name for tag in tags):
+        return False
+    tags.append({"name": tag_name})
+    return True
+
+
+def generate_unique_filename(file_name):
+    name, ext = os.path.splitext(file_name)
+    unique_name = f"{name}_{int(time.time())}{ext}"
+    return unique_name
+
+
+def log_prompt(prompt, filename=PROMPT_LOG_FILE):
+    with open(filename, "a", encoding="utf-8") as log_file:
+        log_file.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - PROMPT: {prompt}\n")
+
+
+class ContentService:
+    """GUI-independent operations over the JSON stores, ChatGPT and S3.
+
+    Methods raise ServiceError (or the underlying SDK/IO exception) instead of showing dialogs, so the
+    same code backs the Tk app, the CLI and scheduled jobs.
+    """
+
+    def __init__(self, data_dir=".", s3_client=None, credentials_path=CHATGPT_CREDENTIALS_PATH, publisher=None,
+                 publisher_config_path=publishers.PUBLISHER_CONFIG_PATH, duplicate_policy="flag",
+                 auto_tag_policy="suggest", provider_config_path=llm_providers.PROVIDER_CONFIG_PATH):
+        self.data_dir = data_dir
+        self.duplicate_policy = duplicate_policy
+        self.auto_tag_policy = auto_tag_policy
+        self._tag_model = None
+        self._tag_model_lock = threading.Lock()
+        self._duplicate_index = dedup.PostDuplicateIndex()
+        self._duplicate_index_lock = threading.Lock()
+        self.publisher_config_path = publisher_config_path
+        self._publisher = publisher
+        self.chatgpt = chatgpt_client.ChatGPTClient(credentials_path)
+        self.provider_config_path = provider_config_path
+        self._providers = None
+        self.customer_info_list = []
+        self.prompts_list = []
+        self.unpublished_posts = []
+        self.published_posts = []
+        self._s3_client = s3_client
+        # An injected client (tests, benchmarks) also signs URLs; otherwise each bucket region gets its own client
+        self._s3_client_injected = s3_client is not None
+        self._signing_clients = {}
+        self._presigned_urls = None
+        # Held while the lists above are read-modified-written so worker threads can share one service
+        self.lock = threading.RLock()
+
+    def path(self, file_name):
+        return os.path.join(self.data_dir, file_name)
+
+    # Stores
+
+    def load_all(self):
+        self.customer_info_list = load_json(self.path(CUSTOMER_INFO_FILE), model=models.Customer)
+        self.prompts_list = load_json(self.path(PROMPTS_FILE), model=models.Prompt)
+        self.unpublished_posts = load_json(self.path(UNPUBLISHED_POSTS_FILE), model=models.Post)
+        self.published_posts = load_json(self.path(PUBLISHED_POSTS_FILE), model=models.Post)
+        ensure_post_ids(self.unpublished_posts)
+        ensure_post_ids(self.published_posts)
+
+    def read_store_update(self, file_name):
+        """Reads one of STORES if it changed on disk since this service last read or saved it.
+
+        Returns a store_watch.StoreUpdate, or None when nothing changed (or the file is gone). Safe to call from a
+        worker thread: the parse happens here and nothing in memory changes until apply_store_update().
+        """
+        path = self.path(file_name)
+        expected = storage.last_state(path)
+        if not storage.changed_on_disk(path) or not os.path.exists(path):
+            return None
+        _, model, key = STORES[file_name]
+        with perf.span("load_from_file") as timer:
+            state = storage.read_state(path)
+            timer.add_bytes(len(state.text))
+            records = parse_json(state.text, path, [], model)
+        if key == "id":
+            ensure_post_ids(records)
+        return store_watch.StoreUpdate(file_name, expected, state, records)
+
+    def apply_store_update(self, update):
+        """Brings the in-memory store up to date with a StoreUpdate, replacing only the records that changed.
+
+        Returns the store_watch.StoreChanges, or None if the store was read or saved since the update was read.
+        """
+        attribute, _, key = STORES[update.file_name]
+        with self.lock:
+            if not storage.adopt_state(self.path(update.file_name), update.state, update.expected):
+                return None
+            changes = store_watch.apply_changes(getattr(self, attribute), update.records, key)
+        if changes:
+            logging.info("Reloaded %s: %s", update.file_name, changes)
+        return changes
+
+    def reload_store(self, file_name):
+        """Reloads one of STORES if it changed on disk. Returns the StoreChanges, or None if it didn't change."""
+        update = self.read_store_update(file_name)
+        return self.apply_store_update(update) if update is not None else None
+
+    def save_customer_info(self):
+        save_json(self.customer_info_list, self.path(CUSTOMER_INFO_FILE))
+
+    def save_prompts(self):
+        save_json(self.prompts_list, self.path(PROMPTS_FILE))
+
+    def save_unpublished_posts(self):
+        save_json(self.unpublished_posts, self.path(UNPUBLISHED_POSTS_FILE))
+
+    def save_published_posts(self):
+        save_json(self.published_posts, self.path(PUBLISHED_POSTS_FILE))
+
+    def load_tags(self):
+        return load_json(self.path(TAGS_FILE), default=[])
+
+    def save_tags(self, tags):
+        save_json(tags, self.path(TAGS_FILE))
+
+    def find_post(self, post_id):
+        """Returns (posts_list, index) for the post with post_id in either list, or (None, None)."""
+        for posts in (self.unpublished_posts, self.published_posts):
+            for index, post in enumerate(posts):
+                if post.get("id") == post_id:
+                    return posts, index
+        return None, None
+
+    def find_prompt(self, prompt_name):
+        prompt = next((prompt for prompt in self.prompts_list if prompt['name'] == prompt_name), None)
+        if prompt is None:
+            raise ServiceError(f"No prompt named '{prompt_name}'.")
+        return prompt
+
+    # Bulk edits
+
+    def bulk_update(self, post_ids, **fields):
+        """Sets fields (from BULK_EDIT_FIELDS) on the unpublished posts with post_ids and saves once.
+
+        Returns the ids of the posts updated; ids no longer in Unpublished are skipped.
+        """
+        unknown = set(fields) - set(BULK_EDIT_FIELDS)
+        if unknown:
+            raise ServiceError(f"Can't bulk edit {', '.join(sorted(unknown))}.")
+        if not fields:
+            return []
+        wanted = set(post_ids)
+        with self.lock:
+            updated = []
+            for post in self.unpublished_posts:
+                if post.get("id") in wanted:
+                    post.update(fields)
+                    if "tag" in fields:
+                        # Like a tag saved from the form, a bulk-set tag counts as confirmed
+                        post.pop("tag_source", None)
+                    updated.append(post["id"])
+            if updated:
+                self.save_unpublished_posts()
+        logging.info("Bulk edit of %s on %d posts", ", ".join(sorted(fields)), len(updated))
+        return updated
+
+    def bulk_delete(self, post_ids):
+        """Removes the unpublished posts with post_ids and saves once. Returns how many were removed."""
+        wanted = set(post_ids)
+        with self.lock:
+            remaining = [post for post in self.unpublished_posts if post.get("id") not in wanted]
+            removed = len(self.unpublished_posts) - len(remaining)
+            if removed:
+                self.unpublished_posts[:] = remaining
+                self.save_unpublished_posts()
+        logging.info("Bulk delete removed %d posts", removed)
+        return removed
+
+    # Generation
+
+    def build_prompt(self, prompt_name):
+        """Returns the prompt text with the details of its selected customers prepended."""
+        prompt = self.find_prompt(prompt_name)
+        pre_appended_info = ""
+        all_prompt_data = load_json(self.path(PROMPT_CUSTOMER_INFO_FILE), default={})
+        selected_customers = all_prompt_data.get(prompt_name, {})
+
+        for customer_name, selected in selected_customers.items():
+            if selected:
+                customer = next((cust for cust in self.customer_info_list if cust['name'] == customer_name), None)
+                if customer:
+                    pre_appended_info += f"{customer_name}: {customer['details']}\n"
+
+        return pre_appended_info + "\n" + prompt['details']
+
+    def load_chatgpt_key(self):
+        api_key = self.chatgpt.api_key
+        if not api_key:
+            raise ServiceError("No ChatGPT API key found. Please save the API key first.")
+        return api_key
+
+    def save_chatgpt_key(self, api_key):
+        self.chatgpt.save_key(api_key)
+
+    def delete_chatgpt_key(self):
+        return self.chatgpt.delete_key()
+
+    @property
+    def providers(self):
+        if self._providers is None:
+            try:
+                self._providers = llm_providers.load_providers(self.chatgpt, self.provider_config_path)
+            except (OSError, ValueError, TypeError) as e:
+                raise ServiceError(f"Invalid LLM provider config: {e}")
+        return self._providers
+
+    def reload_providers(self):
+        if self._providers is not None:
+            self._providers.close()
+        self._providers = None
+
+    def completion_request(self, prompt_name=None):
+        """Returns (provider, system_prompt, params) for a prompt, applying its provider/model/sampling keys."""
+        prompt = {}
+        if prompt_name is not None:
+            with self.lock:
+                prompt = dict(self.find_prompt(prompt_name))
+        try:
+            provider = self.providers.get(prompt.get("provider"))
+        except (TypeError, ValueError) as e:
+            raise ServiceError(str(e))
+        system_prompt, params = llm_providers.request_params(provider, prompt, CHATGPT_MODEL, CHATGPT_SYSTEM_MESSAGE,
+                                                             CHATGPT_MAX_TOKENS)
+        return provider, system_prompt, params
+
+    def request_completion(self, prompt, call_record, prompt_name=None):
+        """Sends the prompt to the prompt's LLM provider and returns the sanitized JSON response text.
+
+        SDK and provider errors propagate to the caller; the call record is filled in either way.
+        """
+        try:
+            provider, system_prompt, params = self.completion_request(prompt_name)
+        except ServiceError as e:
+            ledger.record_error(call_record, e)
+            raise
+        if provider.needs_api_key:
+            try:
+                self.load_chatgpt_key()
+            except ServiceError:
+                call_record["error"] = "MissingAPIKey"
+                raise
+
+        call_record["provider"] = provider.name
+        call_record["model"] = params["model"]
+        start = time.perf_counter()
+        retries = []
+        try:
+            with perf.span("submit_prompt_to_chatgpt", len(prompt.encode("utf-8"))) as timer:
+                response = provider.chat_completion(
+                    retry_log=retries,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    **params
+                )
+                timer.add_bytes(len(response['choices'][0]['message']['content'].encode("utf-8")))
+        except Exception as e:
+            ledger.record_error(call_record, e)
+            raise
+        finally:
+            call_record["retries"] = len(retries)
+        call_record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        call_record["model"] = response.get('model', call_record["model"])
+        call_record["usage"] = dict(response.get('usage') or {}) or None
+
+        response_text = response['choices'][0]['message']['content'].strip()
+        call_record["response"] = response_text
+        call_record["response_chars"] = len(response_text)
+        logging.info("ChatGPT response received: %d chars", len(response_text))
+
+        # Validate and sanitize JSON response
+        response_text = sanitize_json(response_text)
+        if not is_valid_json(response_text):
+            error = json.JSONDecodeError("Response is not in valid JSON format", response_text, 0)
+            ledger.record_error(call_record, error)
+            raise error
+        return response_text
+
+    def warm_duplicate_index(self):
+        """Indexes the whole corpus up front (safe to run on a background thread)."""
+        with self.lock:
+            post_lists = list(self.unpublished_posts), list(self.published_posts)
+        with self._duplicate_index_lock:
+            self._duplicate_index.sync(*post_lists)
+
+    def check_duplicates(self, new_posts):
+        """Checks a batch of new posts against all unpublished and published posts and against each other.
+
+        Returns [(post, (matching_post_id, field, similarity))].
+        """
+        with self._duplicate_index_lock:
+            self._duplicate_index.sync(self.unpublished_posts, self.published_posts)
+            return self._duplicate_index.check_batch(new_posts)
+
+    # Tagging
+
+    def suggest_tags(self, posts, top=1):
+        """Returns up to `top` (tag, score) suggestions per post from a model of all tagged posts and tags.json.
+
+        The model is built on first use and afterwards only learns posts whose tag or text changed.
+        """
+        import autotag  # pulls in numpy
+
+        tag_names = [tag['name'] for tag in self.load_tags() if isinstance(tag, dict) and tag.get('name')]
+        # Copy the post lists and release self.lock before training, so the two locks are never held together
+        with self.lock:
+            post_lists = [list(self.unpublished_posts), list(self.published_posts)]
+        with self._tag_model_lock:
+            if self._tag_model is None:
+                self._tag_model = autotag.TagModel()
+            self._tag_model.sync(post_lists, tag_names)
+            return self._tag_model.suggest(posts, top)
+
+    def auto_tag(self, posts, assign=False, min_score=AUTO_TAG_MIN_SCORE):
+        """Stores a suggested_tag on every untagged post the model is confident about; assign=True also sets tag.
+
+        Auto-assigned tags are marked tag_source="auto" and are not learned from until someone confirms them.
+        Returns the posts that got a suggestion.
+        """
+        untagged = [post for post in posts if (post.get('tag') or '').strip() in ("", "Uncategorised")]
+        tagged = []
+        for post, ranked in zip(untagged, self.suggest_tags(untagged)):
+            if ranked and ranked[0][1] >= min_score:
+                tag, score = ranked[0]
+                post['suggested_tag'] = tag
+                post['suggested_tag_score'] = round(score, 2)
+                if assign:
+                    post['tag'] = tag
+                    post['tag_source'] = "auto"
+                tagged.append(post)
+        return tagged
+
+    def import_response(self, response, source_prompt=None, before_save=None):
+        """Appends the valid posts in a ChatGPT response and saves. Returns (new_posts, invalid_items).
+
+        Near-duplicates of existing posts get "near_duplicate_of" set; with the "drop" policy they are returned
+        among invalid_items instead of being imported. source_prompt names the prompt the response answers, for
+        posts that don't carry their own. before_save(new_posts) is called just before the posts are saved.
+        """
+        new_posts, invalid_items = posts_from_response(response)
+        if source_prompt:
+            for post in new_posts:
+                post.setdefault("source_prompt", source_prompt)
+        if self.duplicate_policy != "keep":
+            duplicates = self.check_duplicates(new_posts)
+            for post, (post_id, field, score) in duplicates:
+                post["near_duplicate_of"] = post_id
+                post["duplicate_similarity"] = round(score, 2)
+                logging.info("Post '%s' looks like a near-duplicate of %s (%s, %.2f)", post["title"], post_id,
+                             field, score)
+            if self.duplicate_policy == "drop" and duplicates:
+                dropped = {id(post) for post, _ in duplicates}
+                invalid_items.extend(post for post in new_posts if id(post) in dropped)
+                new_posts = [post for post in new_posts if id(post) not in dropped]
+        if self.auto_tag_policy != "off" and new_posts:
+            try:
+                self.auto_tag(new_posts, assign=self.auto_tag_policy == "assign")
+            except ImportError:
+                logging.warning("numpy is not installed; skipping tag suggestions")
+        if before_save is not None:
+            before_save(new_posts)
+        self.unpublished_posts.extend(new_posts)
+        self.save_unpublished_posts()
+        return new_posts, invalid_items
+
+    def generate(self, prompt_name):
+        """Runs one prompt through ChatGPT and imports the result. Returns (new_posts, invalid_items)."""
+        with self.lock:
+            combined_prompt = self.build_prompt(prompt_name)
+        log_prompt(combined_prompt, self.path(PROMPT_LOG_FILE))
+
+        call_record = ledger.new_call_record(combined_prompt, prompt_name)
+        try:
+            response_text = self.request_completion(combined_prompt, call_record, prompt_name)
+            with self.lock:
+                new_posts, invalid_items = self.import_response(response_text, prompt_name)
+            call_record["posts_parsed"], call_record["posts_rejected"] = len(new_posts), len(invalid_items)
+        except Exception as e:
+            if call_record["error"] is None:
+                ledger.record_error(call_record, e)
+            raise
+        finally:
+            ledger.write_call_record(call_record)
+        return new_posts, invalid_items
+
+    # S3
+
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            import boto3
+
+            self._s3_client = boto3.client('s3')
+        return self._s3_client
+
+    def reload_s3_client(self):
+        self._s3_client = None
+        self._signing_clients = {}
+        # URLs signed with the old credentials stop working if those were revoked
+        if self._presigned_urls is not None:
+            self._presigned_urls.clear()
+            self._presigned_urls.save()
+
+    @property
+    def presigned_urls(self):
+        if self._presigned_urls is None:
+            self._presigned_urls = presign.PresignedURLCache(self.path(presign.PRESIGNED_URLS_FILE)).load()
+        return self._presigned_urls
+
+    def bucket_region(self, bucket):
+        """The region of bucket, asked of S3 once and then remembered in the presigned URL store."""
+        cache = self.presigned_urls
+        region = cache.regions.get(bucket)
+        if region:
+            return region
+        try:
+            with perf.span("s3.head_bucket"):
+                response = self.s3_client.head_bucket(Bucket=bucket)
+        except self.s3_client.exceptions.ClientError as e:
+            # S3 names the region even when it refuses the request (403, or 301 from the wrong endpoint)
+            response = e.response
+        headers = response.get("ResponseMetadata", {}).get("HTTPHeaders", {})
+        region = headers.get("x-amz-bucket-region")
+        if not region:
+            return getattr(getattr(self.s3_client, "meta", None), "region_name", None) or presign.DEFAULT_REGION
+        with cache.lock:
+            cache.regions[bucket] = region
+        return region
+
+    def signing_client(self, region):
+        if self._s3_client_injected:
+            return self.s3_client
+        if region not in self._signing_clients:
+            self._signing_clients[region] = presign.signing_client(region)
+        return self._signing_clients[region]
+
+    def signing_credentials(self):
+        """(access_key, secret_key, token) for signing in worker processes; None with an injected client."""
+        if self._s3_client_injected:
+            return None
+        import boto3
+
+        credentials = boto3.session.Session().get_credentials()
+        if credentials is None:
+            raise ServiceError("No AWS credentials are configured, so the export URLs can't be signed.")
+        frozen = credentials.get_frozen_credentials()
+        return frozen.access_key, frozen.secret_key, frozen.token
+
+    def presign_urls(self, urls, expires_in=presign.DEFAULT_EXPIRES, min_remaining=presign.MIN_REMAINING):
+        """Pre-signed GET URLs for urls, in order. URLs that aren't S3 objects are returned unchanged.
+
+        Cached URLs valid for at least min_remaining more seconds are reused; only the rest are signed, and the
+        cache is saved once.
+        """
+        if not 0 < expires_in <= presign.DEFAULT_EXPIRES:
+            raise ServiceError("Pre-signed URLs can last from 1 second to 7 days.")
+        cache = self.presigned_urls
+        min_remaining = min(min_remaining, expires_in)
+        now = time.time()
+        signed = list(urls)
+        pending = {}
+        for position, url in enumerate(urls):
+            parsed = presign.parse_s3_url(url)
+            if parsed is None:
+                continue
+            bucket, key, _ = parsed
+            cached = cache.get(bucket, key, min_remaining, now, expires_in)
+            if cached is not None:
+                signed[position] = cached
+            else:
+                pending.setdefault((bucket, key), []).append(position)
+        if not pending:
+            return signed
+
+        credentials = self.signing_credentials()
+        objects = [(self.bucket_region(bucket), bucket, key) for bucket, key in pending]
+        with perf.span("presign_urls"):
+            fresh = presign.sign_all(objects, self.signing_client, expires_in, credentials)
+        for (_, bucket, key), url in zip(objects, fresh):
+            cache.put(bucket, key, url, now + expires_in)
+            for position in pending[(bucket, key)]:
+                signed[position] = url
+        cache.save()
+        logging.info("Signed %d export URLs, reused %d", len(pending), len(urls) - sum(map(len, pending.values())))
+        return signed
+
+    def file_exists(self, bucket_name, file_name):
+        try:
+            with perf.span("s3.head_object"):
+                self.s3_client.head_object(Bucket=bucket_name, Key=file_name)
+            return True
+        except self.s3_client.exceptions.ClientError:
+            return False
+
+    def upload_media(self, file_path, bucket_name, folder_path):
+        """Uploads file_path under folder_path with a unique name and returns its URL."""
+        if not bucket_name or not folder_path:
+            raise ServiceError("Please enter a valid S3 bucket URL and folder path.")
+
+        file_name = os.path.basename(file_path)
+        if self.file_exists(bucket_name, f"{folder_path}/{file_name}"):
+            raise ServiceError("A file with this name already exists in the S3 bucket.")
+
+        full_file_path = f"{folder_path}/{generate_unique_filename(file_name)}"
+        with perf.span("s3.upload_file", os.path.getsize(file_path)):
+            self.s3_client.upload_file(file_path, bucket_name, full_file_path)
+        return presign.object_url(bucket_name, full_file_path, self.bucket_region(bucket_name))
+
+    def upload_directory(self, directory, bucket_name, folder_path, attach=False):
+        """Uploads every image in directory. Returns a list of (file_path, url) pairs.
+
+        With attach=True each URL is stored on the next unpublished post that has no media yet.
+        """
+        uploaded = []
+        for entry in sorted(os.listdir(directory)):
+            file_path = os.path.join(directory, entry)
+            if os.path.isfile(file_path) and entry.lower().endswith(MEDIA_EXTENSIONS):
+                uploaded.append((file_path, self.upload_media(file_path, bucket_name, folder_path)))
+
+        if attach and uploaded:
+            targets = (post for post in self.unpublished_posts if not post.get('s3_file_name'))
+            for (_, url), post in zip(uploaded, targets):
+                post['s3_bucket_url'] = bucket_name
+                post['s3_folder_path'] = folder_path
+                post['s3_file_name'] = url
+            self.save_unpublished_posts()
+        return uploaded
+
+    # Export and publish
+
+    def export_ready(self, file_path=None, presign_urls=True, expires_in=presign.DEFAULT_EXPIRES):
+        """Appends ready posts to the export CSV. Returns the number of rows written.
+
+        With presign_urls the media URLs are replaced by pre-signed ones valid for expires_in seconds, so the
+        export works for private buckets too.
+        """
+        with self.lock:
+            rows = export_rows(self.unpublished_posts)
+        if not rows:
+            raise ServiceError("No posts are ready to export or have valid Caption and URL.")
+        if presign_urls:
+            urls = self.presign_urls([url for _, url in rows], expires_in)
+            rows = [(caption, url) for (caption, _), url in zip(rows, urls)]
+        append_export_csv(rows, file_path or self.path(EXPORT_CSV_FILE))
+        return len(rows)
+
+    def export_published(self, file_path=None):
+        if not self.published_posts:
+            raise ServiceError("No published posts to export.")
+
+        with perf.span("bulk_export_published_posts") as timer, \
+                open(file_path or self.path(PUBLISHED_EXPORT_CSV_FILE), mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(
+                ['Title', 'Description', 'Type', 'Caption', 'S3 Bucket URL', 'S3 Folder Path', 'S3 File Name',
+                 'Ready to Publish'])
+
+            for post in self.published_posts:
+                writer.writerow([
+                    post['title'],
+                    post['description'],
+                    post['type'],
+                    post['caption'],
+                    post['s3_bucket_url'],
+                    post['s3_folder_path'],
+                    post['s3_file_name'],
+                    post['ready_to_publish']
+                ])
+            timer.add_bytes(file.tell())
+        return len(self.published_posts)
+
+    @property
+    def publisher(self):
+        if self._publisher is None:
+            try:
+                self._publisher = publishers.load_publisher(self.publisher_config_path)
+            except (OSError, ValueError, TypeError) as e:
+                raise ServiceError(f"Invalid publisher config: {e}")
+        return self._publisher
+
+    def reload_publisher(self):
+        if self._publisher is not None:
+            self._publisher.close()
+        self._publisher = None
+
+    def apply_publish_results(self, results):
+        """Moves successfully published posts to Published and records errors on the rest, in one store update.
+
+        Returns (published_posts, failures) where failures is a list of (post, error message).
+        """
+        by_id = {result.post_id: result for result in results}
+        published, failures, remaining = [], [], []
+        with self.lock:
+            for post in self.unpublished_posts:
+                result = by_id.get(post.get("id"))
+                if result is None:
+                    remaining.append(post)
+                elif result.ok:
+                    post.pop("publish_error", None)
+                    post.update(result.post_fields())
+                    published.append(post)
+                else:
+                    post["publish_error"] = result.error
+                    failures.append((post, result.error))
+                    remaining.append(post)
+            self.unpublished_posts = remaining
+            self.published_posts = self.published_posts + published
+            self.save_unpublished_posts()
+            if published:
+                self.save_published_posts()
+        return published, failures
+
+    def publish_posts(self, posts):
+        """Sends posts through the publisher (outside the lock) and writes the results back."""
+        if not posts:
+            return [], []
+        results = self.publisher.publish_batch([dict(post) for post in posts])
+        return self.apply_publish_results(results)
+
+    def publish(self, post_title):
+        post = next((post for post in self.unpublished_posts if post['title'] == post_title), None)
+        if post is None:
+            raise ServiceError("Post not found in the Unpublished section.")
+        published, failures = self.publish_posts([post])
+        if failures:
+            raise ServiceError(f"Failed to publish '{post_title}': {failures[0][1]}")
+        return published[0]
+
+    def publishable_post(self, post_id):
+        """Returns the unpublished post with post_id if it is still marked ready_to_publish."""
+        with self.lock:
+            post = next((post for post in self.unpublished_posts if post.get("id") == post_id), None)
+            if post is None:
+                raise NotPublishable(f"Post {post_id} is not in the Unpublished section.")
+            if not post.get("ready_to_publish", False):
+                raise NotPublishable(f"Post '{post['title']}' is no longer ready to publish.")
+            return post
+
+    def publish_by_id(self, post_id):
+        """Publishes one unpublished post that is still marked ready_to_publish."""
+        post = self.publishable_post(post_id)
+        published, failures = self.publish_posts([post])
+        if failures:
+            raise ServiceError(f"Failed to publish '{post['title']}': {failures[0][1]}")
+        return published[0]
+
+    def publish_ready(self):
+        """Publishes every post marked ready_to_publish. Returns (published_posts, failures)."""
+        with self.lock:
+            ready = [post for post in self.unpublished_posts if post.get('ready_to_publish', False)]
+        return self.publish_posts(ready)
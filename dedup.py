@@ -0,0 +1,171 @@
+"""Near-duplicate detection for post captions and content.
+
+Each text is reduced to a MinHash signature over its word unigrams and bigrams. The fraction of signature
+slots two texts share estimates the Jaccard similarity of their word sets. Signatures use one-permutation
+hashing: each feature is hashed once into one of SIGNATURE_SIZE bins, and empty bins are densified from
+their neighbours, so building a signature costs one hash per word. The index groups signatures into
+locality-sensitive bands of ROWS_PER_BAND slots. A lookup only compares posts that share a whole band,
+so the cost depends on how many similar posts exist, not on the corpus size.
+"""
+import re
+
+SIGNATURE_SIZE = 32
+ROWS_PER_BAND = 4
+DEFAULT_THRESHOLD = 0.6
+FIELDS = ("caption", "description")
+
+_WORD = re.compile(r"[#@]?\w+")
+_MAX_HASH = (1 << 64) - 1
+
+
+def tokens(text):
+    return _WORD.findall((text or "").lower())
+
+
+def minhash(text):
+    """Returns the text's signature as a tuple of SIGNATURE_SIZE ints, or None for empty text."""
+    words = tokens(text)
+    features = set(words)
+    features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    if not features:
+        return None
+    bins = [_MAX_HASH] * SIGNATURE_SIZE
+    for feature in features:
+        # The index only lives in memory, so the per-process randomised str hash is fine (and fast)
+        value = hash(feature) & _MAX_HASH
+        slot = value % SIGNATURE_SIZE
+        value //= SIGNATURE_SIZE
+        if value < bins[slot]:
+            bins[slot] = value
+    if _MAX_HASH not in bins:
+        return tuple(bins)
+    # Densify: an empty bin borrows the next filled bin's value (wrapping around), offset by the distance to it
+    signature = list(bins)
+    borrowed, step = None, 0
+    for position in range(2 * SIGNATURE_SIZE - 1, -1, -1):
+        slot = position % SIGNATURE_SIZE
+        if bins[slot] != _MAX_HASH:
+            borrowed, step = bins[slot], 0
+        else:
+            step += 1
+            if position < SIGNATURE_SIZE:
+                signature[slot] = borrowed + step * 0x9E3779B97F4A7C15
+    return tuple(signature)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(1 for a, b in zip(first, second) if a == b) / SIGNATURE_SIZE
+
+
+class MinHashIndex:
+    """Signatures keyed by an arbitrary key, with banded lookup of similar ones."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._buckets = [{} for _ in range(SIGNATURE_SIZE // ROWS_PER_BAND)]
+        self.signatures = {}
+
+    def _bands(self, signature):
+        for band in range(len(self._buckets)):
+            yield signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+
+    def add(self, key, signature):
+        if key in self.signatures:
+            self.remove(key)
+        if signature is None:
+            return
+        self.signatures[key] = signature
+        for buckets, band in zip(self._buckets, self._bands(signature)):
+            buckets.setdefault(band, set()).add(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for buckets, band in zip(self._buckets, self._bands(signature)):
+            keys = buckets.get(band)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del buckets[band]
+
+    def query(self, signature):
+        """Returns [(key, similarity)] for signatures at or above the threshold, most similar first."""
+        if signature is None:
+            return []
+        candidates = set()
+        for buckets, band in zip(self._buckets, self._bands(signature)):
+            candidates.update(buckets.get(band, ()))
+        matches = []
+        for key in candidates:
+            score = similarity(signature, self.signatures[key])
+            if score >= self.threshold:
+                matches.append((key, score))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def __len__(self):
+        return len(self.signatures)
+
+
+class PostDuplicateIndex:
+    """One MinHash index per text field over a post corpus, kept in step with the stores by sync()."""
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, fields=FIELDS):
+        self.fields = fields
+        self.indexes = {field: MinHashIndex(threshold) for field in fields}
+        self._texts = {}
+
+    def _post_texts(self, post):
+        return tuple(post.get(field) or "" for field in self.fields)
+
+    def add(self, post):
+        key = post.get("id")
+        texts = self._post_texts(post)
+        if self._texts.get(key) == texts:
+            return
+        self._texts[key] = texts
+        for field, text in zip(self.fields, texts):
+            self.indexes[field].add(key, minhash(text))
+
+    def remove(self, key):
+        if self._texts.pop(key, None) is not None:
+            for index in self.indexes.values():
+                index.remove(key)
+
+    def sync(self, *post_lists):
+        """Indexes new and edited posts and forgets deleted ones; unchanged posts are not re-hashed."""
+        seen = set()
+        for posts in post_lists:
+            for post in posts:
+                if post.get("id"):
+                    seen.add(post["id"])
+                    self.add(post)
+        for key in [key for key in self._texts if key not in seen]:
+            self.remove(key)
+
+    def find(self, post):
+        """Returns (key, field, similarity) for the most similar indexed post, or None."""
+        best = None
+        for field, text in zip(self.fields, self._post_texts(post)):
+            if len(tokens(text)) < 3:
+                continue  # too short to call anything a near-duplicate
+            for key, score in self.indexes[field].query(minhash(text)):
+                if key != post.get("id") and (best is None or score > best[2]):
+                    best = (key, field, score)
+                    break
+        return best
+
+    def check_batch(self, posts):
+        """Checks new posts against the corpus and against each other, adding them to the index as it goes.
+
+        Returns a list of (post, (key, field, similarity)) for the near-duplicates found.
+        """
+        duplicates = []
+        for post in posts:
+            match = self.find(post)
+            if match is not None:
+                duplicates.append((post, match))
+            else:
+                self.add(post)
+        return duplicates
@@ -0,0 +1,110 @@
+"""Facet indexes for narrowing the Curate view by tag, ready flag, media and source prompt.
+
+FacetIndex files every post id under one value per facet and remembers the values each post was filed under, so
+an edit moves a post between two sets instead of recounting the store, and the counts shown next to each filter
+are always current. matching() intersects the sets of the chosen values, smallest first.
+"""
+
+FACETS = ("tag", "ready", "media", "source_prompt")
+FACET_LABELS = {"tag": "Tag", "ready": "Ready", "media": "Media", "source_prompt": "Prompt"}
+UNTAGGED = "Uncategorised"
+
+
+def post_tag(post):
+    """The tag a post is filed under; empty and missing tags are UNTAGGED."""
+    return (post.get("tag") or "").strip() or UNTAGGED
+
+
+def facet_values(post):
+    """The value of each facet for a post, in FACETS order."""
+    return (post_tag(post),
+            bool(post.get("ready_to_publish")),
+            bool(post.get("s3_file_name")),
+            post.get("source_prompt") or "")
+
+
+def value_label(facet, value):
+    if facet == "ready":
+        return "Ready" if value else "Not ready"
+    if facet == "media":
+        return "Has media" if value else "Missing media"
+    if facet == "source_prompt" and not value:
+        return "(unknown prompt)"
+    return str(value)
+
+
+class FacetIndex:
+    def __init__(self):
+        # facet -> value -> ids of the posts with that value
+        self.members = {facet: {} for facet in FACETS}
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, post):
+        """Indexes a new or edited post; does nothing if none of its facet values changed."""
+        key = post.get("id")
+        if not key:
+            return
+        values = facet_values(post)
+        old = self._values.get(key)
+        if old == values:
+            return
+        if old is not None:
+            self._unfile(key, old)
+        self._values[key] = values
+        for facet, value in zip(FACETS, values):
+            self.members[facet].setdefault(value, set()).add(key)
+
+    def remove(self, key):
+        old = self._values.pop(key, None)
+        if old is not None:
+            self._unfile(key, old)
+
+    def _unfile(self, key, values):
+        for facet, value in zip(FACETS, values):
+            members = self.members[facet][value]
+            members.discard(key)
+            if not members:
+                del self.members[facet][value]
+
+    def sync(self, posts):
+        """Indexes new and edited posts and forgets deleted ones."""
+        seen = set()
+        for post in posts:
+            key = post.get("id")
+            if key:
+                seen.add(key)
+                self.add(post)
+        for key in [key for key in self._values if key not in seen]:
+            self.remove(key)
+
+    def apply(self, posts, changes=None):
+        """Brings the index up to date after `posts` changed.
+
+        With a store_watch.StoreChanges only the posts it names are re-filed; without one, or on a resync, every
+        post is checked.
+        """
+        if changes is None or changes.resync:
+            self.sync(posts)
+            return
+        for key in changes.removed:
+            self.remove(key)
+        touched = set(changes.added) | set(changes.changed)
+        if touched:
+            for post in posts:
+                if post.get("id") in touched:
+                    self.add(post)
+
+    def counts(self, facet):
+        """{value: number of posts} for one facet, most common first."""
+        members = self.members[facet]
+        return dict(sorted(((value, len(keys)) for value, keys in members.items()), key=lambda item: -item[1]))
+
+    def matching(self, filters):
+        """Ids of the posts matching every {facet: value} in filters, or None when there are no filters."""
+        if not filters:
+            return None
+        sets = sorted((self.members[facet].get(value, set()) for facet, value in filters.items()), key=len)
+        return sets[0].intersection(*sets[1:])
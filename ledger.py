@@ -0,0 +1,107 @@
+import gzip
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import shutil
+import time
+
+from app_logging import attach_queued_handlers
+
+LEDGER_FILE = "chatgpt_ledger.jsonl"
+LEDGER_MAX_BYTES = 5 * 1024 * 1024
+LEDGER_BACKUP_COUNT = 20
+
+_ledger_logger = None
+
+
+def _gzip_namer(name):
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def get_ledger_logger(path=LEDGER_FILE, max_bytes=LEDGER_MAX_BYTES, backup_count=LEDGER_BACKUP_COUNT):
+    """Returns the logger that appends one JSON object per line to the ledger file.
+
+    Files rotate by size; rotated files are gzip compressed (chatgpt_ledger.jsonl.1.gz, ...).
+    Writes happen on a background listener thread.
+    """
+    global _ledger_logger
+    if _ledger_logger is None:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                       encoding="utf-8")
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        logger = logging.getLogger("chatgpt_ledger")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        attach_queued_handlers(logger, handler)
+        _ledger_logger = logger
+    return _ledger_logger
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def new_call_record(prompt, prompt_name=None):
+    return {
+        "event": "chatgpt_call",
+        "prompt_name": prompt_name,
+        "prompt_hash": prompt_hash(prompt),
+        "prompt_chars": len(prompt),
+        "provider": None,
+        "model": None,
+        "latency_ms": None,
+        "retries": 0,
+        "usage": None,
+        "response_chars": 0,
+        "response": None,
+        "posts_parsed": 0,
+        "posts_rejected": 0,
+        "error": None,
+        "error_message": None,
+    }
+
+
+def record_error(record, error):
+    record["error"] = type(error).__name__
+    record["error_message"] = str(error)
+
+
+def write_call_record(record):
+    event = {"ts": time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+    event.update(record)
+    try:
+        get_ledger_logger().info(json.dumps(event, ensure_ascii=False))
+    except Exception as e:
+        logging.error("Failed to write ChatGPT ledger event: %s", e)
+
+
+def read_ledger(path=LEDGER_FILE):
+    """Yields events from the current ledger file and its compressed rotations, oldest first."""
+    rotated = []
+    index = 1
+    while os.path.exists(f"{path}.{index}.gz"):
+        rotated.append(f"{path}.{index}.gz")
+        index += 1
+
+    for rotated_path in reversed(rotated):
+        with gzip.open(rotated_path, "rt", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
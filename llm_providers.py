@@ -0,0 +1,200 @@
+"""LLM providers: where a prompt is sent to be turned into posts.
+
+OpenAIProvider goes through the shared ChatGPTClient (rate limiting, retries, cached key). OpenAICompatibleProvider
+talks to any server exposing /chat/completions in the OpenAI format, such as llama.cpp's server or vLLM, so bulk
+drafts can run locally. Providers are named in the JSON file at PROVIDER_CONFIG_PATH, for example:
+
+    {"default": "local",
+     "providers": {"local": {"backend": "openai-compatible", "base_url": "http://127.0.0.1:8080/v1",
+                             "model": "qwen2.5-7b-instruct", "temperature": 0.9}}}
+
+The "openai" provider always exists. A prompt in prompts.json picks its provider, model, system prompt and
+sampling parameters with optional keys of the same names, e.g. {"name": ..., "details": ..., "provider": "local",
+"model": "llama-3.1-8b", "system_prompt": "...", "temperature": 1.1, "max_tokens": 1200}.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+import perf
+import rate_limit
+
+PROVIDER_CONFIG_PATH = "~/.llm_providers.json"
+DEFAULT_PROVIDER = "openai"
+# Request parameters a provider config or a prompt may set
+SAMPLING_PARAMS = ("temperature", "top_p", "max_tokens", "presence_penalty", "frequency_penalty", "stop", "seed")
+
+
+class ProviderError(Exception):
+    pass
+
+
+class Provider:
+    name = "base"
+    # Whether calls fail without the ChatGPT API key saved in Config
+    needs_api_key = False
+
+    def __init__(self, model=None, system_prompt=None, **sampling):
+        unknown = set(sampling) - set(SAMPLING_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown provider settings: {', '.join(sorted(unknown))}")
+        self.model = model
+        self.system_prompt = system_prompt
+        self.sampling = sampling
+
+    def chat_completion(self, retry_log=None, **params):
+        """Sends one chat request and returns the response in the OpenAI format (a dict with choices and usage)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class OpenAIProvider(Provider):
+    name = "openai"
+    needs_api_key = True
+
+    def __init__(self, client, **settings):
+        super().__init__(**settings)
+        self.client = client
+
+    def chat_completion(self, retry_log=None, **params):
+        return self.client.chat_completion(retry_log=retry_log, **params)
+
+
+class OpenAICompatibleProvider(Provider):
+    """A local or self-hosted server speaking the OpenAI chat completions protocol over a keep-alive session."""
+
+    name = "openai-compatible"
+
+    def __init__(self, base_url, api_key=None, timeout=120.0, pool_size=4, max_retries=2, **settings):
+        super().__init__(**settings)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.limiter = rate_limit.RateLimiter(max_retries=max_retries, base_delay=0.5, max_delay=10.0)
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                if self.api_key:
+                    session.headers["Authorization"] = f"Bearer {self.api_key}"
+                self._session = session
+            return self._session
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def chat_completion(self, retry_log=None, **params):
+        import requests
+
+        url = f"{self.base_url}/chat/completions"
+        attempt = 0
+        while True:
+            try:
+                with perf.span("llm_provider.request"):
+                    response = self.session.post(url, json=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, delay = e, self.limiter.backoff_delay(attempt)
+            else:
+                # Local servers answer 503 while a model is loading and 429 when their slots are full
+                if response.status_code not in (429, 503):
+                    return self._payload(response)
+                error = ProviderError(f"{self.base_url} answered HTTP {response.status_code}")
+                delay = self.limiter.backoff_delay(attempt, rate_limit.retry_after(response.headers))
+            if attempt >= self.max_retries:
+                raise ProviderError(f"{self.base_url} is not answering: {error}") from error
+            if retry_log is not None:
+                retry_log.append(type(error).__name__)
+            logging.warning("%s from %s; retrying in %.1fs", type(error).__name__, self.base_url, delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def _payload(self, response):
+        try:
+            payload = response.json()
+        except ValueError:
+            raise ProviderError(f"{self.base_url} returned a non-JSON response (HTTP {response.status_code}).")
+        error = payload.get("error") if isinstance(payload, dict) else None
+        if response.status_code >= 400 or error:
+            message = error.get("message") if isinstance(error, dict) else error
+            raise ProviderError(f"{self.base_url}: {message or f'HTTP {response.status_code}'}")
+        if not isinstance(payload, dict):
+            raise ProviderError(f"{self.base_url} returned an unexpected response: {payload!r:.200}")
+        if not payload.get("choices"):
+            raise ProviderError(f"{self.base_url} returned no choices.")
+        return payload
+
+
+BACKENDS = {"openai": OpenAIProvider, "openai-compatible": OpenAICompatibleProvider}
+
+
+class ProviderRegistry:
+    """The configured providers by name, built on first use."""
+
+    def __init__(self, openai_client, configs=None, default=DEFAULT_PROVIDER):
+        self.openai_client = openai_client
+        self.configs = {DEFAULT_PROVIDER: {"backend": "openai"}, **(configs or {})}
+        self.default = default
+        if default not in self.configs:
+            raise ValueError(f"The default provider '{default}' is not configured.")
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name=None):
+        name = name or self.default
+        with self._lock:
+            if name not in self._providers:
+                if name not in self.configs:
+                    raise ValueError(f"Unknown LLM provider '{name}'. Add it to {PROVIDER_CONFIG_PATH}.")
+                config = dict(self.configs[name])
+                backend = config.pop("backend", "openai-compatible")
+                if backend not in BACKENDS:
+                    raise ValueError(f"Unknown backend '{backend}' for LLM provider '{name}'.")
+                if backend == "openai":
+                    self._providers[name] = OpenAIProvider(self.openai_client, **config)
+                else:
+                    self._providers[name] = BACKENDS[backend](**config)
+            return self._providers[name]
+
+    def close(self):
+        with self._lock:
+            for provider in self._providers.values():
+                provider.close()
+            self._providers.clear()
+
+
+def load_providers(openai_client, config_path=PROVIDER_CONFIG_PATH):
+    """Builds the registry from the config file; only the OpenAI provider when there is no config."""
+    config_path = os.path.expanduser(config_path)
+    if not os.path.exists(config_path):
+        return ProviderRegistry(openai_client)
+    with open(config_path, "r") as file:
+        config = json.load(file)
+    return ProviderRegistry(openai_client, config.get("providers", {}), config.get("default", DEFAULT_PROVIDER))
+
+
+def request_params(provider, prompt, default_model, default_system_prompt, default_max_tokens):
+    """The chat request for a prompt: prompt settings override the provider's, which override the defaults."""
+    params = {"model": prompt.get("model") or provider.model or default_model, "max_tokens": default_max_tokens}
+    params.update(provider.sampling)
+    params.update({name: prompt[name] for name in SAMPLING_PARAMS if prompt.get(name) is not None})
+    system_prompt = prompt.get("system_prompt") or provider.system_prompt or default_system_prompt
+    return system_prompt, params
@@ -1,15 +1,40 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog, ttk
+import bisect
+import functools
 import json
 import os
-import csv
-import boto3
-import time
-import openai
 import logging
-
-# Set up basic configuration for logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import app_logging
+import batch_jobs
+import core
+import facets
+import ledger
+import llm_providers
+import models
+import notifications
+import perf
+import profiling
+import scheduler
+import snapshots
+import store_watch
+import ui_watchdog
+from app_logging import summarize
+
+# Route logging through a background queue listener
+app_logging.setup_logging()
+
+UI_CALL_POLL_MS = 100
+HEARTBEAT_MS = int(ui_watchdog.HEARTBEAT_SECONDS * 1000)
+NOTICE_POLL_MS = 200
+NOTICE_SECONDS = 8
+NOTICE_COLOURS = {notifications.INFO: "black", notifications.WARNING: "dark orange", notifications.ERROR: "red"}
 
 
 class App:
@@ -18,40 +43,207 @@ class App:
         logging.info("Application initialized")
         self.root.title("Customer Information and Prompts Management")
 
-        self.tabs = ttk.Notebook(root)
-        self.config_tab = ttk.Frame(self.tabs)
-        self.generate_tab = ttk.Frame(self.tabs)
-        self.curate_tab = ttk.Frame(self.tabs)
-
-        self.tabs.add(self.config_tab, text="Config")
-        self.tabs.add(self.generate_tab, text="Generate")
-        self.tabs.add(self.curate_tab, text="Curate")
-        self.tabs.pack(expand=1, fill="both")
-
-        self.customer_info_list = []
-        self.prompts_list = []
-        self.published_posts = []
-        self.unpublished_posts = []
+        self.service = core.ContentService()
+        # Outcomes are reported in the status line instead of dialogs that stop batch work until clicked
+        self.notifier = notifications.Notifier()
         self.customer_detail_vars = {}
         self.generated_response = None
         self.current_unpublished_index = 0
         self.current_published_index = 0
-        self.s3_client = boto3.client('s3')
+        # Ids of the posts on screen, so reloads can keep them there when other posts move
+        self.displayed_unpublished_id = self.displayed_published_id = None
         self.unpublished_tags_dropdown = None
         self.published_tags_dropdown = None
+        self.bulk_tags_dropdown = None
+        # Post id for each row of the Unpublished post list
+        self.post_list_ids = []
+        # Facet filters over Unpublished: the index, the chosen {facet: value}, and the positions in
+        # unpublished_posts of the posts that match, in order (Next/Last walk this)
+        self.unpublished_facets = facets.FacetIndex()
+        self.facet_filters = {}
+        self.facet_choices = {}
+        self.facet_dropdowns = {}
+        self.unpublished_view = range(0)
+        self.unpublished_view_hint = 0
+        # Tabs are only filled in when first selected; maps frame name -> builder
+        self.tab_builders = {}
+        self.config_tab = self.generate_tab = self.curate_tab = None
+        self.customer_info_tab = self.prompts_tab = self.credentials_tab = self.chatgpt_tab = None
+        self.tags_tab = self.logs_tab = self.performance_tab = None
+        self.unpublished_tab = self.published_tab = None
+
+        # Load the data up front (cheap) so saves from any tab work on the full stores
+        self.customer_info_list = self.load_from_file("customer_info.json", model=models.Customer)
+        self.load_prompts_from_file()
+        self.unpublished_posts = self.load_unpublished_posts()
+        self.published_posts = self.load_published_posts()
 
-        self.create_config_tab()
-        self.create_generate_tab()
-        self.create_curate_tab()
+        # Worker threads hand work that touches the stores or widgets to the Tk thread through this queue
+        self.ui_calls = queue.Queue()
+        self.root.after(UI_CALL_POLL_MS, self.process_ui_calls)
+
+        self.publish_queue = scheduler.PublishQueue(self.service.path(core.PUBLISH_QUEUE_FILE))
+        self.publish_queue.load()
+        self.publish_queue.sync_from_posts(self.unpublished_posts)
+        self.publish_dispatcher = scheduler.PublishDispatcher(
+            self.publish_queue, self.publish_scheduled_post)
+        self.publish_dispatcher.start()
+
+        # Batch jobs submitted in earlier sessions keep being polled and are imported when they finish
+        self.batch_jobs = batch_jobs.BatchJobs(self.service)
+        self.batch_jobs.load()
+        self.batch_poller = batch_jobs.BatchPoller(self.batch_jobs, self.batch_job_completed)
+        self.batch_poller.start()
+
+        # Pick up edits that other instances and scripts make to the stores without a manual Refresh
+        self.store_watcher = store_watch.StoreWatcher([self.service.path(name) for name in core.STORES],
+                                                      self.store_changed_on_disk)
+        self.store_watcher.start()
+
+        self.profiler = profiling.Profiler(self.service.path(profiling.PROFILES_DIR))
+
+        # Keep compressed copies of changed stores so a bad save can be undone with `cli.py restore`
+        self.snapshotter = snapshots.Snapshotter(snapshots.Snapshots(self.service.data_dir))
+        self.snapshotter.start()
+
+        # Build the near-duplicate index off the Tk thread so the first import doesn't pay for it
+        threading.Thread(target=self.service.warm_duplicate_index, name="dedup-index", daemon=True).start()
+
+        # Status line: the latest notice (click for the history) and the stall counter
+        self.status_bar = tk.Frame(root)
+        self.status_bar.pack(side=tk.BOTTOM, fill="x")
+        self.notice_label = tk.Label(self.status_bar, anchor="w", cursor="hand2")
+        self.notice_label.pack(side=tk.LEFT, fill="x", expand=True)
+        self.notice_label.bind("<Button-1>", lambda event: self.show_notice_history())
+        self.notice_cleared_at = None
+        self.root.after(NOTICE_POLL_MS, self.show_notices)
+
+        # Count and log every time the event loop is blocked, with the stack of the blocking call
+        self.stall_label = tk.Label(self.status_bar, text="UI stalls: 0", anchor="e")
+        self.stall_label.pack(side=tk.RIGHT)
+        self.stall_watchdog = ui_watchdog.StallWatchdog(self.ui_stalled,
+                                                        log_path=self.service.path(ui_watchdog.STALL_LOG_FILE))
+        self.stall_watchdog.start()
+        self.root.after(HEARTBEAT_MS, self.heartbeat)
 
-        self.load_customer_info_from_file()
-        self.load_prompts_from_file()
-        self.load_prompt_titles()  # Load prompt titles here
+        self.tabs = ttk.Notebook(root)
+        self.config_tab = self.add_lazy_tab(self.tabs, "Config", self.create_config_tab)
+        self.generate_tab = self.add_lazy_tab(self.tabs, "Generate", self.create_generate_tab)
+        self.curate_tab = self.add_lazy_tab(self.tabs, "Curate", self.create_curate_tab)
+        self.tabs.pack(expand=1, fill="both")
+        self.build_selected_tab(self.tabs)
+
+    def add_lazy_tab(self, notebook, text, builder):
+        frame = ttk.Frame(notebook)
+        notebook.add(frame, text=text)
+        self.tab_builders[str(frame)] = builder
+        if not notebook.bind("<<NotebookTabChanged>>"):
+            notebook.bind("<<NotebookTabChanged>>", lambda event: self.build_selected_tab(event.widget))
+        return frame
+
+    def build_selected_tab(self, notebook):
+        selected = notebook.select()
+        builder = self.tab_builders.pop(selected, None)
+        if builder is not None:
+            with perf.span("build_tab"):
+                builder()
+
+    def tab_built(self, frame):
+        return frame is not None and str(frame) not in self.tab_builders
+
+    def call_in_ui(self, func, *args):
+        """Runs func on the Tk thread and waits for its result. Only call this from worker threads."""
+        future = Future()
+        self.ui_calls.put((future, func, args))
+        return future.result()
+
+    def notify(self, text, level=notifications.INFO, details=()):
+        """Shows text in the status line without blocking; safe to call from any thread."""
+        self.notifier.notify(text, level, details)
+
+    def show_notices(self):
+        notices = self.notifier.pending()
+        now = time.monotonic()
+        if notices:
+            latest = notices[-1]
+            more = f"  (+{len(notices) - 1} more, click for all)" if len(notices) > 1 else ""
+            self.notice_label.config(text=latest.text + more, fg=NOTICE_COLOURS[latest.level])
+            self.notice_cleared_at = now + NOTICE_SECONDS
+        elif self.notice_cleared_at is not None and now >= self.notice_cleared_at:
+            self.notice_label.config(text="")
+            self.notice_cleared_at = None
+        self.root.after(NOTICE_POLL_MS, self.show_notices)
+
+    def show_notice_history(self):
+        window = tk.Toplevel(self.root)
+        window.title("Notifications")
+        listbox = tk.Listbox(window, width=120, height=25)
+        listbox.pack(expand=True, fill="both")
+        for notice in reversed(self.notifier.history):
+            listbox.insert(tk.END, str(notice))
+            listbox.itemconfig(tk.END, fg=NOTICE_COLOURS[notice.level])
+            for detail in notice.details:
+                listbox.insert(tk.END, f"        {detail}")
+
+    def heartbeat(self):
+        self.stall_watchdog.beat()
+        self.root.after(HEARTBEAT_MS, self.heartbeat)
+
+    def ui_stalled(self, seconds, stack):
+        self.stall_label.config(text=f"UI stalls: {self.stall_watchdog.stalls} "
+                                     f"(last {seconds:.2f}s, longest {self.stall_watchdog.longest:.2f}s; "
+                                     f"see {ui_watchdog.STALL_LOG_FILE})")
+
+    def process_ui_calls(self):
+        while True:
+            try:
+                future, func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+        self.root.after(UI_CALL_POLL_MS, self.process_ui_calls)
 
-        # Create customer detail vars and load the previously selected customer information
-        self.update_customer_detail_vars()
-        self.load_selected_customer_info()
 
+    # The data lives in the shared service; these keep the widget code reading and assigning it directly
+
+    @property
+    def customer_info_list(self):
+        return self.service.customer_info_list
+
+    @customer_info_list.setter
+    def customer_info_list(self, customers):
+        self.service.customer_info_list = customers
+
+    @property
+    def prompts_list(self):
+        return self.service.prompts_list
+
+    @prompts_list.setter
+    def prompts_list(self, prompts):
+        self.service.prompts_list = prompts
+
+    @property
+    def unpublished_posts(self):
+        return self.service.unpublished_posts
+
+    @unpublished_posts.setter
+    def unpublished_posts(self, posts):
+        self.service.unpublished_posts = posts
+
+    @property
+    def published_posts(self):
+        return self.service.published_posts
+
+    @published_posts.setter
+    def published_posts(self, posts):
+        self.service.published_posts = posts
+
+    @property
+    def s3_client(self):
+        return self.service.s3_client
 
     def save_tag(self):
         tag_name = self.tag_entry.get().strip()
@@ -60,13 +252,14 @@ class App:
             return
 
         tags = self.load_from_file("tags.json", default=[])
-        if not any(tag['name'] == tag_name for tag in tags):
-            tags.append({"name": tag_name})
-            self.save_to_file(tags, "tags.json")
+        if core.add_tag(tags, tag_name):
+            if not self.save_to_file(tags, "tags.json"):
+                return
             self.load_tags()
             self.load_tags_dropdown(self.unpublished_tags_dropdown)
             self.load_tags_dropdown(self.published_tags_dropdown)
-            messagebox.showinfo("Success", "Tag saved successfully.")
+            self.load_tags_dropdown(self.bulk_tags_dropdown)
+            self.notify("Tag saved successfully.")
         else:
             messagebox.showwarning("Warning", "Tag already exists.")
 
@@ -80,55 +273,55 @@ class App:
         tag_to_delete = self.tags_list.get(selected_tag_index)
 
         tags = [tag for tag in tags if tag['name'] != tag_to_delete]
-        self.save_to_file(tags, "tags.json")
+        if not self.save_to_file(tags, "tags.json"):
+            return
         self.load_tags()
         self.load_tags_dropdown(self.unpublished_tags_dropdown)
         self.load_tags_dropdown(self.published_tags_dropdown)
-        messagebox.showinfo("Success", "Tag deleted successfully.")
+        self.load_tags_dropdown(self.bulk_tags_dropdown)
+        self.notify("Tag deleted successfully.")
 
     def load_tags(self):
         tags = self.load_from_file("tags.json", default=[])
-        logging.info(f"Loaded tags: {tags}")  # Use logging instead of print
+        logging.info("Loaded tags: %s", summarize(tags))
         self.tags_list.delete(0, tk.END)
+        invalid = []
         for tag in tags:
             if isinstance(tag, dict) and 'name' in tag:
                 self.tags_list.insert(tk.END, tag['name'])
             else:
-                logging.warning(f"Unexpected tag format: {tag}")
-                messagebox.showwarning("Warning", f"Unexpected tag format: {tag}")
+                invalid.append(tag)
+        if invalid:
+            with self.notifier.tally("Tags") as tally:
+                tally.add("entries with an unexpected format skipped", len(invalid), notifications.WARNING)
+                for tag in invalid:
+                    tally.detail(f"Unexpected tag format: {tag}")
 
     def create_config_tab(self):
         self.config_tabs = ttk.Notebook(self.config_tab)
-        self.customer_info_tab = ttk.Frame(self.config_tabs)
-        self.prompts_tab = ttk.Frame(self.config_tabs)
-        self.credentials_tab = ttk.Frame(self.config_tabs)
-        self.chatgpt_tab = ttk.Frame(self.config_tabs)
-        self.tags_tab = ttk.Frame(self.config_tabs)  # New Tags Tab
-
-        self.config_tabs.add(self.customer_info_tab, text="Customer Information")
-        self.config_tabs.add(self.prompts_tab, text="Prompts")
-        self.config_tabs.add(self.credentials_tab, text="AWS Credentials")
-        self.config_tabs.add(self.chatgpt_tab, text="ChatGPT")
-        self.config_tabs.add(self.tags_tab, text="Tags")  # Add Tags Tab
+        self.customer_info_tab = self.add_lazy_tab(self.config_tabs, "Customer Information",
+                                                   self.create_customer_info_tab)
+        self.prompts_tab = self.add_lazy_tab(self.config_tabs, "Prompts", self.create_prompts_tab)
+        self.credentials_tab = self.add_lazy_tab(self.config_tabs, "AWS Credentials", self.create_credentials_tab)
+        self.chatgpt_tab = self.add_lazy_tab(self.config_tabs, "ChatGPT", self.create_chatgpt_tab)
+        self.tags_tab = self.add_lazy_tab(self.config_tabs, "Tags", self.create_tags_tab)  # New Tags Tab
+        self.logs_tab = self.add_lazy_tab(self.config_tabs, "Logs", self.create_logs_tab)
+        self.performance_tab = self.add_lazy_tab(self.config_tabs, "Performance", self.create_performance_tab)
         self.config_tabs.pack(expand=1, fill="both")
-
-        self.create_customer_info_tab()
-        self.create_prompts_tab()
-        self.create_credentials_tab()
-        self.create_chatgpt_tab()
-        self.create_tags_tab()  # Create Tags Tab
-
-        self.logs_tab = ttk.Frame(self.config_tabs)
-        self.config_tabs.add(self.logs_tab, text="Logs")
-        self.create_logs_tab()
+        self.build_selected_tab(self.config_tabs)
 
     def load_prompts_from_file(self):
-        self.prompts_list = self.load_from_file("prompts.json")
+        self.prompts_list = self.load_from_file("prompts.json", model=models.Prompt)
 
     def load_prompt_titles(self):
+        if not self.tab_built(self.generate_tab):
+            return
+        selected = [self.prompt_titles_listbox.get(index) for index in self.prompt_titles_listbox.curselection()]
         self.prompt_titles_listbox.delete(0, tk.END)
-        for prompt in self.prompts_list:
+        for index, prompt in enumerate(self.prompts_list):
             self.prompt_titles_listbox.insert(tk.END, prompt['name'])
+            if prompt['name'] in selected:
+                self.prompt_titles_listbox.selection_set(index)
 
     def create_generate_tab(self):
         self.generate_label = tk.Label(self.generate_tab, text="Generate Posts")
@@ -168,16 +361,26 @@ class App:
                                               command=self.submit_to_chatgpt)
         self.submit_prompt_button.pack(pady=10)
 
+        self.submit_batch_button = tk.Button(self.generate_tab, text="Submit as Batch Job",
+                                             command=self.submit_batch_job)
+        self.submit_batch_button.pack(pady=5)
+        self.batch_status_label = tk.Label(self.generate_tab, text=self.batch_status())
+        self.batch_status_label.pack()
+
         self.refresh_prompts_button = tk.Button(self.generate_tab, text="Refresh Prompts",
                                                 command=self.refresh_prompts_list)
         self.refresh_prompts_button.pack(pady=10)
 
+        self.load_prompt_titles()
         logging.info("Generate tab created successfully.")
 
     def refresh_prompts_list(self):
-            self.prompts_list = self.load_from_file("prompts.json")
-            self.load_prompt_titles()
-            messagebox.showinfo("Success", "Prompts list refreshed.")
+            changes = self.reload_store(core.PROMPTS_FILE)
+            if changes:
+                self.load_prompt_titles()
+                self.notify(f"Prompts list refreshed ({changes}).")
+            else:
+                self.notify("Prompts list is up to date.")
 
     def display_prompt_description(self, event):
         selected_index = self.prompt_titles_listbox.curselection()
@@ -192,18 +395,10 @@ class App:
         self.prompt_description_text.config(state='disabled')
     def create_curate_tab(self):
         self.curate_tabs = ttk.Notebook(self.curate_tab)
-        self.unpublished_tab = ttk.Frame(self.curate_tabs)
-        self.published_tab = ttk.Frame(self.curate_tabs)
-
-        self.curate_tabs.add(self.unpublished_tab, text="Unpublished")
-        self.curate_tabs.add(self.published_tab, text="Published")
+        self.unpublished_tab = self.add_lazy_tab(self.curate_tabs, "Unpublished", self.create_unpublished_tab)
+        self.published_tab = self.add_lazy_tab(self.curate_tabs, "Published", self.create_published_tab)
         self.curate_tabs.pack(expand=1, fill="both")
-
-        self.create_unpublished_tab()
-        self.create_published_tab()
-
-        # Load the prompt settings when the Curate tab is created
-        self.load_prompt_settings()
+        self.build_selected_tab(self.curate_tabs)
 
     def create_logs_tab(self):
         self.logs_text = tk.Text(self.logs_tab, wrap="word")
@@ -211,6 +406,69 @@ class App:
         self.load_logs_button = tk.Button(self.logs_tab, text="Load Logs", command=self.load_and_display_logs)
         self.load_logs_button.pack(pady=10)
 
+        # Start, reproduce the slow action, stop: the capture is saved under profiles/ and summarised here
+        self.profiler_frame = tk.LabelFrame(self.logs_tab, text="Profiler")
+        self.profiler_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        self.profile_button = tk.Button(self.profiler_frame, text="Start Profiling", command=self.toggle_profiling)
+        self.profile_button.pack(pady=5)
+        self.profile_status_label = tk.Label(self.profiler_frame, text="Not profiling")
+        self.profile_status_label.pack()
+        columns = ("calls", "self_ms", "total_ms")
+        self.profile_tree = ttk.Treeview(self.profiler_frame, columns=columns, height=12)
+        self.profile_tree.heading("#0", text="Function")
+        self.profile_tree.column("#0", width=420)
+        for column, heading in zip(columns, ("Calls", "Self (ms)", "Total (ms)")):
+            self.profile_tree.heading(column, text=heading)
+            self.profile_tree.column(column, width=90, anchor="e")
+        self.profile_tree.pack(expand=True, fill="both")
+
+    def create_performance_tab(self):
+        columns = ("count", "errors", "p50_ms", "p95_ms", "max_ms", "bytes")
+        self.performance_tree = ttk.Treeview(self.performance_tab, columns=columns)
+        self.performance_tree.heading("#0", text="Operation")
+        for column, heading in zip(columns, ("Count", "Errors", "p50 (ms)", "p95 (ms)", "Max (ms)", "Bytes")):
+            self.performance_tree.heading(column, text=heading)
+            self.performance_tree.column(column, width=90, anchor="e")
+        self.performance_tree.pack(expand=True, fill="both")
+
+        self.performance_buttons_frame = tk.Frame(self.performance_tab)
+        self.performance_buttons_frame.pack(pady=10)
+
+        self.reset_performance_button = tk.Button(self.performance_buttons_frame, text="Reset",
+                                                  command=self.reset_performance_stats)
+        self.reset_performance_button.grid(row=0, column=0, padx=5)
+
+        self.export_performance_button = tk.Button(self.performance_buttons_frame, text="Export JSON",
+                                                   command=self.export_performance_stats)
+        self.export_performance_button.grid(row=0, column=1, padx=5)
+
+        self.refresh_performance_view()
+
+    def refresh_performance_view(self):
+        # Only redraw while the tab is visible; keep polling so it updates live once selected
+        if self.config_tabs.select() == str(self.performance_tab):
+            self.performance_tree.delete(*self.performance_tree.get_children())
+            for name, stats in perf.registry.snapshot().items():
+                self.performance_tree.insert("", tk.END, text=name, values=(
+                    stats["count"], stats["errors"], stats["p50_ms"], stats["p95_ms"], stats["max_ms"],
+                    app_logging.format_bytes(stats["bytes"])))
+        self.root.after(1000, self.refresh_performance_view)
+
+    def reset_performance_stats(self):
+        perf.registry.reset()
+        self.performance_tree.delete(*self.performance_tree.get_children())
+
+    def export_performance_stats(self):
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", initialfile="performance_stats.json",
+                                                 filetypes=[("JSON files", "*.json")])
+        if not file_path:
+            return
+        try:
+            perf.registry.export_json(file_path)
+            self.notify(f"Performance stats exported to '{file_path}'.")
+        except IOError as e:
+            messagebox.showerror("Error", f"Failed to export performance stats: {e}")
+
     def create_tags_tab(self):
         self.tags_list = tk.Listbox(self.tags_tab)
         self.tags_list.pack(pady=5, fill="both", expand=True)
@@ -283,6 +541,11 @@ class App:
         self.clear_all_button = tk.Button(self.prompts_tab, text="Clear all", command=self.clear_all_prompts)
         self.clear_all_button.pack(pady=10)
 
+        # Create customer detail vars and load the previously selected customer information
+        self.update_customer_detail_vars()
+        self.load_selected_customer_info()
+        self.load_prompt_settings()
+
     def create_prompt_crud_buttons(self, frame):
         self.prompt_search_button = tk.Button(frame, text="Search", command=self.search_prompt_info)
         self.prompt_search_button.grid(row=0, column=0, padx=5)
@@ -342,7 +605,7 @@ class App:
         self.load_chatgpt_key()
 
     def create_unpublished_tab(self):
-        self.unpublished_posts = self.load_from_file("unpublished_posts.json")
+        self.create_post_list()
 
         self.unpublished_title = tk.Entry(self.unpublished_tab)
         self.unpublished_title.pack(pady=5)
@@ -381,6 +644,16 @@ class App:
                                                         variable=self.ready_to_publish_var)
         self.ready_to_publish_checkbox.pack(pady=5)
 
+        tk.Label(self.unpublished_tab, text="Publish at (YYYY-MM-DD HH:MM, optional)").pack()
+        self.publish_at_entry = tk.Entry(self.unpublished_tab)
+        self.publish_at_entry.pack(pady=5)
+        self.schedule_status_label = tk.Label(self.unpublished_tab, text="")
+        self.schedule_status_label.pack()
+        self.duplicate_label = tk.Label(self.unpublished_tab, text="", fg="darkorange")
+        self.duplicate_label.pack()
+        self.suggested_tag_label = tk.Label(self.unpublished_tab, text="", fg="gray30")
+        self.suggested_tag_label.pack()
+
         self.buttons_frame = tk.Frame(self.unpublished_tab)
         self.buttons_frame.pack(pady=5)
 
@@ -410,12 +683,279 @@ class App:
         self.unpublished_export_button = tk.Button(self.buttons_frame, text="Export", command=self.export_to_csv)
         self.unpublished_export_button.grid(row=0, column=7, padx=5)
 
+        self.unpublished_publish_button = tk.Button(self.buttons_frame, text="Publish Ready",
+                                                    command=self.publish_ready_posts)
+        self.unpublished_publish_button.grid(row=0, column=8, padx=5)
+
+        self.unpublished_auto_tag_button = tk.Button(self.buttons_frame, text="Auto-tag",
+                                                     command=self.auto_tag_unpublished_posts)
+        self.unpublished_auto_tag_button.grid(row=0, column=9, padx=5)
+
+        self.load_post_list()
         if self.unpublished_posts:
             self.display_unpublished_post(self.unpublished_posts[0])
 
-    def create_published_tab(self):
-        self.published_posts = self.load_from_file("published_posts.json")
+    def create_post_list(self):
+        """The list of unpublished posts down the left of the tab, with actions for the posts selected in it."""
+        self.post_list_frame = tk.Frame(self.unpublished_tab)
+        self.post_list_frame.pack(side="left", fill="y", padx=5, pady=5)
+
+        self.filter_frame = tk.LabelFrame(self.post_list_frame, text="Filter")
+        self.filter_frame.pack(fill="x", pady=5)
+        for row, facet in enumerate(facets.FACETS):
+            tk.Label(self.filter_frame, text=facets.FACET_LABELS[facet]).grid(row=row, column=0, padx=5, sticky="w")
+            dropdown = ttk.Combobox(self.filter_frame, state="readonly", width=28)
+            dropdown.grid(row=row, column=1, padx=5, pady=1)
+            dropdown.bind("<<ComboboxSelected>>", lambda event, facet=facet: self.facet_filter_changed(facet))
+            self.facet_dropdowns[facet] = dropdown
+        self.view_count_label = tk.Label(self.filter_frame, text="")
+        self.view_count_label.grid(row=len(facets.FACETS), column=0, padx=5, sticky="w")
+        tk.Button(self.filter_frame, text="Clear Filters",
+                  command=self.clear_facet_filters).grid(row=len(facets.FACETS), column=1, padx=5, sticky="e")
+        self.unpublished_facets.sync(self.unpublished_posts)
+        self.update_facet_choices()
+        self.update_unpublished_view()
+
+        self.post_listbox_frame = tk.Frame(self.post_list_frame)
+        self.post_listbox_frame.pack(expand=True, fill="both")
+        self.post_listbox = tk.Listbox(self.post_listbox_frame, selectmode=tk.EXTENDED, width=40,
+                                       exportselection=False)
+        self.post_listbox.pack(side="left", expand=True, fill="both")
+        self.post_list_scrollbar = tk.Scrollbar(self.post_listbox_frame, orient="vertical",
+                                                command=self.post_listbox.yview)
+        self.post_list_scrollbar.pack(side="right", fill="y")
+        self.post_listbox.config(yscrollcommand=self.post_list_scrollbar.set)
+        self.post_listbox.bind("<<ListboxSelect>>", self.post_list_selected)
+
+        self.bulk_frame = tk.LabelFrame(self.post_list_frame, text="Selected posts")
+        self.bulk_frame.pack(fill="x", pady=5)
+        self.selection_label = tk.Label(self.bulk_frame, text="0 selected")
+        self.selection_label.grid(row=0, column=0, padx=5, sticky="w")
+        tk.Button(self.bulk_frame, text="Select All", command=self.select_all_posts).grid(row=0, column=1, padx=5)
+        tk.Button(self.bulk_frame, text="Clear", command=self.clear_post_selection).grid(row=0, column=2, padx=5)
+
+        self.bulk_tags_dropdown = ttk.Combobox(self.bulk_frame, width=18)
+        self.bulk_tags_dropdown.grid(row=1, column=0, padx=5, pady=2)
+        self.load_tags_dropdown(self.bulk_tags_dropdown)
+        tk.Button(self.bulk_frame, text="Set Tag", command=self.bulk_set_tag).grid(row=1, column=1, columnspan=2,
+                                                                                  sticky="we", padx=5)
+
+        tk.Button(self.bulk_frame, text="Mark Ready",
+                  command=lambda: self.bulk_set_ready(True)).grid(row=2, column=0, sticky="we", padx=5, pady=2)
+        tk.Button(self.bulk_frame, text="Mark Not Ready",
+                  command=lambda: self.bulk_set_ready(False)).grid(row=2, column=1, columnspan=2, sticky="we", padx=5)
+
+        self.bulk_bucket_entry = tk.Entry(self.bulk_frame, width=20)
+        self.bulk_bucket_entry.grid(row=3, column=0, padx=5, pady=2)
+        self.bulk_bucket_entry.insert(0, "S3 Bucket URL")
+        self.bulk_folder_entry = tk.Entry(self.bulk_frame, width=20)
+        self.bulk_folder_entry.grid(row=4, column=0, padx=5, pady=2)
+        self.bulk_folder_entry.insert(0, "S3 Folder Path")
+        tk.Button(self.bulk_frame, text="Set Media Location",
+                  command=self.bulk_set_location).grid(row=3, column=1, rowspan=2, columnspan=2, sticky="we", padx=5)
+
+        tk.Button(self.bulk_frame, text="Publish Selected",
+                  command=self.publish_selected_posts).grid(row=5, column=0, sticky="we", padx=5, pady=2)
+        tk.Button(self.bulk_frame, text="Delete Selected",
+                  command=self.delete_selected_posts).grid(row=5, column=1, columnspan=2, sticky="we", padx=5)
+
+    def load_post_list(self, changes=None):
+        """Fills the post list with the posts passing the filters, keeping the selection of those still there.
+
+        With a store_watch.StoreChanges only the rows of the posts it names are inserted, deleted or relabelled;
+        without one, on a resync or when the posts changed order, every row is rebuilt.
+        """
+        posts = [self.unpublished_posts[index] for index in self.unpublished_view]
+        if changes is None or changes.resync or changes.reordered or not self.update_post_list_rows(posts, changes):
+            selected = set(self.selected_post_ids())
+            self.post_listbox.delete(0, tk.END)
+            self.post_list_ids = [post.get('id') for post in posts]
+            self.post_listbox.insert(tk.END, *[self.post_list_label(post) for post in posts])
+            for row, post_id in enumerate(self.post_list_ids):
+                if post_id in selected:
+                    self.post_listbox.selection_set(row)
+        self.update_selection_label()
+        self.view_count_label.config(text=f"Showing {len(posts)} of {len(self.unpublished_posts)}")
+
+    def update_post_list_rows(self, posts, changes):
+        """Edits the rows in place to show `posts`. Returns False, touching nothing, if a full rebuild is needed."""
+        old_ids = self.post_list_ids
+        new_ids = [post.get('id') for post in posts]
+        old_set, new_set = set(old_ids), set(new_ids)
+        # Rows that stay must already be in the new order, or inserting around them would misplace posts
+        if [post_id for post_id in old_ids if post_id in new_set] != \
+                [post_id for post_id in new_ids if post_id in old_set]:
+            return False
+
+        for row in range(len(old_ids) - 1, -1, -1):
+            if old_ids[row] not in new_set:
+                self.post_listbox.delete(row)
+        rows = [post_id for post_id in old_ids if post_id in new_set]
+        changed = set(changes.changed)
+        for row, (post_id, post) in enumerate(zip(new_ids, posts)):
+            if row < len(rows) and rows[row] == post_id:
+                if post_id in changed:
+                    selected = self.post_listbox.selection_includes(row)
+                    self.post_listbox.delete(row)
+                    self.post_listbox.insert(row, self.post_list_label(post))
+                    if selected:
+                        self.post_listbox.selection_set(row)
+            else:
+                self.post_listbox.insert(row, self.post_list_label(post))
+                rows.insert(row, post_id)
+        self.post_list_ids = new_ids
+        return True
+
+    def update_facet_choices(self):
+        """Refreshes each filter's choices with the current counts."""
+        for facet, dropdown in self.facet_dropdowns.items():
+            choices = {"All": None}
+            for value, count in self.unpublished_facets.counts(facet).items():
+                choices[f"{facets.value_label(facet, value)} ({count})"] = value
+            self.facet_choices[facet] = choices
+            dropdown['values'] = list(choices)
+            if facet not in self.facet_filters:
+                dropdown.set("All")
+                continue
+            value = self.facet_filters[facet]
+            label = next((label for label, choice in choices.items() if choice is not None and choice == value), None)
+            dropdown.set(label or f"{facets.value_label(facet, value)} (0)")
+
+    def update_unpublished_view(self):
+        matching = self.unpublished_facets.matching(self.facet_filters)
+        if matching is None:
+            self.unpublished_view = range(len(self.unpublished_posts))
+        else:
+            self.unpublished_view = [index for index, post in enumerate(self.unpublished_posts)
+                                     if post.get('id') in matching]
+
+    def facet_filter_changed(self, facet):
+        value = self.facet_choices[facet].get(self.facet_dropdowns[facet].get())
+        if value is None:
+            self.facet_filters.pop(facet, None)
+        else:
+            self.facet_filters[facet] = value
+        self.apply_facet_filters()
+
+    def clear_facet_filters(self):
+        self.facet_filters.clear()
+        self.update_facet_choices()
+        self.apply_facet_filters()
+
+    def apply_facet_filters(self):
+        self.update_unpublished_view()
+        self.load_post_list()
+        # Jump to the first matching post unless the one on screen still matches
+        view = self.unpublished_view
+        position = self.unpublished_view_position()
+        if view and not (position < len(view) and view[position] == self.current_unpublished_index):
+            self.show_view_position(0)
+
+    def unpublished_view_position(self):
+        """Position of the displayed post in the filtered view, or of the first matching post after it."""
+        view, index = self.unpublished_view, self.current_unpublished_index
+        position = self.unpublished_view_hint
+        if position < len(view) and view[position] == index:
+            return position
+        return bisect.bisect_left(view, index)
+
+    def show_view_position(self, position):
+        index = self.unpublished_view[position]
+        self.unpublished_view_hint = position
+        self.post_listbox.see(position)
+        self.post_listbox.activate(position)
+        self.display_unpublished_post(self.unpublished_posts[index], index)
+
+    def post_list_label(self, post):
+        ready = "\u2713 " if post.get('ready_to_publish') else "   "
+        return f"{ready}{post.get('title', '')} [{post.get('tag') or 'Uncategorised'}]"
+
+    def selected_post_ids(self):
+        if not self.post_list_ids:
+            return []
+        return [self.post_list_ids[index] for index in self.post_listbox.curselection()]
+
+    def update_selection_label(self):
+        self.selection_label.config(text=f"{len(self.post_listbox.curselection())} selected")
+
+    def post_list_selected(self, event):
+        selection = self.post_listbox.curselection()
+        self.update_selection_label()
+        # Clicking one post opens it; extending the selection leaves the form alone
+        if len(selection) == 1 and selection[0] < len(self.unpublished_view):
+            self.show_view_position(selection[0])
+
+    def select_all_posts(self):
+        self.post_listbox.selection_set(0, tk.END)
+        self.update_selection_label()
+
+    def clear_post_selection(self):
+        self.post_listbox.selection_clear(0, tk.END)
+        self.update_selection_label()
+
+    def bulk_edit(self, description, **fields):
+        """Applies fields to every selected post with one save and one summary."""
+        post_ids = self.selected_post_ids()
+        if not post_ids:
+            messagebox.showwarning("Warning", "Select posts in the list first.")
+            return
+        try:
+            updated = self.service.bulk_update(post_ids, **fields)
+        except (core.ServiceError, IOError) as e:
+            logging.error("Bulk edit failed: %s", e)
+            messagebox.showerror("Error", f"Bulk edit failed: {e}")
+            return
+        if "ready_to_publish" in fields:
+            self.publish_queue.sync_from_posts(self.unpublished_posts)
+        self.show_unpublished_posts(store_watch.StoreChanges(changed=updated))
+        skipped = len(post_ids) - len(updated)
+        self.notify(f"{description} on {len(updated)} posts."
+                    + (f" {skipped} selected posts no longer exist." if skipped else ""))
+
+    def bulk_set_tag(self):
+        tag = self.bulk_tags_dropdown.get().strip()
+        if not tag:
+            messagebox.showwarning("Warning", "Choose a tag to set.")
+            return
+        self.bulk_edit(f"Tag set to '{tag}'", tag=tag)
+
+    def bulk_set_ready(self, ready):
+        self.bulk_edit("Marked ready to publish" if ready else "Cleared ready to publish", ready_to_publish=ready)
+
+    def bulk_set_location(self):
+        bucket = self.bulk_bucket_entry.get().strip()
+        folder = self.bulk_folder_entry.get().strip()
+        if bucket in ("", "S3 Bucket URL") or folder == "S3 Folder Path":
+            messagebox.showwarning("Warning", "Enter the S3 bucket URL and folder path to set.")
+            return
+        self.bulk_edit(f"Media location set to {bucket}/{folder}", s3_bucket_url=bucket, s3_folder_path=folder)
+
+    def delete_selected_posts(self):
+        post_ids = self.selected_post_ids()
+        if not post_ids:
+            messagebox.showwarning("Warning", "Select posts in the list first.")
+            return
+        if not messagebox.askyesno("Confirm Delete", f"Delete {len(post_ids)} selected posts?"):
+            return
+        try:
+            removed = self.service.bulk_delete(post_ids)
+        except IOError as e:
+            logging.error("Bulk delete failed: %s", e)
+            messagebox.showerror("Error", f"Failed to delete posts: {e}")
+            return
+        self.publish_queue.sync_from_posts(self.unpublished_posts)
+        self.show_unpublished_posts(store_watch.StoreChanges(removed=post_ids))
+        self.notify(f"{removed} posts deleted.")
+
+    def publish_selected_posts(self):
+        selected = set(self.selected_post_ids())
+        posts = [post for post in self.unpublished_posts if post.get('id') in selected]
+        if not posts:
+            messagebox.showwarning("Warning", "Select posts in the list first.")
+            return
+        self.start_publishing(posts)
 
+    def create_published_tab(self):
         self.published_title = tk.Entry(self.published_tab, state='disabled')
         self.published_title.pack(pady=5)
 
@@ -493,7 +1033,7 @@ class App:
             })
 
         self.save_generated_posts_to_json(generated_posts)
-        messagebox.showinfo("Success", f"{num_posts} posts generated and saved to 'generated_posts.json'.")
+        self.notify(f"{num_posts} posts generated and saved to 'generated_posts.json'.")
 
     def submit_to_chatgpt(self):
         selected_index = self.prompt_titles_listbox.curselection()
@@ -501,159 +1041,214 @@ class App:
             messagebox.showwarning("Warning", "Please select a prompt to send to ChatGPT.")
             return
 
-        selected_prompt = self.prompts_list[selected_index[0]]['details']
         selected_prompt_name = self.prompts_list[selected_index[0]]['name']
-
-        pre_appended_info = ""
-        all_prompt_data = self.load_from_file("prompt_customer_info.json", default={})
-        selected_customers = all_prompt_data.get(selected_prompt_name, {})
-
-        for customer_name, selected in selected_customers.items():
-            if selected:
-                customer = next((cust for cust in self.customer_info_list if cust['name'] == customer_name), None)
-                if customer:
-                    pre_appended_info += f"{customer_name}: {customer['details']}\n"
-
-        combined_prompt = pre_appended_info + "\n" + selected_prompt
+        try:
+            combined_prompt = self.service.build_prompt(selected_prompt_name)
+        except (core.ServiceError, ValueError, IOError) as e:
+            messagebox.showerror("Error", f"Failed to build prompt: {e}")
+            return
         self.log_prompt(combined_prompt)
 
-        response_text = self.submit_prompt_to_chatgpt(combined_prompt)
-        if response_text:
-            self.import_chatgpt_response(response_text)
-
-    def submit_prompt_to_chatgpt(self, prompt):
-        try:
-            credentials_path = os.path.expanduser("~/.chatgpt_credentials")
-            if not os.path.exists(credentials_path):
-                messagebox.showwarning("Warning", "No ChatGPT API key found. Please save the API key first.")
-                return
+        call_record = ledger.new_call_record(combined_prompt, selected_prompt_name)
+        self.submit_prompt_to_chatgpt(combined_prompt, call_record)
 
-            with open(credentials_path, "r") as file:
-                chatgpt_api_key = file.read().strip()
+    def submit_prompt_to_chatgpt(self, prompt, call_record=None):
+        """Requests the completion on a worker thread: retries back off for seconds, which would freeze the window.
 
-            openai.api_key = chatgpt_api_key
+        The response is imported and the call record written on the Tk thread once the request settles.
+        """
+        if call_record is None:
+            call_record = ledger.new_call_record(prompt)
+        self.show_loading("Waiting for the model's response...")
 
-            response = openai.ChatCompletion.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system",
-                     "content": "You are a specialist in social media, comedy, and storytelling. Your task is to generate a JSON array of objects, each containing a 'caption' field and a 'content' field. Output the response in JSON format only without any additional text or explanations."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=800
-            )
+        def work():
+            try:
+                response_text = self.service.request_completion(prompt, call_record, call_record.get("prompt_name"))
+            except Exception as e:
+                self.call_in_ui(self.finish_chatgpt_call, call_record, None, e)
+                return
+            self.call_in_ui(self.finish_chatgpt_call, call_record, response_text, None)
+
+        threading.Thread(target=work, name="generate", daemon=True).start()
+
+    def finish_chatgpt_call(self, call_record, response_text, error):
+        self.hide_loading()
+        if error is not None:
+            self.report_completion_error(error)
+        elif response_text:
+            counts = self.import_chatgpt_response(response_text, call_record)
+            if counts:
+                call_record["posts_parsed"], call_record["posts_rejected"] = counts
+        ledger.write_call_record(call_record)
+
+    def report_completion_error(self, error):
+        if isinstance(error, core.ServiceError):
+            messagebox.showwarning("Warning", str(error))
+            return
+        if isinstance(error, llm_providers.ProviderError):
+            logging.error("LLM provider error: %s", error)
+            messagebox.showerror("API Error", str(error))
+            return
+        if type(error).__module__.split(".")[0] != "openai":
+            logging.error("An unexpected error occurred: %s", error)
+            messagebox.showerror("Error", f"An unexpected error occurred: {error}")
+            return
+        # Only the OpenAI provider raises SDK errors, so the package is imported only once one has been raised.
+        import openai
+
+        if isinstance(error, openai.error.RateLimitError):
+            message = "Rate limit exceeded. Please try again later."
+        elif isinstance(error, openai.error.AuthenticationError):
+            message = "Authentication failed. Please check your API key."
+        elif isinstance(error, openai.error.APIConnectionError):
+            message = "Failed to connect to the API. Please check your network connection."
+        else:
+            message = f"An error occurred: {error}"
+        logging.error("%s", message)
+        messagebox.showerror("API Error", message)
 
-            response_text = response['choices'][0]['message']['content'].strip()
-            logging.info(f"ChatGPT response: {response_text}")
+    def submit_batch_job(self):
+        """Submits the selected prompt as a Batch API job; "Number of Posts" sets how many requests it makes."""
+        selected_index = self.prompt_titles_listbox.curselection()
+        if not selected_index:
+            messagebox.showwarning("Warning", "Please select a prompt to submit.")
+            return
+        prompt_name = self.prompts_list[selected_index[0]]['name']
+        runs = self.num_posts_entry.get().strip()
+        runs = int(runs) if runs.isdigit() and int(runs) > 0 else 1
 
-            # Debug print statement
-            print(f"ChatGPT response: {response_text}")
+        def submit():
+            try:
+                job = self.batch_jobs.submit([(prompt_name, runs)])
+            except Exception as e:
+                self.notify(f"Batch submission failed: {e}", notifications.ERROR)
+                return
+            self.batch_poller.wake()
+            self.call_in_ui(self.batch_job_submitted, job)
 
-            # Validate and sanitize JSON response
-            response_text = self.sanitize_json(response_text)
-            if not self.is_valid_json(response_text):
-                raise json.JSONDecodeError("Response is not in valid JSON format", response_text, 0)
+        threading.Thread(target=submit, name="batch-submit", daemon=True).start()
 
-            return response_text
-        except openai.error.RateLimitError:
-            logging.error("Rate limit exceeded. Please try again later.")
-            messagebox.showerror("API Error", "Rate limit exceeded. Please try again later.")
-            return None
-        except openai.error.AuthenticationError:
-            logging.error("Authentication failed. Please check your API key.")
-            messagebox.showerror("API Error", "Authentication failed. Please check your API key.")
-            return None
-        except openai.error.APIConnectionError:
-            logging.error("Failed to connect to the API. Please check your network connection.")
-            messagebox.showerror("API Error", "Failed to connect to the API. Please check your network connection.")
-            return None
-        except openai.error.OpenAIError as e:
-            logging.error(f"An error occurred: {e}")
-            messagebox.showerror("API Error", f"An error occurred: {e}")
-            return None
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
-            messagebox.showerror("Error", f"An unexpected error occurred: {e}")
-            return None
+    def batch_job_submitted(self, job):
+        self.update_batch_status()
+        self.notify(f"Submitted {len(job['requests'])} requests as batch job {job['id']}. "
+                    "Posts are imported automatically when it finishes (usually within 24h).")
 
-    def log_prompt(self, prompt, filename="chatgpt_prompts.log"):
-        with open(filename, "a", encoding="utf-8") as log_file:
-            log_file.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} - PROMPT: {prompt}\n")
+    def batch_job_completed(self, job, response_text, failures):
+        """Runs on the poller thread; the import itself happens on the Tk thread."""
+        self.call_in_ui(self.import_batch_job, job, response_text, failures)
 
-    def import_chatgpt_response(self, response):
-        logging.info(f"Importing ChatGPT response: {response}")
+    def import_batch_job(self, job, response_text, failures):
+        if self.batch_jobs.already_imported(job):
+            self.batch_jobs.mark_imported(job, len(job["imported_ids"]), failures)
+            return
+        logging.info("Importing batch job %s", job["id"])
+        with self.notifier.tally(f"Batch job {job['id']}") as tally:
+            counts = self.parse_chatgpt_response(response_text, tally=tally,
+                                                 importer=functools.partial(self.batch_jobs.import_response, job))
+            if counts is None:
+                # Not marked imported, so the poller offers the results again on its next check
+                self.batch_jobs.mark_import_failed(job, tally.notes[-1] if tally.notes else "see the log")
+                tally.note("It will be retried on the next check.")
+            else:
+                self.batch_jobs.mark_imported(job, counts[0], failures)
+                tally.add("requests failed", len(failures), notifications.WARNING)
+                for custom_id, message in failures:
+                    tally.detail(f"{custom_id}: {message}")
+        self.refresh_unpublished_posts()
+        self.update_batch_status()
+
+    def batch_status(self):
+        active = self.batch_jobs.active()
+        if not active:
+            return ""
+        requests = sum(len(job["requests"]) for job in active)
+        return f"{len(active)} batch job(s) running ({requests} requests)"
+
+    def update_batch_status(self):
+        if self.tab_built(self.generate_tab):
+            self.batch_status_label.config(text=self.batch_status())
+
+    def log_prompt(self, prompt, filename=core.PROMPT_LOG_FILE):
+        core.log_prompt(prompt, filename)
+
+    def import_chatgpt_response(self, response, call_record=None):
+        logging.info("Importing ChatGPT response: %d chars", len(response))
         self.generated_response = response
-        self.parse_chatgpt_response(response)
+        return self.parse_chatgpt_response(response, call_record)
 
-    def parse_chatgpt_response(self, response):
+    def parse_chatgpt_response(self, response, call_record=None, tally=None, importer=None):
+        """Appends valid posts from the response and returns (parsed, rejected) counts, or None on failure.
+
+        Outcomes are counted on `tally` when given (one summary for several responses), else reported at once.
+        importer(response, source_prompt) replaces ContentService.import_response, e.g. for batch jobs.
+        """
+        if tally is None:
+            with self.notifier.tally("Import") as tally:
+                return self.parse_chatgpt_response(response, call_record, tally, importer)
         try:
-            # Attempt to sanitize the JSON response
-            response = self.sanitize_json(response)
-
-            # Load the response as JSON
-            posts = json.loads(response)
-            logging.info(f"Parsed posts: {posts}")
-
-            # Validate the response structure
-            if not isinstance(posts, list):
-                raise ValueError("The response is not a valid JSON array.")
-
-            for post in posts:
-                # Ensure each post is a dictionary and contains the 'caption' and 'content' fields
-                if isinstance(post, dict) and 'caption' in post and 'content' in post:
-                    self.unpublished_posts.append({
-                        "title": post.get("title", "Untitled Post"),
-                        "description": post["content"],  # Use 'content' for description
-                        "type": post.get("type", "Unknown Type"),
-                        "caption": post["caption"],
-                        "s3_bucket_url": "",
-                        "s3_folder_path": "",
-                        "s3_file_name": "",
-                        "ready_to_publish": False
-                    })
-                else:
-                    logging.warning(f"Invalid post format: {post}")
-                    messagebox.showwarning("Warning", f"Invalid post format: {post}")
-
-            # Save the updated unpublished posts
-            self.save_to_file(self.unpublished_posts, "unpublished_posts.json")
-            logging.info("ChatGPT response parsed and added to Unpublished Posts.")
-            messagebox.showinfo("Success", "ChatGPT response parsed and added to Unpublished Posts.")
+            source_prompt = call_record.get("prompt_name") if call_record is not None else None
+            new_posts, invalid_posts = (importer or self.service.import_response)(response, source_prompt)
+            logging.info("Parsed posts: %s", summarize(new_posts))
+
+            dropped = [post for post in invalid_posts
+                       if isinstance(post, models.Post) and post.get("near_duplicate_of")]
+            tally.add("posts imported", len(new_posts))
+            tally.add("flagged as near-duplicates", sum(1 for post in new_posts if post.get("near_duplicate_of")))
+            tally.add("near-duplicates dropped", len(dropped))
+            tally.add("rejected", len(invalid_posts) - len(dropped), notifications.WARNING)
+            for post in invalid_posts:
+                if not (isinstance(post, models.Post) and post.get("near_duplicate_of")):
+                    tally.detail(f"Invalid post format: {post}")
+            return len(new_posts), len(invalid_posts)
         except json.JSONDecodeError as e:
-            logging.error(f"JSONDecodeError: {e}")
-            messagebox.showerror("Error", f"Failed to parse ChatGPT response as JSON: {e}")
+            if call_record is not None:
+                ledger.record_error(call_record, e)
+            tally.note(f"Failed to parse ChatGPT response as JSON: {e}", notifications.ERROR)
         except Exception as e:
-            logging.error(f"Error: {e}")
-            messagebox.showerror("Error", f"An unexpected error occurred: {e}")
+            if call_record is not None:
+                ledger.record_error(call_record, e)
+            logging.exception("Importing a ChatGPT response failed")
+            tally.note(f"An unexpected error occurred: {e}", notifications.ERROR)
 
     def sanitize_json(self, json_string):
-        if json_string.startswith("```json"):
-            json_string = json_string[7:].strip()  # Remove the ```json prefix
-        if json_string.endswith("```"):
-            json_string = json_string[:-3].strip()  # Remove the ``` suffix
-
-        # Ensure the JSON string ends correctly
-        try:
-            json_data = json.loads(json_string)
-            if isinstance(json_data, list):
-                return json_string
-            else:
-                raise ValueError("Expected a list of JSON objects.")
-        except ValueError:
-            return f"[{json_string}]"
+        return core.sanitize_json(json_string)
 
     def is_valid_json(self, json_string):
-        try:
-            json.loads(json_string)
-            return True
-        except ValueError:
-            return False
+        return core.is_valid_json(json_string)
 
     def load_and_display_logs(self):
         logs = self.load_logged_prompts()
         self.logs_text.delete("1.0", tk.END)
         self.logs_text.insert(tk.END, "".join(logs))
 
+    def toggle_profiling(self):
+        if not self.profiler.running:
+            self.profiler.start()
+            self.profile_button.config(text="Stop Profiling")
+            self.profile_status_label.config(text="Profiling... reproduce the slow action, then stop")
+            return
+        try:
+            result = self.profiler.stop()
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save the profile: {e}")
+            return
+        finally:
+            self.profile_button.config(text="Start Profiling")
+        self.profile_status_label.config(
+            text=f"Profiled {result.seconds:.1f}s, saved to {result.pstats_path} and {result.collapsed_path}")
+        self.show_profile(result)
+
+    def show_profile(self, result):
+        self.profile_tree.delete(*self.profile_tree.get_children())
+        profiled = self.profile_tree.insert("", tk.END, text="UI thread (cProfile)", open=True)
+        for label, calls, self_time, total_time in result.profiled:
+            self.profile_tree.insert(profiled, tk.END, text=label,
+                                     values=(calls, f"{self_time * 1000:.1f}", f"{total_time * 1000:.1f}"))
+        sampled = self.profile_tree.insert("", tk.END, text="All threads (sampled)", open=True)
+        for label, self_time, total_time in result.sampled:
+            self.profile_tree.insert(sampled, tk.END, text=label,
+                                     values=("", f"{self_time * 1000:.0f}", f"{total_time * 1000:.0f}"))
+
     def load_logged_prompts(self, filename="chatgpt_prompts.log"):
         if not os.path.exists(filename):
             messagebox.showwarning("Warning", "No log file found.")
@@ -663,23 +1258,37 @@ class App:
             return log_file.readlines()
 
     def load_tags_dropdown(self, dropdown):
+        if dropdown is None:
+            return
         tags = self.load_from_file("tags.json", default=[])
-        logging.info(f"Loaded tags: {tags}")
+        logging.info("Loaded tags: %s", summarize(tags))
         if isinstance(tags, list) and all(isinstance(tag, dict) and 'name' in tag for tag in tags):
             dropdown['values'] = [tag['name'] for tag in tags]
         else:
-            logging.error(f"Tags are not in the expected format: {tags}")
+            logging.error("Tags are not in the expected format: %s", summarize(tags))
             messagebox.showerror("Error", "Failed to load tags. Tags are not in the expected format.")
 
     def load_unpublished_posts(self):
-        return self.load_from_file("unpublished_posts.json")
+        posts = self.load_from_file("unpublished_posts.json", model=models.Post)
+        core.ensure_post_ids(posts)
+        return posts
 
     def load_published_posts(self):
-        return self.load_from_file("published_posts.json")
+        posts = self.load_from_file("published_posts.json", model=models.Post)
+        core.ensure_post_ids(posts)
+        return posts
 
     def save_unpublished_post(self):
         post_title = self.unpublished_title.get().strip()
-        logging.info(f"Attempting to save post with title: '{post_title}'")
+        logging.info("Attempting to save post with title: '%s'", post_title)
+
+        publish_at = self.publish_at_entry.get().strip()
+        if publish_at:
+            try:
+                scheduler.parse_publish_at(publish_at)
+            except ValueError:
+                messagebox.showerror("Error", "Publish time must look like 2024-05-01 09:30.")
+                return
 
         post = {
             "title": post_title,
@@ -690,25 +1299,33 @@ class App:
             "s3_folder_path": self.s3_folder_path.get().strip(),
             "s3_file_name": self.s3_file_name.get().strip(),
             "tag": self.unpublished_tags_dropdown.get().strip() or "Uncategorised",  # Default to "Uncategorised"
-            "ready_to_publish": self.ready_to_publish_var.get()
+            "ready_to_publish": self.ready_to_publish_var.get(),
+            "publish_at": publish_at
         }
 
         try:
             if self.current_unpublished_index < len(self.unpublished_posts):
+                # Keep fields the form doesn't show (id, publish results, duplicate flags)
+                existing = self.unpublished_posts[self.current_unpublished_index]
+                post = models.Post.from_dict({**existing, **post, "id": existing.get("id") or core.new_post_id()})
+                # A tag saved from the form counts as confirmed, so the tag model may learn from it
+                post.pop("tag_source", None)
                 self.unpublished_posts[self.current_unpublished_index] = post
             else:
+                post = models.Post.from_dict({**post, "id": core.new_post_id()})
                 self.unpublished_posts.append(post)
+                self.displayed_unpublished_id = post['id']
 
-            logging.info(f"Updated unpublished posts: {self.unpublished_posts}")
-            self.save_to_file(self.unpublished_posts, "unpublished_posts.json")
-            messagebox.showinfo("Success", "Post saved successfully.")
+            logging.info("Updated unpublished posts: %s", summarize(self.unpublished_posts))
+            if self.save_to_file(self.unpublished_posts, "unpublished_posts.json"):
+                self.notify("Post saved successfully.")
         except Exception as e:
-            logging.error(f"Error saving post: {e}")
+            logging.error("Error saving post: %s", e)
             messagebox.showerror("Error", f"Failed to save post: {e}")
         finally:
             self.refresh_unpublished_posts()
 
-    def display_unpublished_post(self, post):
+    def display_unpublished_post(self, post, index=None):
         self.unpublished_title.delete(0, tk.END)
         self.unpublished_title.insert(0, post['title'])
 
@@ -735,23 +1352,81 @@ class App:
         # Ensure the tag is displayed as "Uncategorised" if it's missing or empty
         tag = post.get('tag', '').strip() or "Uncategorised"
         self.tag_label.config(text=f"Tag: {tag}")
+        self.unpublished_tags_dropdown.set(tag)
+        self.suggested_tag_label.config(text=self.suggested_tag_status(post))
 
         self.ready_to_publish_var.set(post.get('ready_to_publish', False))
-        self.current_unpublished_index = self.unpublished_posts.index(post)
+        self.publish_at_entry.delete(0, tk.END)
+        self.publish_at_entry.insert(0, post.get('publish_at', ''))
+        self.schedule_status_label.config(text=self.schedule_status(post))
+        self.duplicate_label.config(text=self.duplicate_status(post))
+        self.current_unpublished_index = self.unpublished_posts.index(post) if index is None else index
+        self.displayed_unpublished_id = post.get('id')
+
+    def suggested_tag_status(self, post):
+        suggested = post.get('suggested_tag')
+        if not suggested:
+            return ""
+        if post.get('tag_source') == "auto":
+            return f"Tag '{suggested}' was assigned automatically; save to confirm it"
+        if suggested == (post.get('tag') or '').strip():
+            return ""
+        return f"Suggested tag: {suggested} ({post.get('suggested_tag_score', 0):.0%} match)"
+
+    def duplicate_status(self, post):
+        original_id = post.get('near_duplicate_of')
+        if not original_id:
+            return ""
+        posts, index = self.service.find_post(original_id)
+        original = f"'{posts[index]['title']}'" if posts is not None else "a deleted post"
+        return f"Possible near-duplicate of {original} ({post.get('duplicate_similarity', 0):.0%} similar)"
+
+    def schedule_status(self, post):
+        entry = self.publish_queue.entries.get(post.get('id'))
+        if entry is None:
+            return ""
+        if entry["status"] == "failed":
+            return f"Scheduled publish failed: {entry['last_error']}"
+        if entry["attempts"]:
+            return f"Retrying at {entry['due_at']} (attempt {entry['attempts']} failed: {entry['last_error']})"
+        return f"Scheduled for {entry['due_at']}"
 
     def refresh_unpublished_posts(self):
         logging.info("Refreshing unpublished posts...")
-        self.unpublished_posts = self.load_unpublished_posts()
-        logging.info(f"Loaded unpublished posts: {self.unpublished_posts}")
-        if self.unpublished_posts:
-            self.current_unpublished_index = 0
-            self.display_unpublished_post(self.unpublished_posts[0])
-        else:
+        changes = self.reload_store(core.UNPUBLISHED_POSTS_FILE)
+        if changes:
+            logging.info("Loaded unpublished posts: %s", summarize(self.unpublished_posts))
+        # Also after our own saves, which reload_store doesn't report: they may set or clear publish_at
+        self.publish_queue.sync_from_posts(self.unpublished_posts)
+        self.show_unpublished_posts(changes)
+
+    def show_unpublished_posts(self, changes=None):
+        """Updates the Unpublished view after the list changed, keeping the displayed post on screen.
+
+        The form is only redrawn when the displayed post itself changed or left the list, so a reload that
+        touched other posts doesn't throw away unsaved edits.
+        """
+        if not self.tab_built(self.unpublished_tab):
+            return
+        self.unpublished_facets.apply(self.unpublished_posts, changes)
+        self.update_facet_choices()
+        self.update_unpublished_view()
+        self.load_post_list(changes)
+        if not self.unpublished_posts:
             self.clear_unpublished_post_display()
+            return
+        index = core.post_index(self.unpublished_posts, self.displayed_unpublished_id)
+        if index is None:
+            index = min(self.current_unpublished_index, len(self.unpublished_posts) - 1)
+            self.display_unpublished_post(self.unpublished_posts[index])
+        elif changes and (changes.resync or self.displayed_unpublished_id in changes.changed):
+            self.display_unpublished_post(self.unpublished_posts[index])
+        else:
+            self.current_unpublished_index = index
 
     def delete_unpublished_post(self):
         post_title = self.unpublished_title.get().strip()
-        logging.info(f"Attempting to delete post with title: '{post_title}'")
+        logging.info("Attempting to delete post with title: '%s'", post_title)
 
         if self.current_unpublished_index >= len(self.unpublished_posts):
             messagebox.showwarning("Warning", "No post selected to delete.")
@@ -763,12 +1438,13 @@ class App:
 
         try:
             del self.unpublished_posts[self.current_unpublished_index]
-            logging.info(f"Remaining unpublished posts: {self.unpublished_posts}")
-            self.save_to_file(self.unpublished_posts, "unpublished_posts.json")
+            logging.info("Remaining unpublished posts: %s", summarize(self.unpublished_posts))
+            saved = self.save_to_file(self.unpublished_posts, "unpublished_posts.json")
             self.refresh_unpublished_posts()
-            messagebox.showinfo("Success", "Post deleted successfully.")
+            if saved:
+                self.notify("Post deleted successfully.")
         except Exception as e:
-            logging.error(f"Error deleting post: {e}")
+            logging.error("Error deleting post: %s", e)
             messagebox.showerror("Error", f"Failed to delete post: {e}")
 
     def clear_unpublished_post_display(self):
@@ -783,20 +1459,28 @@ class App:
         self.s3_file_name.delete(0, tk.END)
         self.s3_file_name.config(state='disabled')
         self.ready_to_publish_var.set(False)
+        self.publish_at_entry.delete(0, tk.END)
+        self.schedule_status_label.config(text="")
+        self.duplicate_label.config(text="")
+        self.suggested_tag_label.config(text="")
+        self.displayed_unpublished_id = None
 
     def next_unpublished_post(self):
-        if self.current_unpublished_index < len(self.unpublished_posts) - 1:
-            self.current_unpublished_index += 1
-            self.display_unpublished_post(self.unpublished_posts[self.current_unpublished_index])
+        view = self.unpublished_view
+        position = self.unpublished_view_position()
+        if position < len(view) and view[position] == self.current_unpublished_index:
+            position += 1
+        if position < len(view):
+            self.show_view_position(position)
         else:
-            messagebox.showinfo("End of List", "No more unpublished posts to show.")
+            self.notify("No more unpublished posts to show.")
 
     def last_unpublished_post(self):
-        if self.current_unpublished_index > 0:
-            self.current_unpublished_index -= 1
-            self.display_unpublished_post(self.unpublished_posts[self.current_unpublished_index])
+        position = self.unpublished_view_position() - 1
+        if position >= 0:
+            self.show_view_position(position)
         else:
-            messagebox.showinfo("Start of List", "No previous unpublished posts to show.")
+            self.notify("No previous unpublished posts to show.")
 
     def display_published_post(self, post):
         self.published_title.config(state='normal')
@@ -820,6 +1504,7 @@ class App:
         self.published_caption.config(state='disabled')
 
         self.current_published_index = self.published_posts.index(post)
+        self.displayed_published_id = post.get('id')
 
     def delete_published_post(self):
         post_title = self.published_title.get()
@@ -828,16 +1513,24 @@ class App:
             return
 
         self.published_posts = [post for post in self.published_posts if post['title'] != post_title]
-        self.save_to_file(self.published_posts, "published_posts.json")
-        messagebox.showinfo("Success", "Post deleted successfully.")
+        saved = self.save_to_file(self.published_posts, "published_posts.json")
         self.refresh_published_posts()
+        if saved:
+            self.notify("Post deleted successfully.")
 
     def refresh_published_posts(self):
-        self.published_posts = self.load_published_posts()
-        if self.published_posts:
-            self.display_published_post(self.published_posts[0])
-        else:
+        self.show_published_posts(self.reload_store(core.PUBLISHED_POSTS_FILE))
+
+    def show_published_posts(self, changes=None):
+        if not self.tab_built(self.published_tab):
+            return
+        if not self.published_posts:
             self.clear_published_post_display()
+            return
+        index = core.post_index(self.published_posts, self.displayed_published_id)
+        if index is None:
+            index = min(self.current_published_index, len(self.published_posts) - 1)
+        self.display_published_post(self.published_posts[index])
 
     def clear_published_post_display(self):
         self.published_title.config(state='normal')
@@ -861,14 +1554,14 @@ class App:
             self.current_published_index += 1
             self.display_published_post(self.published_posts[self.current_published_index])
         else:
-            messagebox.showinfo("End of List", "No more published posts to show.")
+            self.notify("No more published posts to show.")
 
     def last_published_post(self):
         if self.current_published_index > 0:
             self.current_published_index -= 1
             self.display_published_post(self.published_posts[self.current_published_index])
         else:
-            messagebox.showinfo("Start of List", "No previous published posts to show.")
+            self.notify("No previous published posts to show.")
 
     def upload_media(self):
         file_path = filedialog.askopenfilename(filetypes=[("Image files", "*.jpg;*.jpeg;*.png")])
@@ -878,43 +1571,26 @@ class App:
         bucket_name = self.s3_bucket_url.get().strip()
         folder_path = self.s3_folder_path.get().strip()
 
-        if not bucket_name or not folder_path:
-            messagebox.showwarning("Warning", "Please enter a valid S3 bucket URL and folder path.")
-            return
-
-        file_name = os.path.basename(file_path)
-        if self.check_s3_file_exists(bucket_name, f"{folder_path}/{file_name}"):
-            messagebox.showwarning("Warning", "A file with this name already exists in the S3 bucket.")
-            return
-
-        unique_file_name = self.generate_unique_filename(file_name)
-        full_file_path = f"{folder_path}/{unique_file_name}"
-
         self.show_loading("Uploading media, please wait...")
         try:
-            self.s3_client.upload_file(file_path, bucket_name, full_file_path)
-            s3_url = f"https://{bucket_name}.s3.amazonaws.com/{full_file_path}"
+            s3_url = self.service.upload_media(file_path, bucket_name, folder_path)
             self.s3_file_name.config(state='normal')
             self.s3_file_name.delete(0, tk.END)
             self.s3_file_name.insert(0, s3_url)
             self.s3_file_name.config(state='disabled')
-            messagebox.showinfo("Success", "File uploaded successfully.")
+            self.notify("File uploaded successfully.")
+        except core.ServiceError as e:
+            messagebox.showwarning("Warning", str(e))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to upload file: {e}")
         finally:
             self.hide_loading()
 
     def check_s3_file_exists(self, bucket_name, file_name):
-        try:
-            self.s3_client.head_object(Bucket=bucket_name, Key=file_name)
-            return True
-        except self.s3_client.exceptions.ClientError:
-            return False
+        return self.service.file_exists(bucket_name, file_name)
 
     def generate_unique_filename(self, file_name):
-        name, ext = os.path.splitext(file_name)
-        unique_name = f"{name}_{int(time.time())}{ext}"
-        return unique_name
+        return core.generate_unique_filename(file_name)
 
     def validate_url(self):
         file_path = self.s3_bucket_url.get().strip()
@@ -922,119 +1598,150 @@ class App:
         full_path = f"{folder_path}/{self.s3_file_name.get()}"
 
         if self.check_s3_file_exists(self.s3_bucket_url.get(), full_path):
-            messagebox.showinfo("File Exists", "The file exists in the S3 bucket.")
+            self.notify("The file exists in the S3 bucket.")
         else:
-            messagebox.showwarning("File Not Found", "The file does not exist in the S3 bucket.")
+            self.notify("The file does not exist in the S3 bucket.", notifications.WARNING)
 
     def export_to_csv(self):
-        # Prepare the list of posts to export
-        posts_to_export = []
-        for post in self.unpublished_posts:
-            if post.get('ready_to_publish', False):  # Check if 'Ready to Publish' is ticked
-                caption = post.get('caption', '').strip()
-                s3_url = post.get('s3_file_name', '').strip()
-
-                # Ensure both caption and URL are present
-                if caption and s3_url:
-                    posts_to_export.append({
-                        'caption': caption,
-                        's3_url': s3_url
-                    })
+        """Exports on a worker thread: signing the media URLs of a large export takes a while."""
+        self.show_loading("Exporting posts, please wait...")
 
-        if not posts_to_export:
-            messagebox.showwarning("Warning", "No posts are ready to export or have valid Caption and URL.")
-            return
-
-        # Determine if the CSV file already exists
-        file_exists = os.path.isfile('unpublished_posts.csv')
-
-        # Export to CSV
-        with open('unpublished_posts.csv', mode='a', newline='') as file:
-            writer = csv.writer(file)
-            if not file_exists:
-                writer.writerow(['Caption', 'URL'])  # Write header if file doesn't exist
+        def work():
+            try:
+                self.service.export_ready(core.EXPORT_CSV_FILE)
+            except Exception as e:
+                if not isinstance(e, core.ServiceError):
+                    logging.exception("Export failed")
+                self.call_in_ui(self.finish_export, e)
+                return
+            self.call_in_ui(self.finish_export, None)
 
-            for post in posts_to_export:
-                writer.writerow([post['caption'], post['s3_url']])
+        threading.Thread(target=work, name="export", daemon=True).start()
 
-        messagebox.showinfo("Success", "Posts exported to 'unpublished_posts.csv'.")
+    def finish_export(self, error):
+        self.hide_loading()
+        if isinstance(error, core.ServiceError):
+            self.notify(str(error), notifications.WARNING)
+        elif error is not None:
+            self.notify(f"Failed to export posts: {error}", notifications.ERROR)
+        else:
+            self.notify("Posts exported to 'unpublished_posts.csv'.")
 
     def bulk_export_published_posts(self):
-        if not self.published_posts:
-            messagebox.showwarning("Warning", "No published posts to export.")
+        try:
+            self.service.export_published(core.PUBLISHED_EXPORT_CSV_FILE)
+        except core.ServiceError as e:
+            messagebox.showwarning("Warning", str(e))
             return
 
-        with open('published_posts.csv', mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(
-                ['Title', 'Description', 'Type', 'Caption', 'S3 Bucket URL', 'S3 Folder Path', 'S3 File Name',
-                 'Ready to Publish'])
-
-            for post in self.published_posts:
-                writer.writerow([
-                    post['title'],
-                    post['description'],
-                    post['type'],
-                    post['caption'],
-                    post['s3_bucket_url'],
-                    post['s3_folder_path'],
-                    post['s3_file_name'],
-                    post['ready_to_publish']
-                ])
+        self.notify("Published posts exported to 'published_posts.csv'.")
 
-        messagebox.showinfo("Success", "Published posts exported to 'published_posts.csv'.")
+    def auto_tag_unpublished_posts(self):
+        """Assigns the suggested tag to every untagged unpublished post, with one save and one summary."""
+        try:
+            tagged = self.service.auto_tag(self.unpublished_posts, assign=True)
+        except ImportError:
+            messagebox.showerror("Error", "Auto-tagging needs numpy (pip install numpy).")
+            return
+        if not tagged:
+            self.notify("No untagged posts matched an existing tag closely enough.")
+            return
+        if not self.save_to_file(self.unpublished_posts, "unpublished_posts.json"):
+            return
+        counts = {}
+        for post in tagged:
+            counts[post['tag']] = counts.get(post['tag'], 0) + 1
+        summary = ", ".join(f"{tag} ({count})" for tag, count in sorted(counts.items(), key=lambda item: -item[1]))
+        logging.info("Auto-tagged %d posts: %s", len(tagged), summary)
+        self.notify(f"Tagged {len(tagged)} posts: {summary}. Save a post to confirm its tag.")
+        self.show_unpublished_posts(store_watch.StoreChanges(changed=[post.get('id') for post in tagged]))
 
     def publish_post(self, post_title):
-        post_to_publish = next((post for post in self.unpublished_posts if post['title'] == post_title), None)
-
-        if not post_to_publish:
+        post = next((post for post in self.unpublished_posts if post['title'] == post_title), None)
+        if post is None:
             messagebox.showerror("Error", "Post not found in the Unpublished section.")
             return
+        self.start_publishing([post])
+
+    def publish_ready_posts(self):
+        ready = [post for post in self.unpublished_posts if post.get('ready_to_publish', False)]
+        if not ready:
+            self.notify("No posts are marked ready to publish.")
+            return
+        self.start_publishing(ready)
 
-        self.show_loading("Publishing post, please wait...")
+    def start_publishing(self, posts):
+        """Publishes posts on a worker thread so network calls never block the window."""
         try:
-            self.published_posts.append(post_to_publish)
-            self.unpublished_posts = [post for post in self.unpublished_posts if post['title'] != post_title]
+            publisher = self.service.publisher
+        except core.ServiceError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.show_loading(f"Publishing {len(posts)} posts, please wait...")
+        snapshot = [dict(post) for post in posts]
 
-            self.save_to_file(self.unpublished_posts, "unpublished_posts.json")
-            self.save_to_file(self.published_posts, "published_posts.json")
+        def work():
+            try:
+                results = publisher.publish_batch(snapshot)
+            except Exception as e:
+                logging.exception("Publishing failed")
+                self.call_in_ui(self.finish_publishing, None, e)
+                return
+            self.call_in_ui(self.finish_publishing, results, None)
 
-            messagebox.showinfo("Success", "Post published and moved to the Published section.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to publish post: {e}")
-        finally:
-            self.hide_loading()
-            messagebox.showinfo("Confirmation", "The post has been published successfully.")
-            self.refresh_unpublished_posts()
-            self.refresh_published_posts()
+        threading.Thread(target=work, name="publish", daemon=True).start()
+
+    def finish_publishing(self, results, error):
+        self.hide_loading()
+        if error is not None:
+            self.notify(f"Failed to publish posts: {error}", notifications.ERROR)
+            return
+        published, failures = self.apply_publish_results(results)
+        with self.notifier.tally("Publish") as tally:
+            tally.add("posts published", len(published))
+            tally.add("failed", len(failures), notifications.WARNING)
+            for post, reason in failures:
+                tally.detail(f"{post['title']}: {reason}")
+
+    def apply_publish_results(self, results):
+        """Writes publisher results back to the stores and refreshes the views. Runs on the Tk thread."""
+        published, failures = self.service.apply_publish_results(results)
+
+        # Leave the post being edited on screen unless it just left the list
+        self.show_unpublished_posts()
+        self.publish_queue.sync_from_posts(self.unpublished_posts)
+        self.show_published_posts()
+        return published, failures
+
+    def publish_scheduled_post(self, post_id):
+        """Called on the dispatcher thread. Raises so the dispatcher can retry."""
+        post = self.call_in_ui(self.service.publishable_post, post_id)
+        results = self.service.publisher.publish_batch([dict(post)])
+        published, failures = self.call_in_ui(self.apply_publish_results, results)
+        if failures:
+            raise core.ServiceError(failures[0][1])
+        logging.info("Published scheduled post '%s'", post['title'])
 
     def save_chatgpt_key(self):
         chatgpt_key = self.chatgpt_key_entry.get().strip()
         if not chatgpt_key:
             messagebox.showwarning("Warning", "Please enter the ChatGPT API key.")
             return
-        credentials_path = os.path.expanduser("~/.chatgpt_credentials")
-        with open(credentials_path, "w") as file:
-            file.write(chatgpt_key)
-        messagebox.showinfo("Success", "ChatGPT API key saved successfully.")
+        self.service.save_chatgpt_key(chatgpt_key)
+        self.notify("ChatGPT API key saved successfully.")
 
     def delete_chatgpt_key(self):
-        credentials_path = os.path.expanduser("~/.chatgpt_credentials")
-        if os.path.exists(credentials_path):
-            os.remove(credentials_path)
+        if self.service.delete_chatgpt_key():
             self.chatgpt_key_entry.delete(0, tk.END)
-            messagebox.showinfo("Success", "ChatGPT API key deleted successfully.")
+            self.notify("ChatGPT API key deleted successfully.")
         else:
             messagebox.showwarning("Warning", "No ChatGPT API key found to delete.")
 
     def load_chatgpt_key(self):
-        credentials_path = os.path.expanduser("~/.chatgpt_credentials")
-        if os.path.exists(credentials_path):
-            with open(credentials_path, "r") as file:
-                chatgpt_key = file.read().strip()
+        self.chatgpt_key_entry.delete(0, tk.END)
+        chatgpt_key = self.service.chatgpt.api_key
+        if chatgpt_key:
             self.chatgpt_key_entry.insert(0, chatgpt_key)
-        else:
-            self.chatgpt_key_entry.delete(0, tk.END)
 
     def save_aws_credentials(self):
         access_key = self.aws_access_key_entry.get().strip()
@@ -1060,7 +1767,7 @@ class App:
         with open(credentials_path, "w") as file:
             file.write(credentials_content.strip())
 
-        messagebox.showinfo("Success", "AWS credentials saved successfully.")
+        self.notify("AWS credentials saved successfully.")
         self.reload_s3_client()
         self.load_aws_credentials()
 
@@ -1093,7 +1800,7 @@ class App:
         return ""
 
     def reload_s3_client(self):
-        self.s3_client = boto3.client('s3')
+        self.service.reload_s3_client()
 
     def load_prompt_info(self, prompt_name):
         all_prompt_data = self.load_from_file("prompt_customer_info.json", default={})
@@ -1107,51 +1814,80 @@ class App:
             self.prompt_name.insert(0, settings.get("prompt_name", ""))
             self.prompt_details.delete("1.0", tk.END)
             self.prompt_details.insert(tk.END, settings.get("prompt_details", ""))
-            messagebox.showinfo("Success", "Prompt settings loaded successfully.")
+            logging.info("Prompt settings loaded.")
         else:
-            messagebox.showwarning("Warning", "No prompt settings found to load.")
+            logging.info("No prompt settings found to load.")
 
     def save_prompt_settings(self):
         settings = {
             "prompt_name": self.prompt_name.get(),
             "prompt_details": self.prompt_details.get("1.0", tk.END).strip()
         }
-        self.save_to_file(settings, "prompt_settings.json")
-        messagebox.showinfo("Success", "Prompt settings saved successfully.")
+        if self.save_to_file(settings, "prompt_settings.json"):
+            self.notify("Prompt settings saved successfully.")
 
     def save_to_file(self, data, file_path):
         try:
-            with open(file_path, 'w') as file:
-                json.dump(data, file, indent=4)
-            logging.info(f"Data successfully saved to {file_path}")
+            conflicts = core.save_json(data, file_path)
+            if conflicts:
+                self.notify(f"{file_path} was changed by another instance. Their changes were merged; "
+                            f"{len(conflicts)} conflicting field(s) kept your version.", notifications.WARNING,
+                            map(str, conflicts))
         except IOError as e:
-            logging.error(f"Error saving file {file_path}: {e}")
+            logging.error("Error saving file %s: %s", file_path, e)
             messagebox.showerror("Error", f"Failed to save data to {file_path}: {e}")
+            return False
+        return True
 
-    def load_from_file(self, file_path, default=None):
+    def load_from_file(self, file_path, default=None, model=None):
         if default is None:
             default = []
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r') as file:
-                    data = json.load(file)
-                    if isinstance(data, type(default)):
-                        logging.info(f"Data successfully loaded from {file_path}")
-                        return data
-                    else:
-                        logging.error(f"Expected {type(default)} from {file_path} but got {type(data)}")
-                        return default
-            except (json.JSONDecodeError, IOError) as e:
-                logging.error(f"Error loading file {file_path}: {e}")
-                messagebox.showerror("Error", f"Failed to load data from {file_path}: {e}")
-        logging.warning(f"{file_path} does not exist. Returning default value.")
-        return default
+        try:
+            return core.load_json(file_path, default, model)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error("Error loading file %s: %s", file_path, e)
+            messagebox.showerror("Error", f"Failed to load data from {file_path}: {e}")
+            return default
+
+    def reload_store(self, file_name):
+        """Reloads a store if it changed on disk. Returns the StoreChanges, or None if nothing changed."""
+        try:
+            return self.service.reload_store(file_name)
+        except (json.JSONDecodeError, IOError) as e:
+            logging.error("Error loading file %s: %s", file_name, e)
+            messagebox.showerror("Error", f"Failed to load data from {file_name}: {e}")
+            return None
+
+    def store_changed_on_disk(self, path):
+        """Called on the watcher thread: parses the changed store here, then applies it on the Tk thread."""
+        update = self.service.read_store_update(os.path.basename(path))
+        if update is not None:
+            self.call_in_ui(self.apply_store_update, update)
+
+    def apply_store_update(self, update):
+        changes = self.service.apply_store_update(update)
+        if not changes:
+            return
+        if update.file_name == core.UNPUBLISHED_POSTS_FILE:
+            self.publish_queue.sync_from_posts(self.unpublished_posts)
+            self.show_unpublished_posts(changes)
+        elif update.file_name == core.PUBLISHED_POSTS_FILE:
+            self.show_published_posts(changes)
+        elif update.file_name == core.PROMPTS_FILE:
+            self.load_prompt_titles()
+        elif update.file_name == core.CUSTOMER_INFO_FILE and (changes.resync or changes.added or changes.removed
+                                                               or changes.reordered):
+            selected = self.get_selected_customers()
+            self.update_customer_detail_vars()
+            self.set_selected_customers(selected)
 
     def load_customer_info_from_file(self):
-        self.customer_info_list = self.load_from_file("customer_info.json")
+        self.customer_info_list = self.load_from_file("customer_info.json", model=models.Customer)
         self.update_customer_detail_vars()
 
     def update_customer_detail_vars(self):
+        if not self.tab_built(self.prompts_tab):
+            return
         for widget in self.customer_details_frame.winfo_children():
             widget.destroy()
 
@@ -1183,13 +1919,12 @@ class App:
             messagebox.showwarning("Warning", "Please enter a valid customer name to search.")
             return
 
-        results = [customer['name'] for customer in self.customer_info_list if
-                   search_name.lower() in customer['name'].lower()]
+        results = core.search_by_name(self.customer_info_list, search_name)
         if results:
             self.customer_search_results['values'] = results
             self.customer_search_results.set("Select a result")
         else:
-            messagebox.showinfo("No Results", "No customer information found for the given name.")
+            self.notify("No customer information found for the given name.")
             self.customer_search_results['values'] = []
             self.customer_search_results.set("")
 
@@ -1198,8 +1933,7 @@ class App:
 
     def update_customer_search(self, event):
         search_text = self.customer_search_results.get()
-        filtered_results = [customer['name'] for customer in self.customer_info_list if
-                            search_text.lower() in customer['name'].lower()]
+        filtered_results = core.search_by_name(self.customer_info_list, search_text)
         self.customer_search_results['values'] = filtered_results
 
     def create_customer_info(self):
@@ -1216,17 +1950,19 @@ class App:
         }
 
         try:
-            self.customer_info_list.append(new_customer)
-            self.save_to_file(self.customer_info_list, "customer_info.json")
+            self.customer_info_list.append(models.Customer.from_dict(new_customer))
+            if not self.save_to_file(self.customer_info_list, "customer_info.json"):
+                return
             self.update_customer_detail_vars()
-            messagebox.showinfo("Success", "Customer information created successfully.")
         except Exception as e:
+            # Keep what was typed so it can be saved again
             messagebox.showerror("Error", f"Failed to create customer information: {e}")
+            return
 
         self.customer_info_name.delete(0, tk.END)
         self.customer_info_details.delete("1.0", tk.END)
         self.customer_info_name.insert(0, "Customer Information Name")
-        messagebox.showinfo("Confirmation", "The customer information has been created successfully.")
+        self.notify(f"Customer information '{customer_name}' created.")
 
     def read_customer_info(self):
         selected_name = self.customer_search_results.get().strip()
@@ -1239,7 +1975,7 @@ class App:
             self.customer_info_details.delete("1.0", tk.END)
             self.customer_info_details.insert(tk.END, customer['details'])
         else:
-            messagebox.showinfo("No Results", "No customer information found for the selected name.")
+            self.notify("No customer information found for the selected name.")
 
     def update_customer_info(self):
         selected_name = self.customer_search_results.get().strip()
@@ -1257,11 +1993,13 @@ class App:
                 customer['details'] = new_details
                 break
         else:
-            messagebox.showinfo("No Results", "No customer information found for the selected name.")
+            self.notify("No customer information found for the selected name.")
+            return
 
-        self.save_to_file(self.customer_info_list, "customer_info.json")
+        if not self.save_to_file(self.customer_info_list, "customer_info.json"):
+            return
         self.update_customer_detail_vars()
-        messagebox.showinfo("Success", "Customer information updated successfully.")
+        self.notify("Customer information updated successfully.")
 
         # Save the selected customer information
         self.save_selected_customer_info()
@@ -1278,9 +2016,10 @@ class App:
 
         self.customer_info_list = [customer for customer in self.customer_info_list if customer['name'] != selected_name]
 
-        self.save_to_file(self.customer_info_list, "customer_info.json")
+        if not self.save_to_file(self.customer_info_list, "customer_info.json"):
+            return
         self.update_customer_detail_vars()
-        messagebox.showinfo("Success", "Customer information deleted successfully.")
+        self.notify("Customer information deleted successfully.")
 
         self.customer_info_name.delete(0, tk.END)
         self.customer_info_details.delete("1.0", tk.END)
@@ -1290,12 +2029,12 @@ class App:
         selected_customers = self.get_selected_customers()
         all_prompt_data = self.load_from_file("prompt_customer_info.json", default={})
         if not isinstance(all_prompt_data, dict):
-            logging.error(f"Expected dictionary from prompt_customer_info.json but got {type(all_prompt_data)}")
+            logging.error("Expected dictionary from prompt_customer_info.json but got %s", type(all_prompt_data))
             messagebox.showerror("Error", "Invalid format in prompt_customer_info.json")
             return
         all_prompt_data[prompt_name] = selected_customers
-        self.save_to_file(all_prompt_data, "prompt_customer_info.json")
-        messagebox.showinfo("Success", f"Customer information for '{prompt_name}' saved successfully.")
+        if self.save_to_file(all_prompt_data, "prompt_customer_info.json"):
+            self.notify(f"Customer information for '{prompt_name}' saved successfully.")
 
     def read_prompt_info(self):
         selected_name = self.prompt_search_results.get().strip()
@@ -1311,7 +2050,7 @@ class App:
             self.clear_customer_checkboxes()
             self.load_prompt_info(selected_name)  # Load customer checkboxes
         else:
-            messagebox.showinfo("No Results", "No prompt information found for the selected name.")
+            self.notify("No prompt information found for the selected name.")
 
     def search_prompt_info(self):
         search_name = self.prompt_name.get().strip()
@@ -1319,12 +2058,12 @@ class App:
             messagebox.showwarning("Warning", "Please enter a valid prompt name to search.")
             return
 
-        results = [prompt['name'] for prompt in self.prompts_list if search_name.lower() in prompt['name'].lower()]
+        results = core.search_by_name(self.prompts_list, search_name)
         if results:
             self.prompt_search_results['values'] = results
             self.prompt_search_results.set("Select a result")
         else:
-            messagebox.showinfo("No Results", "No prompt information found for the given name.")
+            self.notify("No prompt information found for the given name.")
             self.prompt_search_results['values'] = []
             self.prompt_search_results.set("")
 
@@ -1342,12 +2081,14 @@ class App:
         }
 
         try:
-            self.prompts_list.append(new_prompt)
-            self.save_to_file(self.prompts_list, "prompts.json")
+            self.prompts_list.append(models.Prompt.from_dict(new_prompt))
+            if not self.save_to_file(self.prompts_list, "prompts.json"):
+                # Keep what was typed so it can be saved again
+                return
             self.load_prompt_titles()  # Refresh the list of prompts
-            messagebox.showinfo("Success", "Prompt information created successfully.")
+            self.notify("Prompt information created successfully.")
         except Exception as e:
-            logging.error(f"Failed to create prompt information: {e}")
+            logging.error("Failed to create prompt information: %s", e)
             messagebox.showerror("Error", f"Failed to create prompt information: {e}")
 
         self.prompt_name.delete(0, tk.END)
@@ -1372,10 +2113,11 @@ class App:
                 self.save_prompt_info(selected_name)  # Save customer checkboxes
                 break
         else:
-            messagebox.showinfo("No Results", "No prompt information found for the selected name.")
+            self.notify("No prompt information found for the selected name.")
+            return
 
-        self.save_to_file(self.prompts_list, "prompts.json")
-        messagebox.showinfo("Success", "Prompt information updated successfully.")
+        if self.save_to_file(self.prompts_list, "prompts.json"):
+            self.notify("Prompt information updated successfully.")
 
     def delete_prompt_info(self):
         selected_name = self.prompt_search_results.get().strip()
@@ -1389,26 +2131,29 @@ class App:
 
         self.prompts_list = [prompt for prompt in self.prompts_list if prompt['name'] != selected_name]
 
-        self.save_to_file(self.prompts_list, "prompts.json")
-        messagebox.showinfo("Success", "Prompt information deleted successfully.")
+        if not self.save_to_file(self.prompts_list, "prompts.json"):
+            return
+        self.notify("Prompt information deleted successfully.")
 
         self.prompt_name.delete(0, tk.END)
         self.prompt_details.delete("1.0", tk.END)
         self.prompt_search_results.set("")
 
     def save_selected_customer_info(self):
+        if not self.tab_built(self.prompts_tab):
+            return  # The checkboxes haven't been shown, so nothing can have changed
         selected_customers = {name: var.get() for name, var in self.customer_detail_vars.items()}
-        logging.info(f"Saving selected customer info: {selected_customers}")
+        logging.info("Saving selected customer info: %s", summarize(selected_customers))
         with open("selected_customer_info.json", "w") as file:
             json.dump(selected_customers, file)
-        messagebox.showinfo("Success", "Selected customer information saved successfully.")
+        self.notify("Selected customer information saved successfully.")
 
     def load_selected_customer_info(self):
         if os.path.exists("selected_customer_info.json"):
             try:
                 with open("selected_customer_info.json", "r") as file:
                     selected_customers = json.load(file)
-                    logging.info(f"Loading selected customer info: {selected_customers}")
+                    logging.info("Loading selected customer info: %s", summarize(selected_customers))
                     for name, is_selected in selected_customers.items():
                         if name in self.customer_detail_vars:
                             self.customer_detail_vars[name].set(is_selected)
@@ -1416,6 +2161,8 @@ class App:
                 messagebox.showerror("Error", f"Failed to load selected customer information: {e}")
 
 if __name__ == "__main__":
+    # Large exports sign URLs in worker processes, which re-run this executable when frozen by PyInstaller
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = App(root)
     root.mainloop()
@@ -0,0 +1,233 @@
+"""Compact in-memory records for posts, customers and prompts.
+
+The JSON stores hold plain objects; in memory each one becomes a slotted dataclass, which needs far less space
+than a dict with the same keys. Fields whose values repeat across many records (post type, tag, bucket, folder,
+...) are interned, so thousands of posts share one string per distinct value. Keys without a slot are kept in a
+per-record `_extra` dict, allocated only when needed, so nothing in a store is lost on a round trip.
+
+Records keep the dict interface the rest of the code uses (post["tag"], post.get("id"), "x" in post,
+{**post}, post.update(...)), so only the storage boundary converts: core.load_json(path, model=Post) parses the
+file and converts the list with Post.from_dicts, and core.save_json turns records back into plain objects.
+"""
+import sys
+from collections.abc import MutableMapping
+from dataclasses import dataclass, fields
+from operator import attrgetter
+
+
+class _Missing:
+    """Value of a slot whose key is absent from the record."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<missing>"
+
+
+MISSING = _Missing()
+_NO_DEFAULT = object()
+
+
+def _interned(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    __slots__ = ()
+
+    # Set by @record: the slot names, as a tuple, a set and a getter returning all their values at once
+    FIELDS = ()
+    INTERNED = frozenset()
+    _field_set = frozenset()
+    _values = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls.from_dicts([dict(data)])[0]
+
+    @classmethod
+    def from_dicts(cls, items):
+        """Converts a freshly loaded store in place and returns it. Items that aren't objects are left alone.
+
+        The dicts are consumed (values interned, unknown keys moved to `_extra`) and each is dropped as soon as its
+        record exists. This is the hot loop of loading a store, so it is kept inline rather than per-item calls.
+        """
+        field_set, interned, intern = cls._field_set, tuple(cls.INTERNED), sys.intern
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            extra = None
+            if not field_set.issuperset(item):
+                extra = {key: item.pop(key) for key in [key for key in item if key not in field_set]}
+            for key in interned:
+                value = item.get(key)
+                if type(value) is str:
+                    item[key] = intern(value)
+            items[index] = cls(**item, _extra=extra)
+        return items
+
+    def to_dict(self):
+        data = {name: value for name, value in zip(self.FIELDS, self._values(self)) if value is not MISSING}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def copy(self):
+        return type(self).from_dict(self.to_dict())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    # The dict interface
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            value = getattr(self, key)
+            if value is not MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            value = getattr(self, key)
+            return default if value is MISSING else value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __setitem__(self, key, value):
+        if key in self._field_set:
+            setattr(self, key, _interned(value) if key in self.INTERNED else value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in self._field_set and getattr(self, key) is not MISSING:
+            setattr(self, key, MISSING)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+        else:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        if key in self._field_set:
+            return getattr(self, key) is not MISSING
+        return self._extra is not None and key in self._extra
+
+    def keys(self):
+        keys = [name for name, value in zip(self.FIELDS, self._values(self)) if value is not MISSING]
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def items(self):
+        return list(self.to_dict().items())
+
+    def values(self):
+        return list(self.to_dict().values())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def pop(self, key, default=_NO_DEFAULT):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default is _NO_DEFAULT:
+            raise KeyError(key)
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, other=(), **kwargs):
+        for key, value in (other.items() if hasattr(other, "items") else other):
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+
+MutableMapping.register(Record)
+
+
+def record(interned=()):
+    """Class decorator turning a Record subclass into a slotted dataclass with every field optional."""
+
+    def wrap(cls):
+        cls = dataclass(slots=True, repr=False)(cls)
+        cls.FIELDS = tuple(field.name for field in fields(cls) if field.name != "_extra")
+        cls.INTERNED = frozenset(interned)
+        cls._field_set = frozenset(cls.FIELDS)
+        cls._values = staticmethod(attrgetter(*cls.FIELDS))
+        return cls
+
+    return wrap
+
+
+@record(interned=("type", "tag", "s3_bucket_url", "s3_folder_path", "tag_source", "suggested_tag",
+                  "source_prompt", "batch_job"))
+class Post(Record):
+    id: object = MISSING
+    title: object = MISSING
+    description: object = MISSING
+    type: object = MISSING
+    caption: object = MISSING
+    s3_bucket_url: object = MISSING
+    s3_folder_path: object = MISSING
+    s3_file_name: object = MISSING
+    tag: object = MISSING
+    ready_to_publish: object = MISSING
+    publish_at: object = MISSING
+    suggested_tag: object = MISSING
+    suggested_tag_score: object = MISSING
+    tag_source: object = MISSING
+    near_duplicate_of: object = MISSING
+    duplicate_similarity: object = MISSING
+    source_prompt: object = MISSING
+    batch_job: object = MISSING
+    published_at: object = MISSING
+    published_media_id: object = MISSING
+    permalink: object = MISSING
+    publish_error: object = MISSING
+    _extra: object = None
+
+
+@record()
+class Customer(Record):
+    name: object = MISSING
+    details: object = MISSING
+    _extra: object = None
+
+
+@record(interned=("provider", "model"))
+class Prompt(Record):
+    name: object = MISSING
+    details: object = MISSING
+    selected_customers: object = MISSING
+    provider: object = MISSING
+    model: object = MISSING
+    system_prompt: object = MISSING
+    _extra: object = None
+
+
+def to_dicts(items):
+    return [item.to_dict() if isinstance(item, Record) else item for item in items]
+
+
+def json_default(value):
+    """`default=` hook for json.dumps over lists that may hold records."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,103 @@
+"""Non-blocking status notices, so batch operations report once instead of stopping for a dialog per item.
+
+Notifier is a thread-safe queue the UI drains on its own schedule; any thread can post to it. Tally counts the
+outcomes of one operation and posts a single summary when it ends, e.g. "Import: 12 posts imported, 3 rejected",
+while the per-item details go to the log and the notice history.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+INFO = "info"
+WARNING = "warning"
+ERROR = "error"
+_LOG_LEVELS = {INFO: logging.INFO, WARNING: logging.WARNING, ERROR: logging.ERROR}
+_SEVERITY = {INFO: 0, WARNING: 1, ERROR: 2}
+HISTORY_SIZE = 200
+
+
+class Notice:
+    def __init__(self, text, level=INFO, details=()):
+        self.text = text
+        self.level = level
+        self.details = list(details)
+        self.created = time.time()
+
+    def __str__(self):
+        return f"{time.strftime('%H:%M:%S', time.localtime(self.created))}  {self.text}"
+
+
+class Notifier:
+    def __init__(self, history_size=HISTORY_SIZE):
+        self._pending = deque()
+        self.history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+
+    def notify(self, text, level=INFO, details=()):
+        notice = Notice(text, level, details)
+        logging.log(_LOG_LEVELS[level], "%s", text)
+        with self._lock:
+            self._pending.append(notice)
+            self.history.append(notice)
+        return notice
+
+    def pending(self):
+        """Returns the notices posted since the last call, oldest first."""
+        with self._lock:
+            notices = list(self._pending)
+            self._pending.clear()
+        return notices
+
+    def tally(self, subject):
+        return Tally(self, subject)
+
+
+class Tally:
+    """Counts outcomes ("posts imported", "rejected", ...) and posts one summary notice on exit.
+
+    Outcomes are listed in the order first counted; outcomes counted with a level above INFO raise the level of
+    the summary. An exception leaving the block is reported as an error after the counts so far.
+    """
+
+    def __init__(self, notifier, subject):
+        self.notifier = notifier
+        self.subject = subject
+        self.counts = {}
+        self.details = []
+        self.level = INFO
+        self.notes = []
+
+    def add(self, outcome, count=1, level=INFO):
+        if count:
+            self.counts[outcome] = self.counts.get(outcome, 0) + count
+            self.raise_level(level)
+
+    def detail(self, text, level=WARNING):
+        """A per-item message, logged and kept with the summary instead of shown on its own."""
+        logging.log(_LOG_LEVELS[level], "%s: %s", self.subject, text)
+        self.details.append(text)
+
+    def note(self, text, level=INFO):
+        """A sentence appended to the summary."""
+        self.notes.append(text)
+        self.raise_level(level)
+
+    def raise_level(self, level):
+        if _SEVERITY[level] > _SEVERITY[self.level]:
+            self.level = level
+
+    def summary(self):
+        parts = [f"{count} {outcome}" for outcome, count in self.counts.items()]
+        if not parts and self.notes:
+            return f"{self.subject}: {' '.join(self.notes)}"
+        return " ".join([f"{self.subject}: {', '.join(parts) or 'nothing to do'}."] + self.notes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is not None:
+            self.note(f"Stopped by an error: {exc}", ERROR)
+        self.notifier.notify(self.summary(), self.level, self.details)
+        return False
@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Number of recent samples kept per operation for percentile calculations
+MAX_SAMPLES = 2000
+
+
+class OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.total_bytes = 0
+        self.errors = 0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, seconds, nbytes=0, failed=False):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.total_bytes += nbytes
+        if failed:
+            self.errors += 1
+        self.samples.append(seconds)
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+            "total_ms": round(self.total_seconds * 1000, 2),
+            "bytes": self.total_bytes,
+        }
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class PerfRegistry:
+    """Thread-safe collection of timings keyed by operation name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def record(self, name, seconds, nbytes=0, failed=False):
+        with self._lock:
+            stats = self._operations.get(name)
+            if stats is None:
+                stats = self._operations[name] = OperationStats()
+            stats.add(seconds, nbytes, failed)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: stats.snapshot() for name, stats in sorted(self._operations.items())}
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+
+    def export_json(self, file_path):
+        data = {"exported_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'), "operations": self.snapshot()}
+        with open(file_path, 'w') as file:
+            json.dump(data, file, indent=4)
+
+
+registry = PerfRegistry()
+
+
+class Span:
+    def __init__(self, name, nbytes=0):
+        self.name = name
+        self.nbytes = nbytes
+
+    def add_bytes(self, nbytes):
+        self.nbytes += nbytes
+
+
+@contextmanager
+def span(name, nbytes=0):
+    """Times the enclosed block and records it under `name`.
+
+    Bytes moved can be passed up front or added while the block runs via span.add_bytes().
+    """
+    current = Span(name, nbytes)
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield current
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        registry.record(name, time.perf_counter() - start, current.nbytes, failed)
@@ -0,0 +1,156 @@
+"""Pre-signed GET URLs for exported media, cached until shortly before they expire.
+
+The stored media URLs only open for public buckets, so exports hand out pre-signed URLs instead. Signing is
+local (no request to S3) but costs a fraction of a millisecond of CPU per URL, so signed URLs are kept in
+presigned_urls.json and reused while at least `min_remaining` seconds of their life are left. Signing holds the
+GIL, so large batches are split across a process pool rather than threads. A SigV4 signature is only valid in
+the bucket's own region; each bucket's region is looked up once and remembered next to the URLs.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote, unquote, urlsplit
+
+import storage
+
+PRESIGNED_URLS_FILE = "presigned_urls.json"
+# The longest lifetime SigV4 allows
+DEFAULT_EXPIRES = 7 * 24 * 3600
+MIN_REMAINING = 24 * 3600
+# Below this many URLs, starting worker processes costs more than it saves
+PARALLEL_THRESHOLD = 2000
+DEFAULT_REGION = "us-east-1"
+
+
+def parse_s3_url(url):
+    """Returns (bucket, key, region) for an S3 object URL, or None for anything else. region may be None.
+
+    Understands s3://bucket/key and the virtual-hosted and path-style https forms, with or without a region and
+    with or without a query string (e.g. an already pre-signed URL).
+    """
+    if not url:
+        return None
+    parts = urlsplit(url.strip())
+    host, path = parts.hostname or "", unquote(parts.path.lstrip("/"))
+    if parts.scheme == "s3":
+        return (host, path, None) if host and path else None
+    if parts.scheme not in ("http", "https") or not host.endswith(".amazonaws.com"):
+        return None
+    labels = host[:-len(".amazonaws.com")].split(".")
+    # bucket.s3 / bucket.s3.region / bucket.s3-region (virtual-hosted); s3 / s3.region / s3-region (path-style)
+    # Search from the right so a bucket whose name starts with "s3-" isn't taken for the endpoint
+    for index in reversed(range(len(labels))):
+        label = labels[index]
+        if label == "s3" or label.startswith("s3-"):
+            bucket = ".".join(labels[:index])
+            region = labels[index + 1] if label == "s3" and index + 1 < len(labels) else label[3:] or None
+            if region in ("dualstack", "external-1"):
+                region = None
+            break
+    else:
+        return None
+    if not bucket:
+        bucket, _, path = path.partition("/")
+    return (bucket, path, region) if bucket and path else None
+
+
+def object_url(bucket, key, region):
+    """The virtual-hosted https URL of an object, with the region that makes it resolve directly."""
+    return f"https://{bucket}.s3.{region or DEFAULT_REGION}.amazonaws.com/{quote(key)}"
+
+
+def signing_client(region, credentials=None):
+    """A SigV4 S3 client for one region.
+
+    credentials is (access_key, secret_key, token), or None for boto3's default chain.
+    """
+    import boto3
+    from botocore.config import Config
+
+    access_key, secret_key, token = credentials or (None, None, None)
+    return boto3.client("s3", region_name=region, aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+                        aws_session_token=token,
+                        config=Config(signature_version="s3v4", s3={"addressing_style": "virtual"}))
+
+
+def sign(client, bucket, key, expires_in):
+    return client.generate_presigned_url("get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_in)
+
+
+def _sign_chunk(credentials, expires_in, items):
+    """Process pool worker: signs [(region, bucket, key)] with its own clients."""
+    clients = {}
+    signed = []
+    for region, bucket, key in items:
+        if region not in clients:
+            clients[region] = signing_client(region, credentials)
+        signed.append(sign(clients[region], bucket, key, expires_in))
+    return signed
+
+
+class PresignedURLCache:
+    """Signed URLs by "bucket/key" with their expiry time, and the region of each bucket, in one JSON store."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.urls = {}
+        self.regions = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        try:
+            data = json.loads(storage.read_text(self.file_path))
+        except FileNotFoundError:
+            data = {}
+        with self.lock:
+            self.urls = data.get("urls", {})
+            self.regions = data.get("regions", {})
+        return self
+
+    def save(self):
+        with self.lock:
+            now = time.time()
+            self.urls = {name: entry for name, entry in self.urls.items() if entry["expires_at"] > now}
+            storage.write_json({"regions": self.regions, "urls": self.urls}, self.file_path)
+
+    def get(self, bucket, key, min_remaining=MIN_REMAINING, now=None, max_remaining=DEFAULT_EXPIRES):
+        """The cached URL if it stays valid for between min_remaining and max_remaining seconds, else None.
+
+        max_remaining keeps a long-lived URL from being handed out when a shorter lifetime was asked for.
+        """
+        entry = self.urls.get(f"{bucket}/{key}")
+        if entry is None:
+            return None
+        remaining = entry["expires_at"] - (now or time.time())
+        return entry["url"] if min_remaining <= remaining <= max_remaining else None
+
+    def put(self, bucket, key, url, expires_at):
+        with self.lock:
+            self.urls[f"{bucket}/{key}"] = {"url": url, "expires_at": expires_at}
+
+    def clear(self):
+        """Forgets every URL, e.g. after the AWS credentials changed."""
+        with self.lock:
+            self.urls = {}
+
+
+def sign_all(objects, client_for_region, expires_in, credentials=None, workers=None):
+    """Signs [(region, bucket, key)] and returns the URLs in the same order.
+
+    With credentials, more than one CPU and at least PARALLEL_THRESHOLD objects the work is spread over a process
+    pool; otherwise it runs here with client_for_region(region).
+    """
+    workers = workers or os.cpu_count() or 1
+    if credentials is None or workers < 2 or len(objects) < PARALLEL_THRESHOLD:
+        return [sign(client_for_region(region), bucket, key, expires_in) for region, bucket, key in objects]
+    size = -(-len(objects) // workers)
+    chunks = [objects[start:start + size] for start in range(0, len(objects), size)]
+    logging.info("Signing %d URLs in %d processes", len(objects), len(chunks))
+    # spawn, not fork: the app has other threads running, and forking those can deadlock the children
+    with ProcessPoolExecutor(len(chunks), mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = pool.map(_sign_chunk, [credentials] * len(chunks), [expires_in] * len(chunks), chunks)
+        return [url for chunk in results for url in chunk]
@@ -0,0 +1,145 @@
+"""On-demand profiling of a running session, for "X is slow" reports from the packaged app.
+
+Profiler.start() turns on cProfile for the calling thread (the Tk thread in the app, where UI stalls happen) and
+starts a sampler that records the Python stack of every thread, so work on publish, export and import worker
+threads shows up too. Profiler.stop() writes both to profiles/:
+
+    profile-<timestamp>.pstats     cProfile data: python -m pstats FILE, snakeviz, ...
+    profile-<timestamp>.collapsed  sampled stacks, one "thread;outer;...;inner count" line each, for flamegraph.pl
+                                   or speedscope
+
+and returns the hottest functions of each for display.
+"""
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+
+PROFILES_DIR = "profiles"
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS = 20
+MAX_STACK_DEPTH = 128
+# Leaf frames of threads that are only waiting; sampling them would bury the work under idle time
+IDLE_FRAMES = {("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("queue.py", "get"),
+               ("selectors.py", "select"), ("__init__.py", "mainloop"), ("store_watch.py", "wait")}
+
+
+def function_label(file_name, line, name):
+    if file_name == "~":
+        return name  # built-ins, e.g. <built-in method time.sleep>
+    return f"{name} ({os.path.basename(file_name)}:{line})"
+
+
+def top_profiled(stats, limit=TOP_FUNCTIONS):
+    """[(label, calls, self_seconds, total_seconds)] of the functions with the most self time in a pstats.Stats."""
+    rows = [(function_label(*function), calls, self_time, total_time)
+            for function, (_, calls, self_time, total_time, _) in stats.stats.items()]
+    return sorted(rows, key=lambda row: -row[2])[:limit]
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of every other thread every `interval` seconds, keyed by (thread name, code objects)."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+        self.join()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stopping.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    continue
+                codes = []
+                while frame is not None and len(codes) < MAX_STACK_DEPTH:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                key = (names.get(ident, str(ident)), tuple(reversed(codes)))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Lines of "thread;outer;...;inner count"."""
+        lines = []
+        for (thread_name, codes), count in self.stacks.items():
+            frames = [function_label(code.co_filename, code.co_firstlineno, code.co_qualname) for code in codes]
+            lines.append(f"{';'.join([thread_name] + frames)} {count}")
+        return sorted(lines)
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """[(label, self_seconds, total_seconds)] estimated from the samples, most self time first."""
+        own, total = {}, {}
+        for (_, codes), count in self.stacks.items():
+            own[codes[-1]] = own.get(codes[-1], 0) + count
+            for code in set(codes):
+                total[code] = total.get(code, 0) + count
+        ranked = sorted(total, key=lambda code: (-own.get(code, 0), -total[code]))[:limit]
+        return [(function_label(code.co_filename, code.co_firstlineno, code.co_qualname),
+                 own.get(code, 0) * self.interval, total[code] * self.interval) for code in ranked]
+
+
+class ProfileResult:
+    def __init__(self, seconds, pstats_path, collapsed_path, profiled, sampled):
+        self.seconds = seconds
+        self.pstats_path = pstats_path
+        self.collapsed_path = collapsed_path
+        # top_profiled() rows for the profiled thread, StackSampler.top_functions() rows across all threads
+        self.profiled = profiled
+        self.sampled = sampled
+
+
+class Profiler:
+    """cProfile on the thread that calls start(), plus stack sampling of every thread, until stop()."""
+
+    def __init__(self, output_dir=PROFILES_DIR, interval=SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self._profile = None
+        self._sampler = None
+        self._started = None
+
+    @property
+    def running(self):
+        return self._profile is not None
+
+    def start(self):
+        if self.running:
+            return
+        self._started = time.perf_counter()
+        self._sampler = StackSampler(self.interval)
+        self._sampler.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        logging.info("Profiling started")
+
+    def stop(self):
+        """Stops profiling, writes the capture and returns a ProfileResult; call on the thread that started it."""
+        if not self.running:
+            return None
+        self._profile.disable()
+        self._sampler.stop()
+        profile, sampler, self._profile, self._sampler = self._profile, self._sampler, None, None
+        seconds = time.perf_counter() - self._started
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile-{time.strftime('%Y%m%d-%H%M%S')}")
+        profile.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w", encoding="utf-8") as file:
+            file.writelines(line + "\n" for line in sampler.collapsed())
+        logging.info("Profiled %.1fs (%d samples) into %s.*", seconds, sampler.samples, base)
+        return ProfileResult(seconds, base + ".pstats", base + ".collapsed", top_profiled(pstats.Stats(profile)),
+                             sampler.top_functions())
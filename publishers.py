@@ -0,0 +1,217 @@
+"""Publisher backends: where a post goes when it is published.
+
+LocalPublisher only marks posts as published (the original behaviour). GraphPublisher sends them to an
+Instagram-Graph-style API. It creates a media container per post, polls the pending containers until they
+finish processing, then publishes each one. A failed status poll is retried with backoff; a container only fails
+on an ERROR/EXPIRED status or when poll_timeout runs out. The backend is chosen by the JSON file at PUBLISHER_CONFIG_PATH,
+for example:
+
+    {"backend": "graph", "base_url": "https://graph.facebook.com/v19.0",
+     "account_id": "17841400000000000", "access_token": "...", "max_workers": 4}
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import perf
+
+PUBLISHER_CONFIG_PATH = "~/.publisher_config.json"
+# Longest wait between status polls of a container whose polls keep failing
+POLL_BACKOFF_MAX = 30.0
+
+
+class PublishError(Exception):
+    pass
+
+
+class PublishResult:
+    """Outcome of publishing one post; `error` is None on success."""
+
+    def __init__(self, post_id, media_id=None, permalink=None, error=None):
+        self.post_id = post_id
+        self.media_id = media_id
+        self.permalink = permalink
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def post_fields(self):
+        """Fields stored on the post once it is published."""
+        fields = {"published_at": time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+        if self.media_id:
+            fields["published_media_id"] = self.media_id
+        if self.permalink:
+            fields["permalink"] = self.permalink
+        return fields
+
+
+class Publisher:
+    name = "base"
+
+    def publish_batch(self, posts):
+        """Publishes posts and returns one PublishResult per post, in order. Must not raise for a single post."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class LocalPublisher(Publisher):
+    name = "local"
+
+    def publish_batch(self, posts):
+        return [PublishResult(post["id"]) for post in posts]
+
+
+class GraphPublisher(Publisher):
+    """Graph API publisher sharing one keep-alive connection pool across all worker threads."""
+
+    name = "graph"
+
+    def __init__(self, base_url, account_id, access_token, max_workers=4, poll_interval=2.0, poll_timeout=300.0,
+                 request_timeout=30.0, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.account_id = account_id
+        self.access_token = access_token
+        self.max_workers = max(1, int(max_workers))
+        self.poll_interval = poll_interval
+        self.poll_timeout = poll_timeout
+        self.request_timeout = request_timeout
+        self._session = session
+
+    @property
+    def session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            self._session = requests.Session()
+            # One pooled connection per worker so concurrent requests reuse sockets instead of reconnecting
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+        return self._session
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def request(self, method, path, **params):
+        params["access_token"] = self.access_token
+        url = f"{self.base_url}/{path}"
+        with perf.span("publisher.request"):
+            if method == "GET":
+                response = self.session.get(url, params=params, timeout=self.request_timeout)
+            else:
+                response = self.session.request(method, url, data=params, timeout=self.request_timeout)
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        error = payload.get("error") if isinstance(payload, dict) else None
+        if response.status_code >= 400 or error:
+            message = error.get("message") if isinstance(error, dict) else error
+            raise PublishError(f"{method} {path}: {message or f'HTTP {response.status_code}'}")
+        if not isinstance(payload, dict):
+            raise PublishError(f"{method} {path}: unexpected response {payload!r:.200}")
+        return payload
+
+    def create_container(self, post):
+        image_url = post.get("s3_file_name")
+        if not image_url:
+            raise PublishError("Post has no media URL.")
+        return self.request("POST", f"{self.account_id}/media", image_url=image_url,
+                            caption=post.get("caption", ""))["id"]
+
+    def container_status(self, container_id):
+        try:
+            return self.request("GET", container_id, fields="status_code").get("status_code", "IN_PROGRESS")
+        except Exception as e:
+            return e
+
+    def publish_container(self, container_id):
+        media_id = self.request("POST", f"{self.account_id}/media_publish", creation_id=container_id)["id"]
+        # The post is live now; failing it over a missing permalink would publish it again on the next attempt
+        try:
+            permalink = self.request("GET", media_id, fields="permalink").get("permalink")
+        except Exception as e:
+            logging.warning("Published media %s but could not fetch its permalink: %s", media_id, e)
+            permalink = None
+        return media_id, permalink
+
+    def publish_batch(self, posts):
+        results = {}
+        with ThreadPoolExecutor(self.max_workers, thread_name_prefix="publish") as pool:
+            pending = {}
+            created = {post["id"]: pool.submit(self.create_container, post) for post in posts}
+            for post_id, future in created.items():
+                try:
+                    pending[post_id] = future.result()
+                except Exception as e:
+                    results[post_id] = PublishResult(post_id, error=str(e))
+
+            # Poll every pending container each round; finished ones are published while the rest keep processing.
+            # A container whose poll failed waits out a backoff before its next poll.
+            publishing = {}
+            poll_errors = {}
+            next_poll = {}
+            deadline = time.monotonic() + self.poll_timeout
+            while pending:
+                now = time.monotonic()
+                due = [post_id for post_id in pending if next_poll.get(post_id, 0) <= now]
+                statuses = dict(zip(due, pool.map(self.container_status, [pending[post_id] for post_id in due])))
+                for post_id, status in statuses.items():
+                    if isinstance(status, Exception):
+                        errors, _ = poll_errors.get(post_id, (0, None))
+                        poll_errors[post_id] = (errors + 1, status)
+                        next_poll[post_id] = now + min(self.poll_interval * 2 ** errors, POLL_BACKOFF_MAX)
+                        logging.warning("Status poll %d for post %s failed: %s", errors + 1, post_id, status)
+                        continue
+                    poll_errors.pop(post_id, None)
+                    next_poll.pop(post_id, None)
+                    if status == "FINISHED":
+                        publishing[post_id] = pool.submit(self.publish_container, pending.pop(post_id))
+                    elif status in ("ERROR", "EXPIRED"):
+                        pending.pop(post_id)
+                        results[post_id] = PublishResult(post_id, error=f"Media container failed: {status}")
+                if pending and time.monotonic() > deadline:
+                    for post_id in pending:
+                        error = "Timed out waiting for the media container."
+                        if post_id in poll_errors:
+                            error += f" Last status poll failed: {poll_errors[post_id][1]}"
+                        results[post_id] = PublishResult(post_id, error=error)
+                    break
+                if pending:
+                    time.sleep(self.poll_interval)
+
+            for post_id, future in publishing.items():
+                try:
+                    media_id, permalink = future.result()
+                    results[post_id] = PublishResult(post_id, media_id, permalink)
+                except Exception as e:
+                    results[post_id] = PublishResult(post_id, error=str(e))
+
+        failed = sum(1 for result in results.values() if not result.ok)
+        logging.info("Graph publish: %d posts, %d failed", len(posts), failed)
+        return [results[post["id"]] for post in posts]
+
+
+BACKENDS = {"local": LocalPublisher, "graph": GraphPublisher}
+
+
+def load_publisher(config_path=PUBLISHER_CONFIG_PATH):
+    """Builds the publisher named in the config file; LocalPublisher when there is no config."""
+    config_path = os.path.expanduser(config_path)
+    if not os.path.exists(config_path):
+        return LocalPublisher()
+    with open(config_path, "r") as file:
+        config = json.load(file)
+    backend = config.pop("backend", "local")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown publisher backend '{backend}' in {config_path}")
+    return BACKENDS[backend](**config)
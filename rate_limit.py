@@ -0,0 +1,202 @@
+"""Client-side rate limiting for the ChatGPT API.
+
+RateLimiter holds one token bucket for requests per minute and one for tokens per minute, shared by every
+thread that calls the API. Buckets work by reservation: a caller takes what it needs even if that overdraws
+the bucket, then sleeps until the debt is repaid, so waiting callers are served in order. The limits follow
+the x-ratelimit-* headers the API sends back. A 429 pauses the buckets for everyone. CircuitBreaker stops
+hammering an endpoint that keeps refusing connections.
+"""
+import random
+import re
+import threading
+import time
+
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200000
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(text):
+    """Parses reset durations such as '20ms', '1s' or '6m0s' into seconds; None if unparseable."""
+    if text is None:
+        return None
+    parts = _DURATION_PART.findall(str(text))
+    if not parts:
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    return sum(float(value) * _DURATION_UNITS[unit] for value, unit in parts)
+
+
+def retry_after(headers):
+    """Seconds the server asked us to wait, from retry-after-ms or retry-after."""
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+
+def estimate_tokens(messages, max_tokens=0):
+    """Rough prompt + completion token count (about four characters per token)."""
+    return sum(len(message.get("content") or "") for message in messages) // 4 + (max_tokens or 0)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """Takes amount from the bucket and returns how many seconds the caller must wait before using it."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+    def observe(self, limit=None, remaining=None, reset_seconds=None):
+        """Adopts the server's view of the limit and what is left of it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if limit:
+                self.capacity = float(limit)
+                self.rate = self.capacity / 60
+            if remaining is not None:
+                # The server is authoritative when it has less left than we think
+                allowed = remaining if remaining > 0 else -self.rate * (reset_seconds or 0)
+                self.tokens = min(self.tokens, allowed)
+
+    def pause(self, seconds):
+        """Makes every caller wait at least `seconds` from now."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -self.rate * seconds)
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries=6, base_delay=1.0, max_delay=60.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def acquire(self, tokens):
+        """Blocks until one request and `tokens` tokens are available. Returns the time waited."""
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def settle(self, estimated, actual):
+        """Returns the difference between the estimated and the actual token usage to the bucket."""
+        if actual < estimated:
+            self.tokens.refund(estimated - actual)
+        elif actual > estimated:
+            self.tokens.reserve(actual - estimated)
+
+    def observe_headers(self, headers):
+        def number(name):
+            try:
+                return float(headers[name])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        if headers is None or number("x-ratelimit-limit-requests") is None and \
+                number("x-ratelimit-limit-tokens") is None:
+            return
+        self.requests.observe(number("x-ratelimit-limit-requests"), number("x-ratelimit-remaining-requests"),
+                              parse_duration(headers.get("x-ratelimit-reset-requests")))
+        self.tokens.observe(number("x-ratelimit-limit-tokens"), number("x-ratelimit-remaining-tokens"),
+                            parse_duration(headers.get("x-ratelimit-reset-tokens")))
+
+    def backoff_delay(self, attempt, minimum=None):
+        """Full-jitter exponential backoff, never shorter than what the server asked for."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        return max(delay, minimum or 0)
+
+    def throttled(self, attempt, headers=None):
+        """Handles a 429: pauses the shared buckets and returns how long this caller should back off."""
+        delay = self.backoff_delay(attempt, retry_after(headers))
+        self.requests.pause(delay)
+        return delay
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and lets one trial call through after reset_timeout."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._trial_thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self.opened_at is None:
+            return self.CLOSED
+        if now - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                self._trial_thread = threading.get_ident()
+                return True
+            return False
+
+    def release(self):
+        """Ends this thread's trial call without a verdict, e.g. when it failed for an unrelated reason.
+
+        Call on every exit path after allow(); it does nothing once record_success/record_failure ran.
+        """
+        with self._lock:
+            if self._trial_running and self._trial_thread == threading.get_ident():
+                self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
@@ -0,0 +1,275 @@
+"""Persistent scheduled publishing.
+
+Posts marked ready_to_publish with a "publish_at" time are kept in publish_queue.json. In memory the queue
+is a heap ordered by due time. PublishDispatcher is a background thread that sleeps until the earliest entry
+is due, publishes it and retries failures with exponential backoff.
+
+The app and `cli.py dispatch` can run dispatchers on the same queue file. Before publishing, a dispatcher claims
+the entry under a cross-process lease: it re-reads the queue file and only proceeds when the entry is still
+scheduled and due there, then moves its due time CLAIM_SECONDS ahead on disk, so the other dispatchers skip it
+and only retry it if the claimer dies before recording the result.
+"""
+import heapq
+import itertools
+import logging
+import os
+import random
+import socket
+import threading
+import time
+
+import core
+import storage
+
+PUBLISH_AT_FORMAT = "%Y-%m-%d %H:%M"
+
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 3600
+MAX_ATTEMPTS = 8
+CLAIM_SECONDS = 600
+CLAIM_LOCK_SUFFIX = ".claim"
+
+
+def parse_publish_at(text):
+    """Parses a local 'YYYY-MM-DD HH:MM' time into an epoch timestamp. Raises ValueError if malformed."""
+    return time.mktime(time.strptime(text.strip(), PUBLISH_AT_FORMAT))
+
+
+def format_publish_at(timestamp):
+    return time.strftime(PUBLISH_AT_FORMAT, time.localtime(timestamp))
+
+
+def retry_delay(attempts):
+    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class PublishQueue:
+    """Due-time ordered queue of post ids, persisted to a JSON store on every change."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.entries = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self.changed = threading.Condition()
+
+    def load(self):
+        with self.changed:
+            self.entries = {entry["post_id"]: entry for entry in core.load_json(self.file_path, default=[])}
+            self._heap = []
+            for entry in self.entries.values():
+                if entry.get("status", "scheduled") == "scheduled":
+                    self._push(entry)
+            self.changed.notify_all()
+
+    def save(self):
+        core.save_json(sorted(self.entries.values(), key=lambda entry: entry["due"]), self.file_path)
+
+    def _push(self, entry):
+        heapq.heappush(self._heap, (entry["due"], next(self._counter), entry["post_id"]))
+
+    def _new_entry(self, post_id, publish_at, title):
+        due = parse_publish_at(publish_at)
+        return {"post_id": post_id, "title": title, "publish_at": publish_at, "due": due,
+                "due_at": format_publish_at(due), "attempts": 0, "status": "scheduled", "last_error": None}
+
+    def schedule(self, post_id, publish_at, title=""):
+        """Queues post_id for the local time publish_at ('YYYY-MM-DD HH:MM'), replacing any earlier entry."""
+        with self.changed:
+            entry = self.entries.get(post_id)
+            if entry and entry["publish_at"] == publish_at and entry["status"] == "scheduled":
+                return entry
+            entry = self._new_entry(post_id, publish_at, title)
+            self.entries[post_id] = entry
+            self._push(entry)
+            self.save()
+            self.changed.notify_all()
+            return entry
+
+    def unschedule(self, post_id):
+        with self.changed:
+            if self.entries.pop(post_id, None) is not None:
+                self.save()
+                self.changed.notify_all()
+
+    def next_due(self):
+        """Returns (due, post_id) of the earliest live entry, dropping stale heap items, or None."""
+        while self._heap:
+            due, _, post_id = self._heap[0]
+            entry = self.entries.get(post_id)
+            if entry is not None and entry["due"] == due and entry["status"] == "scheduled":
+                return due, post_id
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now):
+        """Removes and returns the entries due at or before now."""
+        due_entries = []
+        while True:
+            head = self.next_due()
+            if head is None or head[0] > now:
+                return due_entries
+            heapq.heappop(self._heap)
+            due_entries.append(self.entries[head[1]])
+
+    def claim(self, entry, now):
+        """Takes a popped entry for publishing unless another process has it. Call with `changed` held.
+
+        Returns False when the queue file no longer has the entry due, in which case this queue adopts the
+        version on disk (dropped, rescheduled or claimed elsewhere) instead. Only the claimed entry is changed
+        on disk; the other entries are taken from the file as they are, so edits other processes made to them
+        survive the claim.
+        """
+        post_id = entry["post_id"]
+        with storage.file_lock(self.file_path + CLAIM_LOCK_SUFFIX):
+            on_disk = core.load_json(self.file_path, default=[])
+            current = next((item for item in on_disk if item["post_id"] == post_id), None)
+            claimed = current is not None and current.get("status", "scheduled") == "scheduled" \
+                and current["due"] <= now
+            if claimed:
+                current["due"] = now + CLAIM_SECONDS
+                current["due_at"] = format_publish_at(current["due"])
+                current["claimed_by"] = f"{socket.gethostname()}:{os.getpid()}"
+                core.save_json(on_disk, self.file_path)
+                self.entries[post_id] = entry
+            self._adopt(on_disk, held=post_id if claimed else None)
+        return claimed
+
+    def _adopt(self, items, held=None):
+        """Replaces the entries with `items` read from disk, keeping the entry objects callers may still hold.
+
+        Entries whose due time or status moved are queued again, except `held`, which this process is publishing.
+        """
+        entries = {}
+        for item in items:
+            post_id = item["post_id"]
+            entry = self.entries.get(post_id)
+            moved = entry is None or (entry["due"], entry.get("status")) != (item["due"], item.get("status"))
+            if entry is None:
+                entry = item
+            elif entry != item:
+                entry.clear()
+                entry.update(item)
+            entries[post_id] = entry
+            if moved and post_id != held and entry.get("status", "scheduled") == "scheduled":
+                self._push(entry)
+        self.entries = entries
+
+    def mark_done(self, entry):
+        # The entry may have been replaced by a reschedule while it was being published
+        if self.entries.get(entry["post_id"]) is entry:
+            del self.entries[entry["post_id"]]
+
+    def mark_failed(self, entry, error, now):
+        if self.entries.get(entry["post_id"]) is not entry:
+            return
+        entry.pop("claimed_by", None)
+        entry["attempts"] += 1
+        entry["last_error"] = str(error)
+        if entry["attempts"] >= MAX_ATTEMPTS:
+            entry["status"] = "failed"
+        else:
+            entry["due"] = now + retry_delay(entry["attempts"])
+            entry["due_at"] = format_publish_at(entry["due"])
+            self._push(entry)
+
+    def sync_from_posts(self, posts):
+        """Queues ready posts that have a publish time and drops entries whose post is no longer ready.
+
+        Entries whose requested time is unchanged keep their retry state.
+        """
+        wanted = {}
+        for post in posts:
+            if post.get("ready_to_publish") and post.get("publish_at") and post.get("id"):
+                try:
+                    parse_publish_at(post["publish_at"])
+                except ValueError:
+                    logging.warning("Ignoring invalid publish time %r on post %s", post["publish_at"], post["id"])
+                    continue
+                wanted[post["id"]] = post
+        with self.changed:
+            stale = [post_id for post_id in self.entries if post_id not in wanted]
+            for post_id in stale:
+                del self.entries[post_id]
+            added = 0
+            for post_id, post in wanted.items():
+                entry = self.entries.get(post_id)
+                if entry is None or entry["publish_at"] != post["publish_at"]:
+                    entry = self._new_entry(post_id, post["publish_at"], post.get("title", ""))
+                    self.entries[post_id] = entry
+                    self._push(entry)
+                    added += 1
+            if stale or added:
+                self.save()
+                self.changed.notify_all()
+
+
+class PublishDispatcher(threading.Thread):
+    """Background thread publishing queued posts when they fall due.
+
+    `publish` is called with a post id (usually ContentService.publish_by_id) and raises on failure.
+    `on_result(entry, error)` is called after every attempt (error is None on success).
+    """
+
+    def __init__(self, publish_queue, publish, on_result=None):
+        super().__init__(name="publish-dispatcher", daemon=True)
+        self.queue = publish_queue
+        self.publish = publish
+        self.on_result = on_result
+        self._stopping = False
+
+    def stop(self):
+        with self.queue.changed:
+            self._stopping = True
+            self.queue.changed.notify_all()
+
+    def run(self):
+        while True:
+            with self.queue.changed:
+                while not self._stopping:
+                    head = self.queue.next_due()
+                    now = time.time()
+                    if head is not None and head[0] <= now:
+                        break
+                    # Sleep until the next entry is due, or until schedule()/stop() wakes us
+                    self.queue.changed.wait(None if head is None else head[0] - now)
+                if self._stopping:
+                    return
+                now = time.time()
+                due_entries = [entry for entry in self.queue.pop_due(now) if self.claim(entry, now)]
+
+            for entry in due_entries:
+                self.dispatch(entry)
+
+    def claim(self, entry, now):
+        try:
+            return self.queue.claim(entry, now)
+        except Exception as e:
+            logging.error("Could not claim scheduled post %s: %s", entry["post_id"], e)
+            self.queue.mark_failed(entry, e, now)
+            return False
+
+    def dispatch(self, entry):
+        error = None
+        try:
+            self.publish(entry["post_id"])
+            logging.info("Published scheduled post %s", entry["post_id"])
+        except core.NotPublishable as e:
+            error = e
+            logging.warning("Dropping scheduled post %s from the queue: %s", entry["post_id"], e)
+        except Exception as e:
+            error = e
+            logging.error("Publishing %s failed (attempt %d): %s", entry["post_id"], entry["attempts"] + 1, e)
+
+        with self.queue.changed:
+            if error is None or isinstance(error, core.NotPublishable):
+                self.queue.mark_done(entry)
+            else:
+                self.queue.mark_failed(entry, error, time.time())
+            try:
+                self.queue.save()
+            except Exception:
+                logging.exception("Could not save %s", self.queue.file_path)
+        if self.on_result is not None:
+            self.on_result(entry, error)
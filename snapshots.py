@@ -0,0 +1,217 @@
+"""Incremental, compressed snapshots of the JSON stores, for undoing a bad save.
+
+Each store's contents are kept once, gzipped, under snapshots/objects/<hash>.json.gz; a snapshot is a small
+manifest (snapshots/<timestamp>.json) naming the hash of every store at that moment. Taking a snapshot only hashes
+stores whose mtime/size moved since the last one and only compresses contents not stored yet, so an idle or
+mostly-unchanged dataset costs a few stat calls. Snapshotter does this on a background thread; restore() puts a
+snapshot's stores back with one decompress and one atomic rename each.
+"""
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import batch_jobs
+import core
+import storage
+
+SNAPSHOT_DIR = "snapshots"
+OBJECTS_DIR = "objects"
+SNAPSHOT_STORES = (core.UNPUBLISHED_POSTS_FILE, core.PUBLISHED_POSTS_FILE, core.CUSTOMER_INFO_FILE,
+                   core.PROMPTS_FILE, core.TAGS_FILE, core.PROMPT_CUSTOMER_INFO_FILE, core.PUBLISH_QUEUE_FILE,
+                   batch_jobs.BATCH_JOBS_FILE)
+INTERVAL_SECONDS = 60
+# Every snapshot from the last KEEP_RECENT, plus the last one of each of the last KEEP_DAILY days
+KEEP_RECENT = 30
+KEEP_DAILY = 14
+# Another instance may have stored contents it hasn't written the manifest for yet
+ORPHAN_GRACE_SECONDS = 600
+# Fast levels compress JSON nearly as well as level 9 at a fraction of the CPU
+COMPRESS_LEVEL = 3
+
+
+def _write_bytes(path, data):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class Snapshots:
+    """The snapshots of one data directory."""
+
+    def __init__(self, data_dir, stores=SNAPSHOT_STORES, keep_recent=KEEP_RECENT, keep_daily=KEEP_DAILY):
+        self.data_dir = data_dir
+        self.stores = stores
+        self.keep_recent = keep_recent
+        self.keep_daily = keep_daily
+        self.directory = os.path.join(data_dir, SNAPSHOT_DIR)
+        self.objects = os.path.join(self.directory, OBJECTS_DIR)
+        # store name -> (stat key, manifest entry) of the contents last hashed
+        self._hashed = {}
+        self.lock = threading.Lock()
+
+    def ids(self):
+        """Snapshot ids, oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+    def load(self, snapshot_id):
+        try:
+            with open(os.path.join(self.directory, f"{snapshot_id}.json"), "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise core.ServiceError(f"No snapshot '{snapshot_id}'.") from None
+
+    def latest(self):
+        ids = self.ids()
+        return self.load(ids[-1]) if ids else None
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects, f"{digest}.json.gz")
+
+    def _entry(self, name):
+        """The manifest entry for a store's current contents, storing them if new; None if the store is missing."""
+        path = os.path.join(self.data_dir, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        hashed = self._hashed.get(name)
+        if hashed is not None and hashed[0] == (stat.st_mtime_ns, stat.st_size):
+            return hashed[1]
+        try:
+            state = storage.read_state(path)
+        except FileNotFoundError:
+            return None
+        digest = state.digest.hex()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            _write_bytes(object_path, gzip.compress(state.text.encode("utf-8"), COMPRESS_LEVEL))
+        entry = {"digest": digest, "size": len(state.text), "version": state.version}
+        self._hashed[name] = (state.stat_key, entry)
+        return entry
+
+    def take(self):
+        """Snapshots the stores if any changed since the last snapshot. Returns the new snapshot id or None."""
+        with self.lock:
+            os.makedirs(self.objects, exist_ok=True)
+            latest = self.latest()
+            previous = latest["stores"] if latest else {}
+            stores = {}
+            for name in self.stores:
+                entry = self._entry(name)
+                if entry is not None:
+                    stores[name] = entry
+            changed = [name for name in stores if previous.get(name, {}).get("digest") != stores[name]["digest"]]
+            if not changed and stores.keys() == previous.keys():
+                return None
+
+            now = time.time()
+            snapshot_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now % 1 * 1000):03d}"
+            manifest = {"id": snapshot_id, "created_at": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                        "changed": changed, "stores": stores}
+            _write_bytes(os.path.join(self.directory, f"{snapshot_id}.json"),
+                         json.dumps(manifest, indent=4).encode("utf-8"))
+            self.prune()
+        logging.info("Snapshot %s: %s changed", snapshot_id, ", ".join(changed) or "stores removed")
+        return snapshot_id
+
+    def prune(self):
+        """Deletes the snapshots retention doesn't keep, then the stored contents no snapshot refers to."""
+        ids = self.ids()
+        last_of_day = {}
+        for snapshot_id in ids:
+            last_of_day[snapshot_id[:8]] = snapshot_id
+        keep = set(ids[-self.keep_recent:]) | set(sorted(last_of_day.values())[-self.keep_daily:])
+        for snapshot_id in ids:
+            if snapshot_id not in keep:
+                os.remove(os.path.join(self.directory, f"{snapshot_id}.json"))
+
+        referenced = set()
+        for snapshot_id in keep:
+            referenced.update(entry["digest"] for entry in self.load(snapshot_id)["stores"].values())
+        cutoff = time.time() - ORPHAN_GRACE_SECONDS
+        for name in os.listdir(self.objects):
+            path = os.path.join(self.objects, name)
+            if name.endswith(".json.gz") and name[:-len(".json.gz")] not in referenced \
+                    and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+
+    def read(self, digest):
+        """The stored text with this hash, checked against it."""
+        try:
+            with open(self._object_path(digest), "rb") as file:
+                data = gzip.decompress(file.read())
+        except (OSError, EOFError) as e:
+            raise core.ServiceError(f"Snapshot data {digest} can't be read: {e}") from e
+        text = data.decode("utf-8")
+        if storage.text_digest(text).hex() != digest:
+            raise core.ServiceError(f"Snapshot data {digest} is corrupted.")
+        return text
+
+    def restore(self, snapshot_id=None, stores=None):
+        """Puts the stores saved in a snapshot (default: the latest) back and returns the names restored.
+
+        `stores` limits the restore to some store files. The current contents are snapshotted first, so a restore
+        can itself be undone. Stores that already match the snapshot are left alone.
+        """
+        manifest = self.load(snapshot_id) if snapshot_id else self.latest()
+        if manifest is None:
+            raise core.ServiceError("There are no snapshots to restore.")
+        names = list(stores or manifest["stores"])
+        missing = [name for name in names if name not in manifest["stores"]]
+        if missing:
+            raise core.ServiceError(f"Snapshot {manifest['id']} has no {', '.join(missing)}.")
+        texts = {name: self.read(manifest["stores"][name]["digest"]) for name in names}
+
+        self.take()
+        restored = []
+        with self.lock:
+            for name in names:
+                current = self._entry(name)
+                if current is not None and current["digest"] == manifest["stores"][name]["digest"]:
+                    continue
+                storage.replace_text(os.path.join(self.data_dir, name), texts[name])
+                restored.append(name)
+        logging.info("Restored %s from snapshot %s", ", ".join(restored) or "nothing", manifest["id"])
+        return restored
+
+
+class Snapshotter(threading.Thread):
+    """Background thread taking a snapshot every `interval` seconds when a store changed."""
+
+    def __init__(self, snapshots, interval=INTERVAL_SECONDS):
+        super().__init__(name="snapshotter", daemon=True)
+        self.snapshots = snapshots
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stopping = False
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def wake(self):
+        """Snapshots now instead of waiting out the interval."""
+        self._wake.set()
+
+    def run(self):
+        while not self._stopping:
+            try:
+                self.snapshots.take()
+            except Exception:
+                logging.exception("Taking a snapshot failed")
+            self._wake.wait(self.interval)
+            self._wake.clear()
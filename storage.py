@@ -0,0 +1,375 @@
+"""Locked, versioned reads and writes for the JSON stores.
+
+Each store file gets two sidecars: `<file>.lock` (advisory lock held while reading or writing) and
+`<file>.version` (a counter bumped on every save). When a save finds that the version moved since this process
+last read the file, the three versions (what we read, what is on disk now, what we are saving) are merged
+record by record (posts by "id", queue entries by "post_id", prompts/customers/tags by "name", dicts by key)
+instead of overwriting.
+
+changed_on_disk() tells whether a store differs from what this process last read or wrote, checking mtime and
+size first and the content hash only when those moved, so watchers can skip stores that were merely touched.
+"""
+import hashlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT = 10.0
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class StoreLockTimeout(IOError):
+    pass
+
+
+class StoreState:
+    """What this process last read from or wrote to a store file."""
+
+    def __init__(self, version, stat_key, text):
+        self.version = version
+        self.stat_key = stat_key
+        self.text = text
+        self._digest = None
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = text_digest(self.text)
+        return self._digest
+
+
+_states = {}
+_thread_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _thread_lock(path):
+    with _registry_lock:
+        return _thread_locks.setdefault(path, threading.Lock())
+
+
+def _acquire(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _release(handle):
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    else:
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(file_path, timeout=LOCK_TIMEOUT):
+    """Holds an exclusive advisory lock on file_path across threads and processes."""
+    path = os.path.abspath(file_path)
+    with _thread_lock(path):
+        with open(path + ".lock", "a+") as handle:
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    _acquire(handle)
+                    break
+                except OSError:
+                    if time.monotonic() > deadline:
+                        raise StoreLockTimeout(f"Timed out waiting for the lock on {file_path}")
+                    time.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                _release(handle)
+
+
+def _version_path(path):
+    return path + ".version"
+
+
+def read_version(file_path):
+    try:
+        with open(_version_path(os.path.abspath(file_path)), "r") as file:
+            return int(json.load(file).get("version", 0))
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _write_version(path, version):
+    info = {"version": version, "writer": f"{socket.gethostname()}:{os.getpid()}",
+            "saved_at": time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+    _atomic_write(_version_path(path), json.dumps(info))
+
+
+def _stat_key(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def text_digest(text):
+    """The hash changed_on_disk() compares store contents by."""
+    return _digest(text.encode("utf-8"))
+
+
+def _atomic_write(path, text):
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w") as file:
+            file.write(text)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_text(file_path):
+    """Reads a store under its lock and remembers the version read. Returns the file text."""
+    path = os.path.abspath(file_path)
+    with file_lock(path):
+        with open(path, "r") as file:
+            text = file.read()
+        _states[path] = StoreState(read_version(path), _stat_key(path), text)
+    return text
+
+
+def last_state(file_path):
+    """The StoreState this process last read or wrote for file_path, or None."""
+    return _states.get(os.path.abspath(file_path))
+
+
+def read_state(file_path):
+    """Reads a store under its lock without recording it as read. Pass the result to adopt_state once applied."""
+    path = os.path.abspath(file_path)
+    with file_lock(path):
+        with open(path, "r") as file:
+            text = file.read()
+        return StoreState(read_version(path), _stat_key(path), text)
+
+
+def adopt_state(file_path, state, expected):
+    """Records `state` as the version this process holds, unless the store was read or written since `expected`.
+
+    Returns False when `state` is stale, in which case the caller should drop it and read again.
+    """
+    path = os.path.abspath(file_path)
+    with file_lock(path):
+        if _states.get(path) is not expected:
+            return False
+        _states[path] = state
+    return True
+
+
+def changed_on_disk(file_path):
+    """Whether the store's contents differ from what this process last read or wrote.
+
+    A store that was never read counts as changed once it exists. When only mtime/size moved (a touch, or a
+    rewrite with the same bytes) the new stat is remembered so the file isn't hashed again.
+    """
+    path = os.path.abspath(file_path)
+    state = _states.get(path)
+    stat_key = _stat_key(path)
+    if state is None:
+        return stat_key is not None
+    if stat_key == state.stat_key:
+        return False
+    if stat_key is None:
+        return True
+    try:
+        with open(path, "r") as file:
+            digest = _digest(file.read().encode("utf-8"))
+    except OSError:
+        return True
+    if digest != state.digest:
+        return True
+    state.stat_key = stat_key
+    return False
+
+
+def write_json(data, file_path):
+    """Saves data to a store, merging with changes other writers made since we last read it.
+
+    `data` is updated in place with the merged result (lists and dicts) so callers keep working with one object.
+    Returns (text_written, conflicts); conflicts lists the records/fields where both sides changed the same
+    value and ours was kept.
+    """
+    path = os.path.abspath(file_path)
+    conflicts = []
+    with file_lock(path):
+        state = _states.get(path)
+        disk_version = read_version(path)
+        changed_on_disk = state is not None and (disk_version != state.version
+                                                 or _stat_key(path) != state.stat_key)
+        if changed_on_disk and os.path.exists(path):
+            with open(path, "r") as file:
+                theirs = json.load(file)
+            base = json.loads(state.text)
+            merged = merge_values(base, theirs, data, (), conflicts)
+            if merged is not data:
+                _replace_contents(data, merged)
+            logging.info("Merged concurrent changes into %s (%d conflicts)", file_path, len(conflicts))
+
+        text = json.dumps(data, indent=4)
+        _atomic_write(path, text)
+        version = disk_version + 1
+        _write_version(path, version)
+        _states[path] = StoreState(version, _stat_key(path), text)
+    for conflict in conflicts:
+        logging.warning("Conflicting edit in %s at %s; kept this instance's value", file_path, conflict)
+    return text, conflicts
+
+
+def replace_text(file_path, text):
+    """Overwrites a store with text as-is (no merge) and bumps its version, e.g. to restore a backup.
+
+    The new contents are not recorded as read here, so instances holding the store see it change on disk and
+    reload it or merge into it.
+    """
+    path = os.path.abspath(file_path)
+    with file_lock(path):
+        _atomic_write(path, text)
+        _write_version(path, read_version(path) + 1)
+
+
+def _replace_contents(target, source):
+    if isinstance(target, list) and isinstance(source, list):
+        target[:] = source
+    elif isinstance(target, dict) and isinstance(source, dict):
+        target.clear()
+        target.update(source)
+
+
+def _keyed_by(items, field):
+    keys = []
+    for item in items:
+        if not isinstance(item, dict) or field not in item:
+            return False
+        keys.append(item[field])
+    try:
+        return len(set(keys)) == len(keys)
+    except TypeError:
+        return False
+
+
+def _record_key(*lists):
+    """Returns the field that uniquely identifies the records in every list, or None if they aren't keyed."""
+    for field in ("id", "post_id", "name"):
+        if all(_keyed_by(items, field) for items in lists):
+            return field
+    return None
+
+
+def merge_values(base, theirs, mine, path, conflicts):
+    """Three-way merge. Values equal to base are treated as unchanged; true conflicts keep `mine`."""
+    if mine == theirs:
+        return mine
+    if mine == base:
+        return theirs
+    if theirs == base:
+        return mine
+
+    if all(isinstance(value, dict) or value is _MISSING for value in (base, theirs, mine)) \
+            and theirs is not _MISSING and mine is not _MISSING:
+        return _merge_mapping({} if base is _MISSING else base, theirs, mine, path, conflicts)
+
+    if isinstance(theirs, list) and isinstance(mine, list) and (isinstance(base, list) or base is _MISSING):
+        base_list = [] if base is _MISSING else base
+        key = _record_key(base_list, theirs, mine)
+        if key:
+            return _merge_records(base_list, theirs, mine, key, path, conflicts)
+        return _merge_items(base_list, theirs, mine)
+
+    # Deleted on one side, edited on the other: keep the edit rather than lose it
+    if mine is _MISSING:
+        conflicts.append(path)
+        return theirs
+    if theirs is _MISSING:
+        conflicts.append(path)
+        return mine
+    conflicts.append(path)
+    return mine
+
+
+def _merge_mapping(base, theirs, mine, path, conflicts):
+    merged = {}
+    for key in list(mine) + [key for key in theirs if key not in mine] + \
+            [key for key in base if key not in mine and key not in theirs]:
+        value = merge_values(base.get(key, _MISSING), theirs.get(key, _MISSING), mine.get(key, _MISSING),
+                             path + (key,), conflicts)
+        if value is not _MISSING:
+            merged[key] = value
+    return merged
+
+
+def _item_key(item):
+    return json.dumps(item, sort_keys=True)
+
+
+def _merge_items(base, theirs, mine):
+    """Merges lists whose records have no unique key (legacy posts without ids, duplicate names) by value.
+
+    Items this instance removed since `base` are removed from theirs and items it added are appended, unless
+    the other writer added the same item too. An edit counts as removing the old item and adding the new one,
+    so an item edited on one side and deleted on the other keeps the edit.
+    """
+    base_counts, mine_counts, theirs_counts = {}, {}, {}
+    for items, counts in ((base, base_counts), (mine, mine_counts), (theirs, theirs_counts)):
+        for item in items:
+            item_key = _item_key(item)
+            counts[item_key] = counts.get(item_key, 0) + 1
+
+    removed = {item_key: count - mine_counts.get(item_key, 0) for item_key, count in base_counts.items()}
+    merged = []
+    for item in theirs:
+        item_key = _item_key(item)
+        if removed.get(item_key, 0) > 0:
+            removed[item_key] -= 1
+        else:
+            merged.append(item)
+    for item in mine:
+        item_key = _item_key(item)
+        ours = mine_counts[item_key] - base_counts.get(item_key, 0)
+        other = theirs_counts.get(item_key, 0) - base_counts.get(item_key, 0)
+        if ours > max(other, 0):
+            merged.append(item)
+            mine_counts[item_key] -= 1
+    return merged
+
+
+def _merge_records(base, theirs, mine, key, path, conflicts):
+    base_by_key = {item[key]: item for item in base}
+    theirs_by_key = {item[key]: item for item in theirs}
+    mine_by_key = {item[key]: item for item in mine}
+
+    # Keep the on-disk order, then append records only this instance has
+    order = [item[key] for item in theirs] + [item[key] for item in mine if item[key] not in theirs_by_key]
+    merged = []
+    for record_key in order:
+        value = merge_values(base_by_key.get(record_key, _MISSING), theirs_by_key.get(record_key, _MISSING),
+                             mine_by_key.get(record_key, _MISSING), path + (record_key,), conflicts)
+        if value is not _MISSING:
+            merged.append(value)
+    return merged
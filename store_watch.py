@@ -0,0 +1,207 @@
+"""Live reloading of the JSON stores when another instance or a script changes them.
+
+StoreWatcher notices changes: with inotify on Linux (through libc, no extra package) it wakes as soon as a file in a
+store's directory is written, and elsewhere it polls. Either way a store only counts as changed when
+storage.changed_on_disk() says its contents differ from what this process holds, so our own saves and plain
+touches are ignored. apply_changes() then brings the in-memory list up to date record by record, keeping the
+objects of unchanged records, so the open view only redraws what actually changed.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sys
+import threading
+import time
+
+import storage
+
+POLL_SECONDS = 2.0
+# Writers touch a store, its .version and a temp file in quick succession; wait for them to finish
+SETTLE_SECONDS = 0.2
+
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+
+class StoreChanges:
+    """Keys of the records added, changed and removed by a reload, and whether the rest changed order.
+
+    `resync` means the records couldn't be matched by key, so the lists are empty and anything may have changed:
+    views and indexes must rebuild from the whole store.
+    """
+
+    def __init__(self, added=(), changed=(), removed=(), reordered=False, resync=False):
+        self.added = list(added)
+        self.changed = list(changed)
+        self.removed = list(removed)
+        self.reordered = reordered
+        self.resync = resync
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed or self.reordered or self.resync)
+
+    def __str__(self):
+        if self.resync:
+            return "reloaded in full"
+        return f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed"
+
+
+class StoreUpdate:
+    """A store read from disk but not applied yet (see ContentService.read_store_update)."""
+
+    def __init__(self, file_name, expected, state, records):
+        self.file_name = file_name
+        # The StoreState held when reading; the update is stale if another read or save replaced it
+        self.expected = expected
+        self.state = state
+        self.records = records
+
+
+def _keys(items, key):
+    """The key of every item, or None if some item has no key or two share one."""
+    try:
+        keys = [item.get(key) for item in items]
+        if None in keys or len(set(keys)) != len(keys):
+            return None
+    except (AttributeError, TypeError):
+        return None
+    return keys
+
+
+def apply_changes(current, fresh, key):
+    """Makes the list `current` equal to `fresh` in place and returns the StoreChanges.
+
+    Records are matched by `key`; a record equal to its fresh copy keeps its object. Lists whose records can't be
+    matched (missing or duplicate keys) are replaced wholesale and reported as a resync.
+    """
+    old_keys, new_keys = _keys(current, key), _keys(fresh, key)
+    if old_keys is None or new_keys is None:
+        resync = current != fresh
+        current[:] = fresh
+        return StoreChanges(resync=resync)
+
+    old_index = dict(zip(old_keys, current))
+    new_set = set(new_keys)
+    added, changed, merged = [], [], []
+    for record_key, item in zip(new_keys, fresh):
+        old = old_index.get(record_key)
+        if old is None:
+            added.append(record_key)
+            merged.append(item)
+        elif old == item:
+            merged.append(old)
+        else:
+            changed.append(record_key)
+            merged.append(item)
+    removed = [record_key for record_key in old_keys if record_key not in new_set]
+    reordered = [record_key for record_key in old_keys if record_key in new_set] != \
+        [record_key for record_key in new_keys if record_key in old_index]
+    current[:] = merged
+    return StoreChanges(added, changed, removed, reordered)
+
+
+def _open_inotify(directories):
+    """An inotify descriptor watching the directories, or None where inotify isn't available."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    for directory in directories:
+        if libc.inotify_add_watch(fd, os.fsencode(directory), _WATCH_MASK) < 0:
+            logging.warning("Can't watch %s with inotify (errno %d); polling instead", directory, ctypes.get_errno())
+            os.close(fd)
+            return None
+    return fd
+
+
+def _drain(fd):
+    try:
+        while os.read(fd, 65536):
+            pass
+    except BlockingIOError:
+        pass
+
+
+class StoreWatcher(threading.Thread):
+    """Background thread calling `on_change(path)` when a watched store changes on disk.
+
+    `backend` is "auto" (inotify where available, else polling), "inotify" or "polling". Even with inotify the
+    stores are checked every `interval` seconds, which catches writes inotify can't see (network filesystems).
+    on_change runs on this thread; an exception from it is logged and the change is offered again only once the
+    file changes once more.
+    """
+
+    def __init__(self, paths, on_change, interval=POLL_SECONDS, backend="auto"):
+        super().__init__(name="store-watcher", daemon=True)
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.on_change = on_change
+        self.interval = interval
+        self._failed = {}
+        self._stopping = False
+        self._wake = threading.Event()
+        self._inotify = self._wake_read = self._wake_write = None
+        if backend in ("auto", "inotify"):
+            self._inotify = _open_inotify(sorted({os.path.dirname(path) for path in self.paths}))
+            if self._inotify is None and backend == "inotify":
+                logging.warning("inotify is not available; polling the stores every %.1fs", interval)
+        if self._inotify is not None:
+            # select() can wait on the pipe only where it can wait on inotify, so polling uses the Event
+            self._wake_read, self._wake_write = os.pipe()
+        self.backend = "inotify" if self._inotify is not None else "polling"
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+        if self._wake_write is not None:
+            os.write(self._wake_write, b"x")
+
+    def run(self):
+        try:
+            while not self._stopping:
+                self.wait()
+                if not self._stopping:
+                    self.check()
+        finally:
+            for fd in (self._inotify, self._wake_read, self._wake_write):
+                if fd is not None:
+                    os.close(fd)
+
+    def wait(self):
+        if self._inotify is None:
+            self._wake.wait(self.interval)
+            return
+        ready, _, _ = select.select([self._inotify, self._wake_read], [], [], self.interval)
+        if self._inotify in ready:
+            time.sleep(SETTLE_SECONDS)
+            _drain(self._inotify)
+
+    def check(self):
+        for path in self.paths:
+            try:
+                if not storage.changed_on_disk(path):
+                    self._failed.pop(path, None)
+                    continue
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stat_key = stat.st_mtime_ns, stat.st_size
+            if self._failed.get(path) == stat_key:
+                continue
+            try:
+                self.on_change(path)
+                self._failed.pop(path, None)
+            except Exception as e:
+                # Often a script caught mid-write; wait for the file to change again
+                self._failed[path] = stat_key
+                logging.error("Reloading %s failed: %s", path, e)
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+import api_server
+import core
+
+
+@pytest.fixture
+def server(tmp_path):
+    service = core.ContentService(str(tmp_path), provider_config_path=str(tmp_path / "providers.json"))
+    service.load_all()
+    return api_server.ApiServer(service, port=8765)
+
+
+def call(server, method, target, body=None, **headers):
+    headers = {name.replace("_", "-"): value for name, value in headers.items()}
+    if body is not None:
+        headers.setdefault("content-type", "application/json")
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    return asyncio.run(server.dispatch(api_server.Request(method, target, headers, data)))
+
+
+def test_requests_from_other_origins_are_refused(server):
+    status, payload = call(server, "POST", "/posts/unpublished", {"title": "x"}, origin="https://evil.example")
+
+    assert status == 403
+    assert server.service.unpublished_posts == []
+    assert call(server, "GET", "/health", origin="http://127.0.0.1:8765")[0] == 200
+    assert call(server, "GET", "/health")[0] == 200
+
+
+def test_bodies_must_be_json(server):
+    status, _ = call(server, "POST", "/posts/unpublished", content_type="text/plain")
+    assert status == 415
+    status, post = call(server, "POST", "/posts/unpublished", {"title": "x"},
+                        content_type="application/json; charset=utf-8")
+    assert (status, post["title"]) == (201, "x")
+
+
+@pytest.mark.parametrize("output", ["../outside.csv", "/tmp/outside.csv", "", 5])
+def test_export_output_must_stay_in_the_data_directory(server, output):
+    status, payload = call(server, "POST", "/jobs/export", {"output": output})
+
+    assert status == 400
+    assert server.jobs == {}
+
+
+def test_export_output_is_resolved_in_the_data_directory(server):
+    status, job = call(server, "POST", "/jobs/export", {"output": "exports/ready.csv"})
+
+    assert status == 202
+    assert job["params"]["output"] == os.path.join(os.path.realpath(server.service.data_dir), "exports", "ready.csv")
+
+
+def test_reads_pick_up_stores_changed_on_disk(server):
+    call(server, "POST", "/posts/unpublished", {"title": "first"})
+    path = server.service.path(core.UNPUBLISHED_POSTS_FILE)
+    with open(path) as file:
+        posts = json.load(file)
+    posts.append({"id": "other", "title": "from another instance", "tag": ""})
+    with open(path, "w") as file:
+        json.dump(posts, file)
+
+    status, listed = call(server, "GET", "/posts/unpublished")
+
+    assert [post["title"] for post in listed] == ["first", "from another instance"]
+
+
+def test_posts_with_an_empty_tag_are_uncategorised(server):
+    call(server, "POST", "/posts/unpublished", {"title": "empty", "tag": ""})
+    call(server, "POST", "/posts/unpublished", {"title": "tagged", "tag": "news"})
+
+    status, listed = call(server, "GET", "/posts/unpublished?tag=Uncategorised")
+
+    assert [post["title"] for post in listed] == ["empty"]
@@ -0,0 +1,181 @@
+import json
+
+import pytest
+
+import batch_jobs
+import core
+from benchmarks.fakes import FakeBatchServer
+
+JOB = {"id": "job1", "requests": {"job1-0": "Launch", "job1-1": "Launch", "job1-2": "Recap"}}
+
+
+def output_line(custom_id, content):
+    return json.dumps({"custom_id": custom_id, "error": None, "response": {
+        "status_code": 200, "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}}})
+
+
+def test_parse_results_stamps_posts_with_their_job_and_prompt():
+    text = "\n".join([output_line("job1-0", '```json\n[{"caption": "a", "content": "x"}]\n```'),
+                      "",
+                      output_line("job1-2", '[{"caption": "b", "content": "y"}, "not a post"]')])
+
+    items, failures = batch_jobs.parse_results(JOB, text)
+
+    assert items == [{"caption": "a", "content": "x", "batch_job": "job1", "source_prompt": "Launch"},
+                     {"caption": "b", "content": "y", "batch_job": "job1", "source_prompt": "Recap"},
+                     "not a post"]
+    assert failures == []
+
+
+@pytest.mark.parametrize("line, message", [
+    ({"custom_id": "job1-0", "error": {"code": "server_error", "message": "The model failed"}}, "The model failed"),
+    ({"custom_id": "job1-0", "error": {"code": "server_error"}}, "server_error"),
+    ({"custom_id": "job1-0", "error": "Request timed out"}, "Request timed out"),
+    ({"custom_id": "job1-0", "error": ["odd", "shape"]}, '["odd", "shape"]'),
+    ({"custom_id": "job1-0", "response": {"status_code": 500, "body": "Internal Server Error"}},
+     "Internal Server Error"),
+    ({"custom_id": "job1-0", "response": {"status_code": 429, "body": {"error": {"message": "Slow down"}}}},
+     "Slow down"),
+    ({"custom_id": "job1-0", "response": {"status_code": 502, "body": None}}, "HTTP 502"),
+])
+def test_parse_results_reports_errors_of_any_shape(line, message):
+    assert batch_jobs.parse_results(JOB, json.dumps(line)) == ([], [("job1-0", message)])
+
+
+def test_parse_results_reports_unusable_lines_and_responses():
+    text = "\n".join(["{not json", "[1, 2]", output_line("job1-1", "Sorry, I can't help with that.")])
+
+    items, failures = batch_jobs.parse_results(JOB, text)
+
+    assert items == []
+    assert [custom_id for custom_id, _ in failures] == [None, None, "job1-1"]
+    assert failures[0][1].startswith("Unreadable result line")
+    assert failures[1][1] == "Unexpected result line: [1, 2]"
+    assert failures[2][1].startswith("Unusable response")
+
+
+@pytest.fixture
+def batch_server():
+    with FakeBatchServer(posts_per_response=4, processing_polls=1, fail_every=3) as server:
+        yield server
+
+
+@pytest.fixture
+def service(tmp_path, batch_server):
+    (tmp_path / core.PROMPTS_FILE).write_text(json.dumps([{"name": "Launch", "details": "Announce the launch."}]))
+    credentials_path = tmp_path / "credentials"
+    credentials_path.write_text("sk-test")
+    service = core.ContentService(str(tmp_path), credentials_path=str(credentials_path),
+                                  provider_config_path=str(tmp_path / "providers.json"),
+                                  duplicate_policy="keep", auto_tag_policy="off")
+    service.chatgpt.api_base = batch_server.base_url
+    service.load_all()
+    yield service
+    service.chatgpt.close()
+
+
+def wait_until_completed(jobs, job):
+    for _ in range(5):
+        if jobs.refresh(job):
+            return
+    raise AssertionError(f"Batch job stayed {job['status']}")
+
+
+def test_submitted_job_is_tracked_and_imported_once(service, batch_server):
+    jobs = batch_jobs.BatchJobs(service)
+    jobs.load()
+
+    job = jobs.submit([("Launch", 3)])
+
+    assert job["status"] == "submitted"
+    assert job["batch_id"] in batch_server.batches
+    assert sorted(job["requests"].values()) == ["Launch"] * 3
+
+    wait_until_completed(jobs, job)
+    new_posts, failures = jobs.import_results(job)
+
+    assert [custom_id for custom_id, _ in failures] == [f"{job['id']}-2"]
+    assert new_posts and service.unpublished_posts == new_posts
+    assert {(post["batch_job"], post["source_prompt"]) for post in new_posts} == {(job["id"], "Launch")}
+    assert (job["status"], job["posts_imported"], job["failures"]) == ("imported", len(new_posts), 1)
+    assert jobs.active() == []
+
+    assert jobs.import_results(job)[0] == []
+    assert len(service.unpublished_posts) == len(new_posts)
+
+    reloaded = batch_jobs.BatchJobs(service)
+    reloaded.load()
+    assert reloaded.jobs[job["id"]]["status"] == "imported"
+
+
+def test_poller_keeps_a_job_whose_import_failed_for_the_next_round(service):
+    jobs = batch_jobs.BatchJobs(service)
+    job = jobs.submit([("Launch", 2)])
+    calls = []
+
+    def on_complete(job, response_text, failures):
+        calls.append(job["id"])
+        if len(calls) == 1:
+            raise ValueError("disk full")
+        new_posts, _ = service.import_response(response_text)
+        jobs.mark_imported(job, len(new_posts), failures)
+
+    poller = batch_jobs.BatchPoller(jobs, on_complete)
+    for _ in range(3):
+        poller.poll_once()
+        if calls:
+            break
+
+    assert (job["status"], job["error"]) == ("completed", "Import failed: disk full")
+    assert jobs.active() == [job]
+
+    poller.poll_once()
+
+    assert calls == [job["id"], job["id"]]
+    assert (job["status"], job["error"]) == ("imported", None)
+    assert job["posts_imported"] == len(service.unpublished_posts) > 0
+
+
+def crash(*args):
+    raise SystemExit("crash")
+
+
+def test_restart_after_the_posts_were_saved_does_not_import_them_again(service, monkeypatch):
+    jobs = batch_jobs.BatchJobs(service)
+    job = jobs.submit([("Launch", 2)])
+    wait_until_completed(jobs, job)
+    monkeypatch.setattr(jobs, "mark_imported", crash)
+    with pytest.raises(SystemExit):
+        jobs.import_results(job)
+    imported = [post["id"] for post in service.unpublished_posts]
+    for post in service.unpublished_posts:
+        # The job record alone decides, not what the posts carry
+        post.pop("batch_job")
+
+    restarted = batch_jobs.BatchJobs(service)
+    restarted.load()
+    job = restarted.jobs[job["id"]]
+
+    assert job["status"] == "completed" and job["imported_ids"] == imported
+    assert restarted.import_results(job)[0] == []
+    assert (job["status"], job["posts_imported"]) == ("imported", len(imported))
+    assert [post["id"] for post in service.unpublished_posts] == imported
+
+
+def test_restart_before_the_posts_were_saved_imports_them(service, monkeypatch):
+    jobs = batch_jobs.BatchJobs(service)
+    job = jobs.submit([("Launch", 2)])
+    wait_until_completed(jobs, job)
+    monkeypatch.setattr(service, "save_unpublished_posts", crash)
+    with pytest.raises(SystemExit):
+        jobs.import_results(job)
+    monkeypatch.undo()
+    service.load_all()
+    assert service.unpublished_posts == [] and job["imported_ids"]
+
+    restarted = batch_jobs.BatchJobs(service)
+    restarted.load()
+    new_posts, _ = restarted.import_results(restarted.jobs[job["id"]])
+
+    assert new_posts and service.unpublished_posts == new_posts
+    assert restarted.jobs[job["id"]]["imported_ids"] == [post["id"] for post in new_posts]
@@ -0,0 +1,156 @@
+import json
+
+import pytest
+
+import chatgpt_client
+import core
+import llm_providers
+from benchmarks.fakes import FakeOpenAIServer
+
+MESSAGES = [{"role": "user", "content": "Write three posts."}]
+
+
+def test_registry_always_has_the_openai_provider():
+    client = object()
+    registry = llm_providers.ProviderRegistry(client)
+
+    provider = registry.get()
+
+    assert isinstance(provider, llm_providers.OpenAIProvider)
+    assert provider.client is client
+    assert registry.get("openai") is provider
+
+
+def test_registry_builds_configured_providers_once():
+    registry = llm_providers.ProviderRegistry(None, {"local": {"base_url": "http://127.0.0.1:1/v1",
+                                                               "model": "qwen", "temperature": 0.9}},
+                                              default="local")
+
+    provider = registry.get()
+
+    assert isinstance(provider, llm_providers.OpenAICompatibleProvider)
+    assert (provider.base_url, provider.model, provider.sampling) == ("http://127.0.0.1:1/v1", "qwen",
+                                                                      {"temperature": 0.9})
+    assert registry.get("local") is provider
+
+
+@pytest.mark.parametrize("configs, default, name, message", [
+    ({}, "openai", "missing", "Unknown LLM provider 'missing'"),
+    ({"odd": {"backend": "telepathy"}}, "openai", "odd", "Unknown backend 'telepathy'"),
+    ({"local": {"base_url": "http://x", "temprature": 1}}, "openai", "local", "Unknown provider settings"),
+])
+def test_registry_rejects_bad_configs(configs, default, name, message):
+    registry = llm_providers.ProviderRegistry(None, configs, default)
+
+    with pytest.raises(ValueError, match=message):
+        registry.get(name)
+
+
+def test_registry_requires_a_configured_default():
+    with pytest.raises(ValueError, match="'local' is not configured"):
+        llm_providers.ProviderRegistry(None, {}, default="local")
+
+
+def test_load_providers_reads_the_config_file(tmp_path):
+    config_path = tmp_path / "providers.json"
+    config_path.write_text(json.dumps({"default": "local", "providers": {
+        "local": {"backend": "openai-compatible", "base_url": "http://127.0.0.1:8080/v1"}}}))
+
+    registry = llm_providers.load_providers(None, str(config_path))
+
+    assert registry.default == "local"
+    assert set(registry.configs) == {"openai", "local"}
+    assert llm_providers.load_providers(None, str(tmp_path / "missing.json")).configs == {
+        "openai": {"backend": "openai"}}
+
+
+def test_request_params_prefer_prompt_then_provider_then_defaults():
+    provider = llm_providers.Provider(model="provider-model", system_prompt="provider system",
+                                      temperature=0.5, top_p=0.9)
+    prompt = {"name": "p", "details": "...", "temperature": 1.1, "max_tokens": 300}
+
+    system_prompt, params = llm_providers.request_params(provider, prompt, "default-model", "default system", 1000)
+
+    assert system_prompt == "provider system"
+    assert params == {"model": "provider-model", "max_tokens": 300, "temperature": 1.1, "top_p": 0.9}
+    assert llm_providers.request_params(llm_providers.Provider(), {}, "default-model", "default system", 1000) == \
+        ("default system", {"model": "default-model", "max_tokens": 1000})
+
+
+def test_compatible_provider_sends_openai_format_requests():
+    with FakeOpenAIServer(posts_per_response=3) as server:
+        provider = llm_providers.OpenAICompatibleProvider(server.base_url, api_key="local-key", model="qwen")
+        response = provider.chat_completion(model="qwen", messages=MESSAGES, temperature=0.7)
+        provider.close()
+
+    assert len(json.loads(core.sanitize_json(response["choices"][0]["message"]["content"]))) == 3
+    assert server.requests == [{"model": "qwen", "messages": MESSAGES, "temperature": 0.7}]
+
+
+def test_compatible_provider_retries_throttled_requests():
+    retry_log = []
+    with FakeOpenAIServer(rate_limit_every=1, retry_after_ms=1) as server:
+        provider = llm_providers.OpenAICompatibleProvider(server.base_url, max_retries=2)
+        with pytest.raises(llm_providers.ProviderError, match="HTTP 429"):
+            provider.chat_completion(retry_log=retry_log, model="m", messages=MESSAGES)
+
+    assert server.throttled == 3
+    assert retry_log == ["ProviderError", "ProviderError"]
+
+
+def test_compatible_provider_recovers_after_a_throttled_request():
+    retry_log = []
+    with FakeOpenAIServer(rate_limit_every=2, retry_after_ms=1) as server:
+        provider = llm_providers.OpenAICompatibleProvider(server.base_url)
+        provider.chat_completion(model="m", messages=MESSAGES)
+        response = provider.chat_completion(retry_log=retry_log, model="m", messages=MESSAGES)
+
+    assert response["choices"]
+    assert (server.throttled, len(server.requests), retry_log) == (1, 2, ["ProviderError"])
+
+
+def test_compatible_provider_reports_an_unreachable_server():
+    with FakeOpenAIServer() as server:
+        base_url = server.base_url
+    provider = llm_providers.OpenAICompatibleProvider(base_url, max_retries=0)
+
+    with pytest.raises(llm_providers.ProviderError, match="is not answering"):
+        provider.chat_completion(model="m", messages=MESSAGES)
+
+
+def test_openai_provider_goes_through_the_shared_client(tmp_path):
+    credentials_path = tmp_path / "credentials"
+    credentials_path.write_text("sk-test")
+    with FakeOpenAIServer(posts_per_response=2) as server:
+        client = chatgpt_client.ChatGPTClient(str(credentials_path), api_base=server.base_url)
+        provider = llm_providers.ProviderRegistry(client).get()
+        response = provider.chat_completion(model="gpt-test", messages=MESSAGES, max_tokens=100)
+        client.close()
+
+    assert len(json.loads(core.sanitize_json(response["choices"][0]["message"]["content"]))) == 2
+    assert server.requests[0]["model"] == "gpt-test"
+
+
+class StubResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+@pytest.mark.parametrize("status_code, payload, message", [
+    (200, ["not", "an", "object"], "unexpected response"),
+    (200, "just text", "unexpected response"),
+    (500, ["not", "an", "object"], "HTTP 500"),
+    (502, "Bad Gateway", "HTTP 502"),
+    (400, {"error": "Context too long"}, "Context too long"),
+    (400, {"error": {"message": "Bad model"}}, "Bad model"),
+    (200, {"choices": []}, "no choices"),
+])
+def test_compatible_provider_rejects_unusable_bodies(status_code, payload, message):
+    provider = llm_providers.OpenAICompatibleProvider("http://127.0.0.1:1")
+
+    with pytest.raises(llm_providers.ProviderError, match=message):
+        provider._payload(StubResponse(status_code, payload))
@@ -0,0 +1,174 @@
+import json
+
+import pytest
+
+import publishers
+from benchmarks.fakes import FakeGraphServer
+
+
+def make_posts(count):
+    return [{"id": f"p{number}", "caption": f"Caption {number}", "s3_file_name": f"https://cdn.test/{number}.jpg"}
+            for number in range(count)]
+
+
+def graph_publisher(server, **settings):
+    settings.setdefault("poll_interval", 0.01)
+    return publishers.GraphPublisher(server.base_url, "17841400000000000", server.access_token, **settings)
+
+
+def test_publish_batch_publishes_every_post_in_order():
+    with FakeGraphServer(processing_polls=2) as server:
+        publisher = graph_publisher(server, max_workers=3)
+        results = publisher.publish_batch(make_posts(5))
+        publisher.close()
+
+    assert [result.post_id for result in results] == ["p0", "p1", "p2", "p3", "p4"]
+    assert all(result.ok for result in results)
+    assert len(server.published) == 5
+    assert {params["caption"] for params in server.published.values()} == {f"Caption {n}" for n in range(5)}
+    for result in results:
+        assert result.permalink == f"https://www.instagram.com/p/{result.media_id}/"
+        assert result.post_fields()["published_media_id"] == result.media_id
+
+
+def test_publish_batch_reuses_pooled_connections():
+    with FakeGraphServer(processing_polls=3) as server:
+        publisher = graph_publisher(server, max_workers=2)
+        publisher.publish_batch(make_posts(6))
+        publisher.close()
+
+    assert server.connections <= 2 < server.requests
+
+
+def test_failed_container_only_fails_its_post():
+    with FakeGraphServer(fail_every=3) as server:
+        # One worker creates the containers in post order, so the third and sixth are the failing ones
+        results = graph_publisher(server, max_workers=1).publish_batch(make_posts(6))
+
+    errors = {result.post_id: result.error for result in results}
+    assert errors["p2"] == errors["p5"] == "Media container failed: ERROR"
+    assert [post_id for post_id, error in errors.items() if error is None] == ["p0", "p1", "p3", "p4"]
+
+
+def test_post_without_media_url_is_reported_not_raised():
+    posts = make_posts(2)
+    posts[0]["s3_file_name"] = ""
+    with FakeGraphServer() as server:
+        results = graph_publisher(server).publish_batch(posts)
+
+    assert results[0].error == "Post has no media URL."
+    assert results[1].ok
+
+
+def test_rejected_token_fails_every_post_with_the_api_message():
+    with FakeGraphServer() as server:
+        publisher = publishers.GraphPublisher(server.base_url, "1", "wrong-token", poll_interval=0.01)
+        results = publisher.publish_batch(make_posts(2))
+
+    assert all("Invalid OAuth access token." in result.error for result in results)
+    assert not server.containers
+
+
+def test_failed_status_polls_are_retried():
+    with FakeGraphServer(processing_polls=2) as server:
+        publisher = graph_publisher(server)
+        poll = publisher.container_status
+        failed = set()
+
+        def flaky_status(container_id):
+            if container_id not in failed:
+                failed.add(container_id)
+                return publishers.PublishError(f"GET {container_id}: HTTP 502")
+            return poll(container_id)
+
+        publisher.container_status = flaky_status
+        results = publisher.publish_batch(make_posts(3))
+
+    assert len(failed) == 3
+    assert all(result.ok for result in results)
+
+
+def test_container_still_processing_at_the_deadline_times_out():
+    with FakeGraphServer(processing_polls=10 ** 6) as server:
+        results = graph_publisher(server, poll_timeout=0.1).publish_batch(make_posts(1))
+
+    assert results[0].error == "Timed out waiting for the media container."
+    assert not server.published
+
+
+def test_load_publisher_without_config_publishes_locally(tmp_path):
+    publisher = publishers.load_publisher(str(tmp_path / "missing.json"))
+
+    assert isinstance(publisher, publishers.LocalPublisher)
+    assert [result.ok for result in publisher.publish_batch(make_posts(2))] == [True, True]
+
+
+def test_load_publisher_builds_the_configured_backend(tmp_path):
+    config_path = tmp_path / "publisher.json"
+    config_path.write_text(json.dumps({"backend": "graph", "base_url": "https://graph.test/v19.0/",
+                                       "account_id": "42", "access_token": "token", "max_workers": 2}))
+
+    publisher = publishers.load_publisher(str(config_path))
+
+    assert isinstance(publisher, publishers.GraphPublisher)
+    assert (publisher.base_url, publisher.account_id, publisher.max_workers) == ("https://graph.test/v19.0", "42", 2)
+
+
+def test_load_publisher_rejects_unknown_backends(tmp_path):
+    config_path = tmp_path / "publisher.json"
+    config_path.write_text(json.dumps({"backend": "carrier-pigeon"}))
+
+    with pytest.raises(ValueError, match="carrier-pigeon"):
+        publishers.load_publisher(str(config_path))
+
+
+class StubResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class StubSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, **kwargs):
+        return self.response
+
+    def request(self, method, url, **kwargs):
+        return self.response
+
+
+@pytest.mark.parametrize("status, payload, message", [
+    (400, ["not", "an", "object"], "GET c1: HTTP 400"),
+    (400, {"error": "Unsupported get request."}, "GET c1: Unsupported get request."),
+    (200, {"error": "Rate limited"}, "GET c1: Rate limited"),
+    (200, ["FINISHED"], "GET c1: unexpected response"),
+])
+def test_error_bodies_of_any_shape_raise_publish_error(status, payload, message):
+    publisher = publishers.GraphPublisher("https://graph.test/v19.0", "1", "token",
+                                          session=StubSession(StubResponse(status, payload)))
+
+    with pytest.raises(publishers.PublishError, match=message):
+        publisher.request("GET", "c1", fields="status_code")
+
+
+def test_failed_permalink_lookup_keeps_the_post_published():
+    with FakeGraphServer() as server:
+        publisher = graph_publisher(server)
+        request = publisher.request
+
+        def request_without_permalinks(method, path, **params):
+            if params.get("fields") == "permalink":
+                raise publishers.PublishError(f"GET {path}: HTTP 500")
+            return request(method, path, **params)
+
+        publisher.request = request_without_permalinks
+        results = publisher.publish_batch(make_posts(2))
+
+    assert all(result.ok and result.permalink is None for result in results)
+    assert len(server.published) == 2
+    assert "permalink" not in results[0].post_fields()
@@ -0,0 +1,44 @@
+import time
+
+import core
+import scheduler
+
+
+def test_claim_keeps_changes_other_processes_made_to_other_entries(tmp_path):
+    file_path = str(tmp_path / "publish_queue.json")
+    ours = scheduler.PublishQueue(file_path)
+    theirs = scheduler.PublishQueue(file_path)
+    ours.schedule("due", "2020-01-01 09:00", "Due post")
+    ours.schedule("later", "2999-01-01 09:00", "Later post")
+    theirs.load()
+
+    theirs.schedule("later", "2999-06-01 09:00", "Later post")
+    now = time.time()
+    with ours.changed:
+        [entry] = ours.pop_due(now)
+        assert ours.claim(entry, now)
+
+    on_disk = {item["post_id"]: item for item in core.load_json(file_path, default=[])}
+    assert on_disk["later"]["publish_at"] == "2999-06-01 09:00"
+    assert on_disk["due"]["claimed_by"] == entry["claimed_by"]
+    assert ours.entries["due"] is entry
+    assert ours.entries["later"]["publish_at"] == "2999-06-01 09:00"
+    assert ours.next_due() == (ours.entries["later"]["due"], "later")
+
+
+def test_claim_adopts_an_entry_claimed_elsewhere(tmp_path):
+    file_path = str(tmp_path / "publish_queue.json")
+    ours = scheduler.PublishQueue(file_path)
+    theirs = scheduler.PublishQueue(file_path)
+    ours.schedule("due", "2020-01-01 09:00", "Due post")
+    theirs.load()
+    now = time.time()
+
+    with theirs.changed:
+        assert theirs.claim(theirs.pop_due(now)[0], now)
+    with ours.changed:
+        [entry] = ours.pop_due(now)
+        assert not ours.claim(entry, now)
+
+    assert ours.entries["due"]["claimed_by"] == theirs.entries["due"]["claimed_by"]
+    assert ours.next_due()[0] > now
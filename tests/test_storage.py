@@ -0,0 +1,66 @@
+import json
+
+import storage
+
+
+def save_concurrently(tmp_path, base, theirs, mine):
+    """Saves `mine` over a store another writer changed from `base` to `theirs` since we read it."""
+    file_path = str(tmp_path / "store.json")
+    storage.replace_text(file_path, json.dumps(base))
+    storage.read_text(file_path)
+    storage.replace_text(file_path, json.dumps(theirs))
+    _, conflicts = storage.write_json(mine, file_path)
+    with open(file_path) as file:
+        return json.load(file), conflicts
+
+
+def test_keyed_records_added_on_both_sides_are_kept(tmp_path):
+    base = [{"id": "a", "title": "A"}]
+
+    merged, conflicts = save_concurrently(tmp_path, base,
+                                          base + [{"id": "b", "title": "B"}],
+                                          base + [{"id": "c", "title": "C"}])
+
+    assert merged == [{"id": "a", "title": "A"}, {"id": "b", "title": "B"}, {"id": "c", "title": "C"}]
+    assert conflicts == []
+
+
+def test_keyed_record_deleted_on_one_side_and_edited_on_the_other_keeps_the_edit(tmp_path):
+    base = [{"id": "a", "title": "A"}, {"id": "b", "title": "B"}]
+
+    merged, conflicts = save_concurrently(tmp_path, base,
+                                          [{"id": "a", "title": "A"}],
+                                          [{"id": "a", "title": "A"}, {"id": "b", "title": "B2"}])
+
+    assert merged == [{"id": "a", "title": "A"}, {"id": "b", "title": "B2"}]
+    assert conflicts == [("b",)]
+
+
+def test_unkeyed_records_merge_by_value(tmp_path):
+    # Legacy posts without ids: one writer adds a post, the other deletes one and edits another
+    base = [{"title": "A"}, {"title": "B"}, {"title": "C"}]
+
+    merged, conflicts = save_concurrently(tmp_path, base,
+                                          base + [{"title": "D"}],
+                                          [{"title": "A"}, {"title": "C2"}, {"title": "E"}])
+
+    assert merged == [{"title": "A"}, {"title": "D"}, {"title": "C2"}, {"title": "E"}]
+    assert conflicts == []
+
+
+def test_unkeyed_records_added_on_both_sides_are_not_duplicated(tmp_path):
+    base = [{"name": "Launch"}, {"name": "Launch"}]
+
+    merged, _ = save_concurrently(tmp_path, base,
+                                  base + [{"name": "Recap"}],
+                                  base + [{"name": "Recap"}, {"name": "Teaser"}])
+
+    assert merged == base + [{"name": "Recap"}, {"name": "Teaser"}]
+
+
+def test_unkeyed_record_deleted_on_one_side_and_edited_on_the_other_keeps_the_edit(tmp_path):
+    base = [{"title": "A"}, {"title": "B"}]
+
+    merged, _ = save_concurrently(tmp_path, base, [{"title": "A"}, {"title": "B2"}], [{"title": "A"}])
+
+    assert merged == [{"title": "A"}, {"title": "B2"}]
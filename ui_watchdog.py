@@ -0,0 +1,104 @@
+"""Detection of Tk event-loop stalls, with the UI thread's stack at the time.
+
+The UI thread calls StallWatchdog.beat() from a root.after() heartbeat. The watchdog thread checks how long ago the
+last beat was; once that is `threshold` seconds past the expected beat it captures the UI thread's stack. The next
+beat ends the stall: its duration and stack go to ui_stalls.log, the "ui_stall" perf operation and on_stall, which
+runs on the UI thread and can update a counter. A stall still going on after HANG_SECONDS is logged right away, so
+hard freezes leave a trace too.
+"""
+import logging
+import logging.handlers
+import sys
+import threading
+import time
+import traceback
+
+import perf
+from app_logging import attach_queued_handlers
+
+STALL_LOG_FILE = "ui_stalls.log"
+STALL_LOG_MAX_BYTES = 1024 * 1024
+STALL_LOG_BACKUP_COUNT = 3
+HEARTBEAT_SECONDS = 0.1
+STALL_THRESHOLD = 0.25
+CHECK_INTERVAL = 0.05
+HANG_SECONDS = 5.0
+
+_stall_logger = None
+
+
+def get_stall_logger(path=STALL_LOG_FILE):
+    global _stall_logger
+    if _stall_logger is None:
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=STALL_LOG_MAX_BYTES,
+                                                       backupCount=STALL_LOG_BACKUP_COUNT, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        logger = logging.getLogger("ui_stalls")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        attach_queued_handlers(logger, handler)
+        _stall_logger = logger
+    return _stall_logger
+
+
+class StallWatchdog(threading.Thread):
+    """Watches the heartbeat of the thread that creates it. `on_stall(seconds, stack)` runs in beat()."""
+
+    def __init__(self, on_stall=None, heartbeat=HEARTBEAT_SECONDS, threshold=STALL_THRESHOLD,
+                 interval=CHECK_INTERVAL, log_path=STALL_LOG_FILE):
+        super().__init__(name="ui-watchdog", daemon=True)
+        self.on_stall = on_stall
+        self.heartbeat = heartbeat
+        self.threshold = threshold
+        self.interval = interval
+        self.logger = get_stall_logger(log_path)
+        self.ui_thread = threading.get_ident()
+        # None until the first beat, so startup before the event loop runs doesn't count as a stall
+        self.last_beat = None
+        self.stalls = 0
+        self.longest = 0.0
+        # Stack captured during the current stall, and whether it was logged as a hang already
+        self._stack = None
+        self._hang_logged = False
+        self._stopping = threading.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    def beat(self):
+        """Call from the watched thread every `heartbeat` seconds."""
+        now = time.monotonic()
+        if self.last_beat is None:
+            self.last_beat = now
+            return
+        lag = now - self.last_beat - self.heartbeat
+        self.last_beat = now
+        stack, self._stack = self._stack, None
+        # The stack can be captured just before a beat that turns out to be on time; only count real stalls
+        if lag < self.threshold:
+            return
+        stack = stack or "(the stall ended before its stack was captured)\n"
+        self.stalls += 1
+        self.longest = max(self.longest, lag)
+        perf.registry.record("ui_stall", lag)
+        self.logger.warning("UI blocked for %.2fs in:\n%s", lag, stack)
+        if self.on_stall is not None:
+            self.on_stall(lag, stack)
+
+    def run(self):
+        while not self._stopping.wait(self.interval):
+            last_beat = self.last_beat
+            if last_beat is None:
+                continue
+            lag = time.monotonic() - last_beat - self.heartbeat
+            if lag < self.threshold:
+                self._hang_logged = False
+                continue
+            if self._stack is None:
+                frame = sys._current_frames().get(self.ui_thread)
+                if frame is None:
+                    return
+                self._stack = "".join(traceback.format_stack(frame))
+            if lag >= HANG_SECONDS and not self._hang_logged:
+                self._hang_logged = True
+                self.logger.warning("UI still blocked after %.1fs in:\n%s", lag, self._stack)